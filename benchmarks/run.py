@@ -0,0 +1,321 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .stub_api import StubAPI
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Offline end-to-end ingestion benchmark.
+#   python -m benchmarks.run                     run every case, compare with the baseline
+#   python -m benchmarks.run --save-baseline     record the current results as the baseline
+#   python -m benchmarks.run --case coingecko_coins_list --repeat 5
+#
+# A local stand-in (stub_api.py) serves the provider payloads; the real loaders run
+# against it with a fresh temporary database per repetition. No network, no API keys:
+# provider base URLs point at the stand-in, the keys are dummies, rate limits and the
+# response cache are off.
+#
+# Each case runs in its own process so peak RSS belongs to that case alone. Reported
+# per case: rows written, median seconds, rows/second, median latency per stage and
+# peak RSS (stage times of concurrent stages are summed over threads). A case slower
+# than the baseline by more than --tolerance is a regression (exit status 1).
+
+ROOT = Path(__file__).resolve().parents[1]
+BASELINE_PATH = Path(os.environ.get("GEDAP_BENCH_BASELINE", ROOT / "benchmarks" / "baseline.json"))
+
+# Default payload sizes: ~14 years of daily crypto history, 10k coins
+SIZES = {"days": 5000, "coins": 10000, "indices": 40, "page_kb": 400}
+
+# AlphaVantage cases: (params, source_type, symbol, market, table, columnar, incremental, reconcile)
+# reconcile cases re-sweep the full history over a preloaded series (see reconcile.py)
+ALPHAV_CASES = {
+    "alphav_crypto_full": (
+        {"function": "DIGITAL_CURRENCY_DAILY", "symbol": "BTC", "market": "USD"},
+        "crypto", "BTC", "USD", "alphav_crypto_daily", False, False, False,
+    ),
+    "alphav_crypto_full_columnar": (
+        {"function": "DIGITAL_CURRENCY_DAILY", "symbol": "BTC", "market": "USD"},
+        "crypto", "BTC", "USD", "alphav_crypto_daily", True, False, False,
+    ),
+    "alphav_crypto_sweep_reconcile": (
+        {"function": "DIGITAL_CURRENCY_DAILY", "symbol": "BTC", "market": "USD"},
+        "crypto", "BTC", "USD", "alphav_crypto_daily", True, True, True,
+    ),
+    "alphav_stocks_full": (
+        {"function": "TIME_SERIES_DAILY", "symbol": "AAPL"},
+        "stocks", "AAPL", "USD", "alphav_stocks_daily", False, False, False,
+    ),
+    "alphav_stocks_incremental": (
+        {"function": "TIME_SERIES_DAILY", "symbol": "AAPL"},
+        "stocks", "AAPL", "USD", "alphav_stocks_daily", False, True, False,
+    ),
+    "alphav_commodity": (
+        {"function": "WTI", "interval": "daily"},
+        "commodity", "WTI", "USD", "alphav_commodity", False, False, False,
+    ),
+}
+
+# Other loaders: (module, loader, table, setup loader run before timing or None)
+LOADER_CASES = {
+    "coingecko_coins_list": ("coingecko_functions", "coins_list_loader", "coingecko_coins_list", None),
+    "coingecko_market_data": ("coingecko_functions", "market_data_loader", "coingecko_market_data", None),
+    "coingecko_price": ("coingecko_functions", "price_loader", "coingecko_price", None),
+    "coingecko_price_all_coins": ("coingecko_functions", "price_loader", "coingecko_price", "coins_list_loader"),
+    "investing_indices": ("investing_functions", "indices_loader", "investing_indices", None),
+}
+
+CASES = list(ALPHAV_CASES) + list(LOADER_CASES)
+
+# Rows kept off the end of the preloaded series for the incremental case
+INCREMENTAL_GAP = 5
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Child-side helpers.
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+# Stage totals recorded by the loaders' own instrumentation (scripts/utils/metrics.py),
+# summed over labels. Concurrent stages (e.g. paginated fetches) add up across threads,
+# so they can exceed the wall-clock total.
+def loader_stages(metrics):
+    stages = {}
+    for (stage, _), (_, seconds) in metrics.timings.items():
+        stages[stage] = stages.get(stage, 0.0) + seconds
+    return stages
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: One repetition of a case against a fresh database; returns (rows, stages).
+def run_alphav_case(name, db_path):
+    from scripts.utils import alphav_functions as af
+    from scripts.utils.db_session import DBSession
+
+    params, source_type, symbol, market, table, columnar, incremental, reconcile = ALPHAV_CASES[name]
+    timer = StageTimer()
+
+    with DBSession(db_path) as session:
+        if incremental:
+            # Preload the full history, then rewind the last few days so the
+            # measured run is a typical daily incremental load
+            af.alphav_loader(dict(params), source_type, symbol, market, session=session)
+            dates = session.fetchall(
+                f"SELECT date FROM {table} ORDER BY date DESC LIMIT ?", (INCREMENTAL_GAP + 1,)
+            )
+            cutoff = dates[-1][0]
+            with session.transaction():
+                session.execute(f"DELETE FROM {table} WHERE date > ?", (cutoff,))
+                session.execute("UPDATE alphav_metadata SET max_data_date = ?", (cutoff,))
+        before = session.fetchone(f"SELECT COUNT(*) FROM {table}")[0]
+
+        with timer.stage("total"):
+            with timer.stage("metadata"):
+                max_data_date, full_load = af.resolve_load_window(
+                    session, source_type, symbol, market, "daily", history_sweep=reconcile
+                )
+            with timer.stage("fetch_parse"):
+                result = af.fetch_and_parse(
+                    dict(params), source_type, symbol, market, max_data_date, full_load, columnar
+                )
+            with timer.stage("write"):
+                af.write_load_result(session, result, source_type, symbol, market, "daily", reconcile=reconcile)
+
+        rows = session.fetchone(f"SELECT COUNT(*) FROM {table}")[0] - before
+    return rows, timer.stages
+
+def run_loader_case(name, db_path):
+    import importlib
+    from scripts.utils.db_session import DBSession
+
+    from scripts.utils.metrics import metrics
+
+    module, loader, table, setup = LOADER_CASES[name]
+    module = importlib.import_module(f"scripts.utils.{module}")
+    loader = getattr(module, loader)
+    timer = StageTimer()
+
+    with DBSession(db_path) as session:
+        if setup is not None:
+            getattr(module, setup)(session=session)
+        metrics.reset()
+        with timer.stage("total"):
+            loader(session=session)
+        rows = session.fetchone(f"SELECT COUNT(*) FROM {table}")[0]
+
+    timer.stages.update(loader_stages(metrics))
+    return rows, timer.stages
+
+
+# Function 3: Child process entry point; prints one JSON result line.
+def run_child(name, repeat):
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(repeat):
+            db_path = os.path.join(tmp, f"bench_{i}.db")
+            # Loader progress output is not part of the result
+            with contextlib.redirect_stdout(io.StringIO()):
+                if name in ALPHAV_CASES:
+                    runs.append(run_alphav_case(name, db_path))
+                else:
+                    runs.append(run_loader_case(name, db_path))
+
+    stages = {
+        stage: statistics.median(r[1].get(stage, 0.0) for r in runs)
+        for stage in runs[0][1]
+    }
+    seconds = stages.pop("total")
+    rows = runs[-1][0]
+    print(json.dumps({
+        "case": name,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else None,
+        "stages": stages,
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 4: Parent side: start the stand-in, run each case in a subprocess.
+def child_environ(stub):
+    env = dict(os.environ)
+    env.update(stub.environ())
+    env.update({
+        "ALPHAVANTAGE_API_KEY": "benchmark",
+        "COINGECKO_API_KEY": "benchmark",
+        "ALPHAVANTAGE_REQUESTS_PER_MINUTE": "0",
+        "COINGECKO_REQUESTS_PER_MINUTE": "0",
+        "INVESTING_REQUESTS_PER_MINUTE": "0",
+        "GEDAP_CACHE": "0",
+        "GEDAP_REPLAY": "0",
+        "GEDAP_METRICS": "0",
+        "NO_PROXY": "127.0.0.1,localhost",
+    })
+    return env
+
+def run_cases(cases, repeat, sizes, payloads_dir=None):
+    results = []
+    with StubAPI(sizes, payloads_dir) as stub:
+        env = child_environ(stub)
+        for name in cases:
+            completed = subprocess.run(
+                [sys.executable, "-m", "benchmarks.run", "--child", name, "--repeat", str(repeat)],
+                cwd=ROOT, env=env, capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                print(f"{name}: FAILED\n{completed.stderr.strip()}")
+                results.append({"case": name, "error": completed.stderr.strip().splitlines()[-1:]})
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            report(result)
+    return results
+
+def report(result):
+    stages = ", ".join(f"{k} {v * 1000:.1f}ms" for k, v in result["stages"].items())
+    rate = result["rows_per_second"]
+    print(
+        f"{result['case']:<30} {result['rows']:>8} rows {result['seconds']:>8.3f}s "
+        f"{rate or 0:>12,.0f} rows/s {result['peak_rss_mb']:>7.1f} MB  ({stages})"
+    )
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 5: Baseline comparison. Returns the names of regressed cases.
+def compare(results, baseline, tolerance):
+    regressions = []
+    previous = {r["case"]: r for r in baseline.get("results", [])}
+    for result in results:
+        before = previous.get(result["case"])
+        if "error" in result or before is None or "error" in before:
+            continue
+        ratio = result["seconds"] / before["seconds"] if before["seconds"] else 1.0
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(
+            f"{result['case']:<30} {ratio:>6.2f}x baseline time, "
+            f"RSS {result['peak_rss_mb'] - before['peak_rss_mb']:+.1f} MB {flag}"
+        )
+        if flag:
+            regressions.append(result["case"])
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline GEDAP ingestion benchmark")
+    parser.add_argument("--case", action="append", choices=CASES, help="case to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--days", type=int, default=SIZES["days"])
+    parser.add_argument("--coins", type=int, default=SIZES["coins"])
+    parser.add_argument("--indices", type=int, default=SIZES["indices"])
+    parser.add_argument("--page-kb", type=int, default=SIZES["page_kb"])
+    parser.add_argument("--payloads", help="directory of recorded payloads (see stub_api.py)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    parser.add_argument("--child", choices=CASES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child, args.repeat)
+        return 0
+
+    sizes = {"days": args.days, "coins": args.coins, "indices": args.indices, "page_kb": args.page_kb}
+    results = run_cases(args.case or CASES, args.repeat, sizes, args.payloads)
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump({"sizes": sizes, "repeat": args.repeat, "results": results}, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print("No baseline yet (run with --save-baseline)")
+        return 1 if any("error" in r for r in results) else 0
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get("sizes") != sizes:
+        print(f"Warning: baseline was recorded with sizes {baseline.get('sizes')}")
+    regressions = compare(results, baseline, args.tolerance)
+    failed = regressions or any("error" in r for r in results)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
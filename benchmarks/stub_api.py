@@ -0,0 +1,334 @@
+import json
+import random
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Local stand-in for the AlphaVantage, CoinGecko and investing.com endpoints used by the
+# loaders, so ingestion can be benchmarked with no network and no API keys.
+#
+# Routes (point the providers' base URLs at them):
+#   /alphavantage/query       TIME_SERIES_DAILY, FX_DAILY, DIGITAL_CURRENCY_DAILY, commodities
+#   /coingecko/coins/list     `coins` entries
+#   /coingecko/coins/markets  paginated with page / per_page (up to `coins` entries)
+#   /coingecko/simple/price   every requested id x currency
+#   /investing/               homepage with the datatable-v2 indices table
+#
+# Payloads are synthetic but shaped like the real ones. With a payloads directory,
+# recorded responses are used instead and scaled to the requested size:
+#   alphavantage/<FUNCTION>.json   series extended back in time to `days` entries
+#   coingecko/coins_list.json      entries replicated to `coins`
+#   coingecko/coins_markets.json   entries replicated to `coins`
+#   coingecko/simple_price.json    served as recorded
+#   investing/index.html           served as recorded
+# Payloads are built once per distinct request and kept in memory, so the server
+# is never the bottleneck being measured.
+
+SERIES_KEYS = {
+    "TIME_SERIES_DAILY": "Time Series (Daily)",
+    "FX_DAILY": "Time Series FX (Daily)",
+    "DIGITAL_CURRENCY_DAILY": "Time Series (Digital Currency Daily)",
+}
+
+COMPACT_POINTS = 100
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Synthetic AlphaVantage payloads (newest date first, like the API).
+def _dates(days, weekdays_only):
+    current = date.today()
+    dates = []
+    while len(dates) < days:
+        if not weekdays_only or current.weekday() < 5:
+            dates.append(current.isoformat())
+        current -= timedelta(days=1)
+    return dates
+
+def _walk(rng, days, start=100.0):
+    price = start
+    for _ in range(days):
+        price = max(price * (1 + rng.gauss(0, 0.02)), 0.01)
+        yield price
+
+def alphavantage_series(params, days):
+    function = params.get("function")
+    symbol = params.get("symbol") or params.get("from_symbol") or function
+    rng = random.Random(symbol)
+
+    if function not in SERIES_KEYS:
+        # Commodity endpoints: {"name", "interval", "unit", "data": [{"date", "value"}]}
+        interval = params.get("interval", "monthly")
+        step = 1 if interval == "daily" else 30
+        dates = _dates(days * step, weekdays_only=False)[::step]
+        data = [
+            {"date": d, "value": "." if rng.random() < 0.01 else f"{v:.2f}"}
+            for d, v in zip(dates, _walk(rng, len(dates)))
+        ]
+        return {"name": f"{function} benchmark", "interval": interval, "unit": "USD", "data": data}
+
+    if params.get("outputsize", "compact") == "compact" and function != "DIGITAL_CURRENCY_DAILY":
+        days = min(days, COMPACT_POINTS)
+    dates = _dates(days, weekdays_only=function != "DIGITAL_CURRENCY_DAILY")
+
+    series = {}
+    for d, close in zip(dates, _walk(rng, days)):
+        values = {
+            "1. open": f"{close * 0.99:.4f}",
+            "2. high": f"{close * 1.02:.4f}",
+            "3. low": f"{close * 0.97:.4f}",
+            "4. close": f"{close:.4f}",
+        }
+        if function == "TIME_SERIES_DAILY":
+            values["5. volume"] = str(rng.randint(10_000, 90_000_000))
+        elif function == "DIGITAL_CURRENCY_DAILY":
+            values["5. volume"] = f"{rng.uniform(10, 90_000):.8f}"
+        series[d] = values
+
+    meta = {
+        "1. Information": f"{function} (benchmark stand-in)",
+        "2. Symbol": symbol,
+        "3. Last Refreshed": dates[0],
+        "4. Output Size": params.get("outputsize", "Compact"),
+        "5. Time Zone": "UTC",
+    }
+    return {"Meta Data": meta, SERIES_KEYS[function]: series}
+
+# Stretch a recorded series to `days` entries by repeating it further back in time.
+def scale_series(payload, days):
+    series_key = next((k for k in payload if "Time Series" in k), None)
+    if series_key is None:
+        data = payload.get("data", [])
+        if data:
+            payload = dict(payload, data=[data[i % len(data)] for i in range(days)])
+        return payload
+
+    recorded = list(payload[series_key].values())
+    if not recorded:
+        return payload
+    dates = _dates(days, weekdays_only=False)
+    scaled = {d: recorded[i % len(recorded)] for i, d in enumerate(dates)}
+    return dict(payload, **{series_key: scaled})
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: Synthetic CoinGecko payloads.
+def coin_ids(coins):
+    return [f"coin-{i:05d}" for i in range(coins)]
+
+def coingecko_coins_list(coins):
+    return [
+        {"id": coin_id, "symbol": f"c{i:05d}", "name": f"Coin {i}"}
+        for i, coin_id in enumerate(coin_ids(coins))
+    ]
+
+def coingecko_market(i, coin_id, now):
+    rng = random.Random(coin_id)
+    price = rng.uniform(0.001, 60_000)
+    return {
+        "id": coin_id, "symbol": f"c{i:05d}", "name": f"Coin {i}",
+        "image": f"https://assets.example/coins/{coin_id}.png",
+        "current_price": price, "market_cap": price * 1e7, "market_cap_rank": i + 1,
+        "fully_diluted_valuation": price * 2e7, "total_volume": price * 1e5,
+        "high_24h": price * 1.05, "low_24h": price * 0.95,
+        "price_change_24h": price * 0.01, "price_change_percentage_24h": 1.0,
+        "market_cap_change_24h": price * 1e5, "market_cap_change_percentage_24h": 1.0,
+        "circulating_supply": 1e7, "total_supply": 2e7, "max_supply": None,
+        "ath": price * 2, "ath_change_percentage": -50.0, "ath_date": "2021-11-10T14:24:11.849Z",
+        "atl": price / 10, "atl_change_percentage": 900.0, "atl_date": "2015-10-20T00:00:00.000Z",
+        "roi": {"times": 10.5, "currency": "usd", "percentage": 1050.0} if i % 7 == 0 else None,
+        "last_updated": now,
+    }
+
+def coingecko_markets(coins, page, per_page, recorded=None):
+    start = (page - 1) * per_page
+    stop = min(start + per_page, coins)
+    if recorded:
+        return [dict(recorded[i % len(recorded)], id=f"{recorded[i % len(recorded)]['id']}-{i}")
+                for i in range(start, stop)]
+    now = f"{date.today().isoformat()}T00:00:00.000Z"
+    ids = coin_ids(coins)
+    return [coingecko_market(i, ids[i], now) for i in range(start, stop)]
+
+def coingecko_simple_price(ids, currencies, timestamp):
+    payload = {}
+    for coin_id in ids:
+        rng = random.Random(coin_id)
+        entry = {}
+        for currency in currencies:
+            price = rng.uniform(0.001, 60_000)
+            entry[currency] = round(price, 2)
+            entry[f"{currency}_market_cap"] = round(price * 1e7, 2)
+            entry[f"{currency}_24h_vol"] = round(price * 1e5, 2)
+            entry[f"{currency}_24h_change"] = round(rng.uniform(-5, 5), 2)
+        entry["last_updated_at"] = timestamp
+        payload[coin_id] = entry
+    return payload
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 3: Synthetic investing.com homepage. `page_kb` of unrelated markup pads the
+# page to a realistic size so the scraper's full-document parse is part of the cost.
+def investing_homepage(indices, page_kb):
+    rng = random.Random("investing")
+    rows = []
+    for i in range(indices):
+        last = rng.uniform(1_000, 40_000)
+        rows.append(
+            "<tr class=\"datatable-v2_row\">"
+            f"<td><a href=\"/indices/index-{i}\">Index {i}</a></td>"
+            f"<td>{last:,.2f}</td><td>{last * 1.01:,.2f}</td><td>{last * 0.99:,.2f}</td>"
+            f"<td>{last * 0.004:+,.2f}</td><td>{rng.uniform(-3, 3):+.2f}%</td>"
+            f"<td><time datetime=\"{date.today().isoformat()}T15:59:59.000Z\">15:59:59</time></td>"
+            "</tr>"
+        )
+    filler = "<div class=\"news\"><a href=\"/news/x\">Headline</a><span>Lorem ipsum dolor sit</span></div>"
+    padding = filler * (page_kb * 1024 // len(filler))
+    return (
+        "<!DOCTYPE html><html><head><title>Investing.com</title></head><body>"
+        f"{padding}"
+        "<table class=\"datatable-v2_table datatable-v2_table--mobile-basic\"><thead><tr>"
+        "<th>Name</th><th>Last</th><th>High</th><th>Low</th><th>Chg.</th><th>Chg. %</th><th>Time</th>"
+        f"</tr></thead><tbody>{''.join(rows)}</tbody></table>"
+        f"{padding}"
+        "</body></html>"
+    )
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: The HTTP server. `sizes` controls the synthetic payloads:
+#   days (history length), coins (coins/list and coins/markets), indices, page_kb.
+class StubAPI:
+    def __init__(self, sizes, payloads_dir=None, host="127.0.0.1", port=0):
+        self.sizes = sizes
+        self.payloads_dir = Path(payloads_dir) if payloads_dir else None
+        self.bodies = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, like the real APIs
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                try:
+                    body, content_type = stub.body(url.path, params)
+                    status = 200
+                except KeyError:
+                    body, content_type, status = b'{"error": "not found"}', "application/json", 404
+                with stub.lock:
+                    stub.requests += 1
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # Provider base URLs, as expected by http_client (<PROVIDER>_BASE_URL)
+    def environ(self):
+        return {
+            "ALPHAVANTAGE_BASE_URL": f"{self.base_url}/alphavantage/",
+            "COINGECKO_BASE_URL": f"{self.base_url}/coingecko/",
+            "INVESTING_BASE_URL": f"{self.base_url}/investing/",
+        }
+
+    def _recorded(self, provider, name):
+        if self.payloads_dir is None:
+            return None
+        path = self.payloads_dir / provider / name
+        if not path.exists():
+            return None
+        text = path.read_text(encoding="utf-8")
+        return json.loads(text) if path.suffix == ".json" else text
+
+    def _build(self, path, params):
+        sizes = self.sizes
+        if path == "/alphavantage/query":
+            payload = self._recorded("alphavantage", f"{params.get('function')}.json")
+            if payload is not None:
+                return scale_series(payload, sizes["days"])
+            return alphavantage_series(params, sizes["days"])
+
+        if path == "/coingecko/coins/list":
+            recorded = self._recorded("coingecko", "coins_list.json")
+            if recorded:
+                return [dict(recorded[i % len(recorded)], id=f"{recorded[i % len(recorded)]['id']}-{i}")
+                        for i in range(sizes["coins"])]
+            return coingecko_coins_list(sizes["coins"])
+
+        if path == "/coingecko/coins/markets":
+            page = int(params.get("page", 1))
+            per_page = min(int(params.get("per_page", 100)), 250)
+            return coingecko_markets(sizes["coins"], page, per_page, self._recorded("coingecko", "coins_markets.json"))
+
+        if path == "/coingecko/simple/price":
+            recorded = self._recorded("coingecko", "simple_price.json")
+            if recorded is not None:
+                return recorded
+            ids = params.get("ids", "").split(",")
+            currencies = params.get("vs_currencies", "usd").split(",")
+            return coingecko_simple_price(ids, currencies, 1_700_000_000)
+
+        if path == "/investing/":
+            recorded = self._recorded("investing", "index.html")
+            return recorded if recorded is not None else investing_homepage(sizes["indices"], sizes["page_kb"])
+
+        raise KeyError(path)
+
+    def body(self, path, params):
+        key = (path, tuple(sorted((k, v) for k, v in params.items() if k != "apikey")))
+        with self.lock:
+            cached = self.bodies.get(key)
+        if cached is None:
+            payload = self._build(path, params)
+            if isinstance(payload, str):
+                cached = (payload.encode("utf-8"), "text/html; charset=utf-8")
+            else:
+                cached = (json.dumps(payload).encode("utf-8"), "application/json")
+            with self.lock:
+                self.bodies[key] = cached
+        return cached
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,41 @@
+import sys
+
+from . import (
+    insert_alphav_commodity,
+    insert_alphav_crypto_daily,
+    insert_alphav_fx_daily,
+    insert_alphav_stocks_daily,
+)
+from .utils.gaps import fill_gaps, plan_backfill
+from .utils.http_client import apply_cli_flags
+
+# Finds holes inside the stored AlphaVantage series and fetches only what fills them.
+#   python -m scripts.backfill_gaps             plan and fill
+#   python -m scripts.backfill_gaps --dry-run   print the plan only
+def build_jobs():
+    return (
+        insert_alphav_stocks_daily.build_jobs()
+        + insert_alphav_fx_daily.build_jobs()
+        + insert_alphav_crypto_daily.build_jobs()
+        + insert_alphav_commodity.build_jobs()
+    )
+
+
+def main(session=None, dry_run=False):
+    plan = plan_backfill(build_jobs(), session=session)
+    for entry in plan:
+        missing = entry["missing"]
+        outputsize = entry["params"].get("outputsize", "full")
+        print(
+            f"{entry['source_type']}, {entry['symbol']}, {entry['market']}: "
+            f"{len(missing)} missing ({missing[0]} .. {missing[-1]}), outputsize={outputsize}"
+        )
+    print(f"{len(plan)} request(s) planned")
+    if dry_run or not plan:
+        return 0, 0
+    return fill_gaps(plan, session=session)
+
+
+if __name__ == "__main__":
+    apply_cli_flags()
+    main(dry_run="--dry-run" in sys.argv[1:])
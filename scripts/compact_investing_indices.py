@@ -0,0 +1,10 @@
+from .utils.investing_functions import compact_indices
+
+
+# Thins out old investing_indices snapshots (see INVESTING_RETENTION in .env.example)
+def main(session=None):
+    return compact_indices(session=session)
+
+
+if __name__ == "__main__":
+    main()
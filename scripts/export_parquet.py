@@ -0,0 +1,12 @@
+import sys
+
+from .utils.parquet_export import parquet_exporter
+
+# --full rewrites every partition instead of only the ones that changed
+def main(session=None, argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    return parquet_exporter(full="--full" in argv, session=session)
+
+
+if __name__ == "__main__":
+    main()
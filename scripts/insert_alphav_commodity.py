@@ -1,4 +1,5 @@
-from .utils.alphav_functions import alphav_loader
+from .utils.alphav_functions import alphav_batch_loader
+from .utils.http_client import apply_cli_flags
 
 commodities = [
     {"commodity_id": "WTI", "params": {"function": "WTI", "interval": "daily"}},
@@ -9,12 +10,23 @@ commodities = [
     {"commodity_id": "COF", "params": {"function": "COFFEE", "interval": "monthly"}},
 ]
 
-for commodity in commodities:
-    alphav_loader(
-        alphav_params=commodity["params"],
-        source_type="commodity",
-        symbol=commodity["commodity_id"],   
-        market="USD",                   
-        interval=commodity["params"]["interval"],
-        history_sweep=False
-    )
+def build_jobs():
+    return [
+        (
+            commodity["params"],
+            "commodity",
+            commodity["commodity_id"],
+            "USD",
+            commodity["params"]["interval"],
+        )
+        for commodity in commodities
+    ]
+
+
+def main(session=None):
+    return alphav_batch_loader(build_jobs(), session=session, history_sweep=False, run_name="alphav_commodity")
+
+
+if __name__ == "__main__":
+    apply_cli_flags()
+    main()
@@ -1,19 +1,26 @@
-from .utils.alphav_functions import alphav_loader
+from .utils.alphav_functions import alphav_batch_loader
+from .utils.http_client import apply_cli_flags
 
 cryptos = ["BTC", "ETH", "USDT", "USDC", "SOL"] 
 
-for crypto in cryptos:
-    params = {
-        "function": "DIGITAL_CURRENCY_DAILY",
-        "symbol" : crypto,
-        "market" : "USD"
-    }
-
-    alphav_loader(
-        alphav_params=params,
-        source_type="crypto",
-        symbol=crypto,
-        market="USD",
-        interval="daily",
-        history_sweep=True
-    )
\ No newline at end of file
+def build_jobs():
+    jobs = []
+    for crypto in cryptos:
+        params = {
+            "function": "DIGITAL_CURRENCY_DAILY",
+            "symbol" : crypto,
+            "market" : "USD"
+        }
+
+        jobs.append((params, "crypto", crypto, "USD", "daily"))
+
+    return jobs
+
+
+def main(session=None):
+    return alphav_batch_loader(build_jobs(), session=session, history_sweep=True, columnar=True, reconcile=True, run_name="alphav_crypto_daily")
+
+
+if __name__ == "__main__":
+    apply_cli_flags()
+    main()
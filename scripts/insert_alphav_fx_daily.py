@@ -1,19 +1,26 @@
-from .utils.alphav_functions import alphav_loader
+from .utils.alphav_functions import alphav_batch_loader
+from .utils.http_client import apply_cli_flags
 
 currencies = ["MXN", "CAD", "EUR", "GBP", "JPY"] 
 
-for currency in currencies:
-    params = {
-        "function": "FX_DAILY",
-        "from_symbol" : "USD",
-        "to_symbol" : currency
-    }
-
-    alphav_loader(
-        alphav_params=params,
-        source_type="fx",
-        symbol="USD",
-        market=currency,
-        interval="daily",
-        history_sweep=False
-    )
+def build_jobs():
+    jobs = []
+    for currency in currencies:
+        params = {
+            "function": "FX_DAILY",
+            "from_symbol" : "USD",
+            "to_symbol" : currency
+        }
+
+        jobs.append((params, "fx", "USD", currency, "daily"))
+
+    return jobs
+
+
+def main(session=None):
+    return alphav_batch_loader(build_jobs(), session=session, history_sweep=False, run_name="alphav_fx_daily")
+
+
+if __name__ == "__main__":
+    apply_cli_flags()
+    main()
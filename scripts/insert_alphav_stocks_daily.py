@@ -1,18 +1,25 @@
-from .utils.alphav_functions import alphav_loader
+from .utils.alphav_functions import alphav_batch_loader
+from .utils.http_client import apply_cli_flags
 
 symbols = ["AAPL", "MSFT", "AMZN", "TSLA", "NVDA", "META", "GOOGL", "GOOG"] 
 
-for symbol in symbols:
-    params = {
-        "function": "TIME_SERIES_DAILY",
-        "symbol": symbol, 
-    }
-
-    alphav_loader(
-        alphav_params=params,
-        source_type="stocks",
-        symbol=symbol,
-        market="USD",
-        interval="daily",
-        history_sweep=False
-    )
\ No newline at end of file
+def build_jobs():
+    jobs = []
+    for symbol in symbols:
+        params = {
+            "function": "TIME_SERIES_DAILY",
+            "symbol": symbol, 
+        }
+
+        jobs.append((params, "stocks", symbol, "USD", "daily"))
+
+    return jobs
+
+
+def main(session=None):
+    return alphav_batch_loader(build_jobs(), session=session, history_sweep=False, run_name="alphav_stocks_daily")
+
+
+if __name__ == "__main__":
+    apply_cli_flags()
+    main()
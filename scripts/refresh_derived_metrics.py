@@ -0,0 +1,13 @@
+import sys
+
+from .utils.derived import refresh_derived
+from .utils.rollups import refresh_rollups
+
+# Loaders keep the derived tables and rollups current; this catches up series loaded
+# before they existed. --full recomputes every series from scratch.
+def main(session=None, full=False):
+    return refresh_derived(session=session, full=full), refresh_rollups(session=session, full=full)
+
+
+if __name__ == "__main__":
+    main(full="--full" in sys.argv[1:])
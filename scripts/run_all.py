@@ -0,0 +1,35 @@
+from . import (
+    insert_alphav_commodity,
+    insert_alphav_crypto_daily,
+    insert_alphav_fx_daily,
+    insert_alphav_stocks_daily,
+    insert_coingecko_coins_list,
+    insert_coingecko_market_data,
+    insert_coingecko_price,
+    insert_investing_indices,
+)
+from .utils.engine import run_status, run_tasks
+from .utils.http_client import apply_cli_flags
+
+# (provider, name, loader) for a full refresh; every loader accepts session=
+tasks = [
+    ("alphavantage", "stocks daily", insert_alphav_stocks_daily.main),
+    ("alphavantage", "fx daily", insert_alphav_fx_daily.main),
+    ("alphavantage", "crypto daily", insert_alphav_crypto_daily.main),
+    ("alphavantage", "commodities", insert_alphav_commodity.main),
+    ("coingecko", "coins list", insert_coingecko_coins_list.main),
+    ("coingecko", "market data", insert_coingecko_market_data.main),
+    ("coingecko", "price", insert_coingecko_price.main),
+    ("investing", "indices", insert_investing_indices.main),
+]
+
+
+if __name__ == "__main__":
+    apply_cli_flags()
+    results = run_tasks(tasks)
+    for r in results:
+        if r["status"] != "ok":
+            print(f"FAILED {r['provider']}: {r['name']}: {r['error']}")
+    status = run_status(results)
+    print(f"Run status: {status}")
+    raise SystemExit(0 if status == "ok" else 1)
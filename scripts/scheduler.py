@@ -0,0 +1,161 @@
+import importlib
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils.db_session import DBSession
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Resident scheduler: one long-running process instead of a cron entry per script.
+#   python -m scripts.scheduler            run forever
+#   python -m scripts.scheduler --once     run every job once and exit
+#   python -m scripts.scheduler --only coingecko_price --only investing_indices
+#
+# Job modules are imported the first time their job runs, so a job whose provider
+# module fails to import (missing key, missing package) fails alone. After that the
+# module, its pooled HTTP client (keep-alive connections, rate limiter) and the shared
+# DBSession stay warm, so frequent jobs such as CoinGecko price pay no start-up cost.
+#
+# Intervals (seconds) can be overridden per job, e.g. GEDAP_INTERVAL_COINGECKO_PRICE=120.
+
+DAY = 24 * 60 * 60
+
+# (job name, insert module, default interval in seconds)
+JOBS = [
+    ("alphav_stocks_daily", "insert_alphav_stocks_daily", DAY),
+    ("alphav_fx_daily", "insert_alphav_fx_daily", DAY),
+    ("alphav_crypto_daily", "insert_alphav_crypto_daily", DAY),
+    ("alphav_commodity", "insert_alphav_commodity", DAY),
+    ("coingecko_coins_list", "insert_coingecko_coins_list", DAY),
+    ("coingecko_market_data", "insert_coingecko_market_data", 15 * 60),
+    ("coingecko_price", "insert_coingecko_price", 5 * 60),
+    ("investing_indices", "insert_investing_indices", 10 * 60),
+    ("investing_compaction", "compact_investing_indices", DAY),
+]
+
+# Jobs that may run at the same time (a job never overlaps with itself)
+MAX_WORKERS = int(os.environ.get("GEDAP_SCHEDULER_WORKERS", 4))
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: One scheduled job; the module is imported on first run.
+class Job:
+    def __init__(self, name, module, interval):
+        self.name = name
+        self.module = module
+        self.interval = int(os.environ.get(f"GEDAP_INTERVAL_{name.upper()}", interval))
+        self.next_run = 0.0
+        self.running = False
+        self.main = None
+
+    def load(self):
+        if self.main is None:
+            self.main = importlib.import_module(f".{self.module}", __package__).main
+        return self.main
+
+    def run(self, session):
+        start = time.monotonic()
+        try:
+            result = self.load()(session=session)
+            status = "ok"
+            # Batch loaders return (loaded, failed)
+            if isinstance(result, tuple) and len(result) == 2 and result[1]:
+                status = f"partial ({len(result[1])} failed)"
+        except Exception as e:
+            status = f"failed: {e}"
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {self.name} {status} in {time.monotonic() - start:.1f}s")
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 2: Dispatches due jobs to a thread pool; all jobs share one DBSession.
+class Scheduler:
+    def __init__(self, jobs, session, max_workers=MAX_WORKERS):
+        self.jobs = jobs
+        self.session = session
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+
+    def _run(self, job):
+        try:
+            job.run(self.session)
+        finally:
+            with self.lock:
+                job.running = False
+                job.next_run = time.monotonic() + job.interval
+
+    def dispatch(self):
+        now = time.monotonic()
+        with self.lock:
+            due = [job for job in self.jobs if not job.running and job.next_run <= now]
+            for job in due:
+                job.running = True
+        return [self.pool.submit(self._run, job) for job in due]
+
+    def seconds_until_next(self):
+        with self.lock:
+            pending = [job.next_run for job in self.jobs if not job.running]
+        if not pending:
+            return 1.0
+        return min(max(min(pending) - time.monotonic(), 0.0), 60.0)
+
+    def run_once(self):
+        for future in self.dispatch():
+            future.result()
+
+    def run_forever(self):
+        print(f"Scheduler started with {len(self.jobs)} jobs")
+        while not self.stopped.is_set():
+            self.dispatch()
+            self.stopped.wait(self.seconds_until_next())
+
+    def stop(self):
+        self.stopped.set()
+        self.pool.shutdown(wait=True)
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Select jobs from --only NAME arguments (all jobs by default).
+def select_jobs(argv):
+    only = {argv[i + 1] for i, arg in enumerate(argv[:-1]) if arg == "--only"}
+    unknown = only - {name for name, _, _ in JOBS}
+    if unknown:
+        raise SystemExit(f"Unknown job(s): {', '.join(sorted(unknown))}")
+    return [Job(*job) for job in JOBS if not only or job[0] in only]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    from .utils.http_client import apply_cli_flags
+    apply_cli_flags(argv)
+
+    jobs = select_jobs(argv)
+    with DBSession() as session:
+        scheduler = Scheduler(jobs, session)
+        # SIGTERM (systemd, docker stop) finishes running jobs, then exits
+        signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stopped.set())
+        try:
+            if "--once" in argv:
+                scheduler.run_once()
+            else:
+                scheduler.run_forever()
+        except KeyboardInterrupt:
+            print("Stopping scheduler, waiting for running jobs...")
+        finally:
+            scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,22 @@
 from dotenv import load_dotenv
 import os
-import requests
-import sqlite3
 import time
+from datetime import date as date_cls, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+
+from .db_session import session_scope
+from .columnar import column_rows, parse_series_columns, safe_float
+from .http_client import ThrottleError, get_client
+from .metadata_index import MetadataIndex, UPSERT_METADATA_SQL
+from .metrics import metrics
+from .derived import update_derived
+from .reconcile import record_revision
+from .rollups import update_rollups
+from .run_ledger import RunLedger, job_key
+from .schema import analyze_tables
+from .storage import storage_for
+from .stream_parser import parse_new_entries
 
 
 
@@ -10,28 +24,30 @@ import time
 # load .env by searching upward from this file until one is found
 load_dotenv()
 
-# Getting API key from environment variable
-ALPHAVANTAGE_API_KEY = os.environ.get("ALPHAVANTAGE_API_KEY")
-if not ALPHAVANTAGE_API_KEY:
-    raise RuntimeError("Missing ALPHAVANTAGE_API_KEY environment variable")
+# Pooled client for AlphaVantage. The API key is read when a job runs, not at import,
+# so a missing key only fails AlphaVantage jobs (not every module that imports this one).
+def alphavantage_client():
+    api_key = os.environ.get("ALPHAVANTAGE_API_KEY")
+    if not api_key:
+        raise RuntimeError("Missing ALPHAVANTAGE_API_KEY environment variable")
+    return get_client("alphavantage", params={"apikey": api_key})
 
 
 
 
 # ------------------------------------------------------------------------------------ 
 # Function 1: Return max_data_date or None if no metadata exists.
-def get_metadata(conn, source_type, symbol, market, interval):
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT max_data_date
-        FROM alphav_metadata
-        WHERE source_type = ?
-          AND symbol = ?
-          AND market = ?
-          AND interval = ?
-    """, (source_type, symbol, market, interval))
-
-    result = cursor.fetchone()
+GET_METADATA_SQL = """
+    SELECT max_data_date
+    FROM alphav_metadata
+    WHERE source_type = ?
+      AND symbol = ?
+      AND market = ?
+      AND interval = ?
+"""
+
+def get_metadata(session, source_type, symbol, market, interval):
+    result = session.fetchone(GET_METADATA_SQL, (source_type, symbol, market, interval))
     return result[0] if result else None
 
 
@@ -39,11 +55,12 @@ def get_metadata(conn, source_type, symbol, market, interval):
 
 # ------------------------------------------------------------------------------------ 
 # Function 2: Fetch data from AlphaVantage.
+# The shared client applies the account rate limit, retries and throttle detection
+# (a "Note"/"Information" payload raises ThrottleError, or QuotaExhaustedError for
+# the daily limit, instead of reading as empty).
 def fetch_alpha_vantage(alphav_params: dict):
-    url = "https://www.alphavantage.co/query"
-    alphav_params["apikey"] = ALPHAVANTAGE_API_KEY  
-    response = requests.get(url, params=alphav_params)
-    data = response.json()
+    client = alphavantage_client()
+    data = client.get_json("query", alphav_params)
 
     # ---- CASE 1: stocks, fx, crypto ----
     meta = data.get("Meta Data", {})
@@ -68,6 +85,76 @@ def fetch_alpha_vantage(alphav_params: dict):
 
 
 
+# ------------------------------------------------------------------------------------ 
+# Function 2.1: Incremental fetch that parses while downloading.
+# Entries are decoded as they stream in and reading stops at the first date that
+# is not newer than max_data_date, so the parse cost follows the size of the new data
+# (and the download too, unless a response cache is configured).
+# Returns (meta, rows, covered) with parsed rows in ascending date order and
+# covered=True when the payload reached back to max_data_date.
+# A payload without a time series was read whole into `top` and is checked here,
+# without a second request: error and quota payloads raise, an unexpected payload
+# reads as empty (no new rows, covered=True, so no full-history fallback request).
+# Only a throttle payload returns None, after the throttle window, so the caller
+# retries through fetch_alpha_vantage.
+def stream_alpha_vantage(alphav_params: dict, parser, max_data_date):
+    client = alphavantage_client()
+
+    # Parsing stops early, but with a response cache the whole body is still read and
+    # cached, so the run can be replayed (--replay) from the same request
+    with closing(client.stream_text("query", alphav_params, read_to_end=True)) as chunks:
+        top, rows, covered = parse_new_entries(chunks, parser, max_data_date)
+
+    if rows is None:
+        try:
+            client.check_payload(top)
+        except ThrottleError as e:
+            metrics.count("throttle_events", provider="alphavantage", reason="payload")
+            time.sleep(e.retry_after or 0)
+            return None
+        return top.get("Meta Data", {}), [], True
+    return top.get("Meta Data", {}), rows, covered
+
+
+
+
+# ------------------------------------------------------------------------------------ 
+# Function 2.2: Pick outputsize=compact when the missing dates fit in the compact window.
+# Only these functions accept outputsize; compact returns the latest 100 points.
+OUTPUTSIZE_FUNCTIONS = {"TIME_SERIES_DAILY", "TIME_SERIES_DAILY_ADJUSTED", "FX_DAILY"}
+COMPACT_POINTS = 100
+COMPACT_MARGIN = 10   # slack for holidays and late vendor updates
+
+def business_days_between(start, end):
+    start = date_cls.fromisoformat(start[:10])
+    end = date_cls.fromisoformat(end[:10])
+    if end <= start:
+        return 0
+    days = (end - start).days
+    weeks, rest = divmod(days, 7)
+    count = weeks * 5
+    for i in range(1, rest + 1):
+        if (start + timedelta(days=i)).weekday() < 5:
+            count += 1
+    return count
+
+def choose_outputsize(alphav_params, max_data_date, full_load, today=None):
+    params = dict(alphav_params)
+    if params.get("function") not in OUTPUTSIZE_FUNCTIONS or "outputsize" in alphav_params:
+        return params
+
+    if full_load or max_data_date is None:
+        params["outputsize"] = "full"
+        return params
+
+    today = today or date_cls.today().isoformat()
+    gap = business_days_between(max_data_date, today)
+    params["outputsize"] = "compact" if gap <= COMPACT_POINTS - COMPACT_MARGIN else "full"
+    return params
+
+
+
+
 # ------------------------------------------------------------------------------------ 
 # Function 3.1.1: Parse stocks rows    
 def parse_stocks_row(symbol, date, values):
@@ -108,85 +195,48 @@ def parse_crypto_row(crypto_code, fiat_currency, date, values):
 
 # Function 3.1.4: Parse commodity rows
 def parse_commodity_row(commodity_id, date, values):  
-    def _safe_float(val):
-        if val is None:
-            return None
-        s = str(val).strip()
-        # common placeholders for missing values
-        if s in ("", ".", "-", "—", "N/A", "na", "None"):
-            return None
-        # remove thousands separators and spaces
-        s = s.replace(",", "").replace(" ", "")
-        try:
-            return float(s)
-        except (ValueError, TypeError):
-            return None
-
     return (
         commodity_id,
         date,
-        _safe_float(values.get("value"))
+        safe_float(values.get("value"))
     )
 
+# Function 3.1.5: Columnar parse of a whole series.
+# Converts each field for all dates at once (NumPy when installed) and returns
+# executemany parameters zipped straight from the typed columns.
+def parse_columns(source_type, symbol, market, entries):
+    keys = (symbol,) if source_type in ("stocks", "commodity") else (symbol, market)
+    dates, columns = parse_series_columns(source_type, entries)
+    return column_rows(source_type, keys, dates, columns)
+
 
 
 
 # ------------------------------------------------------------------------------------ 
-# Function 3.2.0: Insert rows into tables -> helper function.
-def insert_rows(conn, insert_sql, rows):
-    cursor = conn.cursor()
-    cursor.executemany(insert_sql, rows)
-    conn.commit()
+# Target table per source type
+SOURCE_TABLES = {
+    "stocks": "alphav_stocks_daily",
+    "fx": "alphav_fx_daily",
+    "crypto": "alphav_crypto_daily",
+    "commodity": "alphav_commodity",
+}
+
+UPSERT_COMMODITY_LOOKUP_SQL = """
+    INSERT INTO alphav_commodity_lookup
+    (commodity_id, commodity_name, interval, unit)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(commodity_id) DO UPDATE SET
+        commodity_name = excluded.commodity_name,
+        interval = excluded.interval,
+        unit = excluded.unit
+"""
     
-# Function 3.2.1: Insert stocks rows into alphav_stocks_daily table.
-def insert_stocks_rows(conn, rows):
-    insert_sql = """
-        INSERT OR IGNORE INTO alphav_stocks_daily
-        (symbol, date, open, high, low, close, volume)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """
-    insert_rows(conn, insert_sql, rows)
-
-# Function 3.2.2: Insert fx rows into alphav_fx_daily table.
-def insert_fx_rows(conn, rows):
-    insert_sql = """
-        INSERT OR IGNORE INTO alphav_fx_daily
-        (from_currency, to_currency, date, open, high, low, close)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """
-    insert_rows(conn, insert_sql, rows)
-
-# Function 3.2.3: Insert crypto rows into alphav_crypto_daily table.
-def insert_crypto_rows(conn, rows):
-    insert_sql = """
-        INSERT OR IGNORE INTO alphav_crypto_daily
-        (crypto_code, fiat_currency, date, open, high, low, close, volume)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """
-    insert_rows(conn, insert_sql, rows)
-
-# Function 3.2.4: Insert commodity rows into alphav_commodity table.
-def insert_commodities_rows(conn, rows):
-    insert_sql = """
-        INSERT OR IGNORE INTO alphav_commodity
-        (commodity_id, date, value)
-        VALUES (?, ?, ?)
-    """
-    insert_rows(conn, insert_sql, rows)
-
 # Function 3.2.5: Upsert commodity metadata into alphav_commodity_lookup table.
-def upsert_commodity_lookup(conn, commodity_id, commodity_name, interval, unit):
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO alphav_commodity_lookup
+def upsert_commodity_lookup(session, commodity_id, commodity_name, interval, unit):
+    session.execute(
+        UPSERT_COMMODITY_LOOKUP_SQL,
         (commodity_id, commodity_name, interval, unit)
-        VALUES (?, ?, ?, ?)
-        ON CONFLICT(commodity_id) DO UPDATE SET
-            commodity_name = excluded.commodity_name,
-            interval = excluded.interval,
-            unit = excluded.unit
-    """, (commodity_id, commodity_name, interval, unit))
-    conn.commit()
+    )
 
 
 
@@ -194,27 +244,21 @@ def upsert_commodity_lookup(conn, commodity_id, commodity_name, interval, unit):
 # ------------------------------------------------------------------------------------ 
 # Function 4.0: Filter and sort series data
 def filter_and_sort(series, max_data_date, full_load):
-    print(f"DEBUG filter_and_sort: full_load={full_load}, max_data_date={max_data_date}")
-    
     # Case 1: dict-based time series (stocks, fx, crypto)
     if isinstance(series, dict):
-        print(f"DEBUG: Processing dict-based series with {len(series)} items")
         rows = [
             (date, values)
             for date, values in series.items()
             if full_load or date > max_data_date
         ]
-        print(f"DEBUG: After filtering, {len(rows)} rows remain")
         return sorted(rows, key=lambda x: x[0])
 
     # Case 2: list-based series (commodities)
-    print(f"DEBUG: Processing list-based series with {len(series)} items")
     rows = [
         (item["date"], item)
         for item in series
         if full_load or item["date"] > max_data_date
     ]
-    print(f"DEBUG: After filtering, {len(rows)} rows remain")
     return sorted(rows, key=lambda x: x[0])
 
 
@@ -232,124 +276,337 @@ def extract_date(row, source_type):
 
 # ------------------------------------------------------------------------------------ 
 # Function 6: Upsert metadata for Alphavantage
-def upsert_metadata(conn, source_type, symbol, market, interval, max_data_date, api_last_refresh):
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO alphav_metadata (
-            source_type, symbol, market, interval, max_data_date, api_last_refresh
-        )
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(source_type, symbol, market, interval)
-        DO UPDATE SET 
-            max_data_date = excluded.max_data_date,
-            api_last_refresh = excluded.api_last_refresh,
-            update_date = CURRENT_TIMESTAMP
-    """, (source_type, symbol, market, interval, max_data_date, api_last_refresh))
-
-    conn.commit()
+def upsert_metadata(session, source_type, symbol, market, interval, max_data_date, api_last_refresh):
+    session.execute(
+        UPSERT_METADATA_SQL,
+        (source_type, symbol, market, interval, max_data_date, api_last_refresh)
+    )
 
 
 
 
 # ------------------------------------------------------------------------------------ 
-# Function X: alphav_loader
-def alphav_loader(alphav_params, source_type, symbol, market="USD", interval="daily", history_sweep=False):
-    conn = sqlite3.connect("./GEDAP_DB.db")
-    conn.execute("PRAGMA foreign_keys = ON;")
-
-    print(f"=== Loading {source_type}, {symbol} , {market} ===")
-
-    # ----------------------------------------------------
-    # 1. Look up metadata to determine full vs incremental
+# Function 7.1: Decide full vs incremental load from stored metadata.
+# With a MetadataIndex the lookup is served from memory instead of a query.
+def resolve_load_window(session, source_type, symbol, market, interval, history_sweep=False, metadata=None):
     if history_sweep:
         max_data_date = None
         full_load = True
+    elif metadata is not None:
+        max_data_date = metadata.max_data_date(source_type, symbol, market, interval)
+        full_load = max_data_date is None
     else:
-        max_data_date = get_metadata(conn, source_type, symbol, market, interval)
+        max_data_date = get_metadata(session, source_type, symbol, market, interval)
         full_load = max_data_date is None
 
     print(f"Max data date = {max_data_date}")
     print("Performing FULL LOAD" if full_load else "Performing INCREMENTAL LOAD")
 
-    # ----------------------------------------------------
-    # 2. Fetch data from AlphaVantage
-    meta, series = fetch_alpha_vantage(alphav_params)
+    return max_data_date, full_load
 
-    api_last_refresh = next(
-        (v for k, v in meta.items() if "Last Refreshed" in k),
-        None
-    )
 
-    # ----------------------------------------------------
-    # 3. Parse API into rows
+# Function 7.2.1: Fetch and parse the entries newer than max_data_date.
+# Returns (meta, rows, covered); see stream_alpha_vantage for `covered`.
+def fetch_entries(alphav_params, parser, source_type, max_data_date, full_load):
+    # The shared client's limiter only blocks when quota is spent.
+    # Incremental time-series loads stream and stop at max_data_date;
+    # full loads and commodities (list payloads) parse the whole response.
+    if not full_load and source_type != "commodity":
+        # Download and parse overlap here, so they are timed as one stage
+        with metrics.stage("stream_fetch_parse"):
+            streamed = stream_alpha_vantage(alphav_params, parser, max_data_date)
+        if streamed is not None:
+            return streamed
+
+    with metrics.stage("fetch"):
+        meta, series = fetch_alpha_vantage(alphav_params)
+
+    with metrics.stage("filter"):
+        filtered_rows = filter_and_sort(series, max_data_date, full_load)
+
+    with metrics.stage("parse"):
+        new_rows = [
+            parser(date, values)
+            for date, values in filtered_rows
+        ]
+
+    dates = series.keys() if isinstance(series, dict) else (item["date"] for item in series)
+    covered = full_load or any(date <= max_data_date for date in dates)
+
+    return meta, new_rows, covered
+
+
+# Function 7.2: Fetch from AlphaVantage and parse into table rows (no DB access).
+# columnar=True parses the selected entries column by column (see parse_columns).
+def fetch_and_parse(alphav_params, source_type, symbol, market, max_data_date, full_load, columnar=False):
+    with metrics.labels(provider="alphavantage", source_type=source_type, symbol=symbol, market=market):
+        return _fetch_and_parse(alphav_params, source_type, symbol, market, max_data_date, full_load, columnar)
+
+
+def _fetch_and_parse(alphav_params, source_type, symbol, market, max_data_date, full_load, columnar):
     if source_type == "stocks":
         parser = lambda date, values: parse_stocks_row(symbol, date, values)
-        inserter = insert_stocks_rows
-        
     elif source_type == "fx":
         parser = lambda date, values: parse_fx_row(symbol, market, date, values)
-        inserter = insert_fx_rows
-
     elif source_type == "crypto":
         parser = lambda date, values: parse_crypto_row(symbol, market, date, values)
-        inserter = insert_crypto_rows
-
     elif source_type == "commodity":
         parser = lambda date, values: parse_commodity_row(symbol, date, values)
-        inserter = insert_commodities_rows
+    else:
+        raise ValueError(f"Invalid source_type: {source_type}")
 
+    # Columnar mode keeps raw (date, values) entries and converts them in bulk below
+    if columnar:
+        parser = lambda date, values: (date, values)
+
+    # Small gaps only need the compact window; first loads and large gaps get full
+    params = choose_outputsize(alphav_params, max_data_date, full_load)
+    meta, new_rows, covered = fetch_entries(params, parser, source_type, max_data_date, full_load)
+
+    # The compact window must reach back to max_data_date, otherwise dates in
+    # between would be skipped: fall back to the full history.
+    if not covered and params.get("outputsize") == "compact":
+        print("Compact window does not reach max_data_date; refetching full history.")
+        params["outputsize"] = "full"
+        meta, new_rows, covered = fetch_entries(params, parser, source_type, max_data_date, full_load)
+
+    # A full payload that still misses max_data_date would leave a hole before the
+    # new rows; fail the load rather than write them.
+    if not covered:
+        raise ValueError(
+            f"{source_type} {symbol} {market}: payload does not reach back to {max_data_date}"
+        )
+
+    # new_rows is ascending by date either way
+    row_count = len(new_rows)
+    new_max_date = new_rows[-1][0] if new_rows and columnar else None
+    if columnar:
+        with metrics.stage("parse"):
+            new_rows = parse_columns(source_type, symbol, market, new_rows)
+    elif new_rows:
+        new_max_date = extract_date(new_rows[-1], source_type)
+
+    api_last_refresh = next(
+        (v for k, v in meta.items() if "Last Refreshed" in k),
+        None
+    )
+
+    metrics.count("rows_parsed", row_count)
+
+    return {
+        "meta": meta,
+        "rows": new_rows,
+        "row_count": row_count,
+        "max_data_date": new_max_date,
+        "api_last_refresh": api_last_refresh,
+    }
+
+
+# Function 7.3: Write parsed rows and metadata for one symbol.
+# Runs inside a transaction: on its own it commits once per symbol, inside the
+# caller's transaction it joins the batch. With a MetadataIndex the metadata
+# update is buffered in the index and written by its flush().
+# Bars are written through the configured storage backend (see storage.py).
+# reconcile=True writes only new and revised bars (storage upsert) instead of an
+# append that skips stored dates, and records the revision counts.
+def write_load_result(session, result, source_type, symbol, market, interval, metadata=None, reconcile=False):
+    with metrics.labels(provider="alphavantage", source_type=source_type, symbol=symbol, market=market):
+        with session.transaction():
+            _write_load_result(session, result, source_type, symbol, market, interval, metadata, reconcile)
+
+
+def _write_load_result(session, result, source_type, symbol, market, interval, metadata, reconcile):
+    meta = result["meta"]
+    new_rows = result["rows"]
+    row_count = result["row_count"]
+    storage = storage_for(session)
+
+    if source_type not in SOURCE_TABLES:
+        raise ValueError(f"Invalid source_type: {source_type}")
+    if source_type == "commodity":
         # Upsert metadata into the commodity lookup table
         upsert_commodity_lookup(
-            conn,
+            session,
             symbol,
             meta.get("name"),
             meta.get("interval"),
             meta.get("unit")
         )
 
+    # ----------------------------------------------------
+    # Insert into appropriate table
+    revised_since = None
+    if row_count and reconcile:
+        with metrics.stage("reconcile"):
+            counts = storage.upsert(source_type, new_rows)
+            record_revision(session, source_type, symbol, market, interval, counts)
+        metrics.count("rows_inserted", counts["new"])
+        metrics.count("rows_updated", counts["changed"])
+        metrics.count("rows_ignored", counts["unchanged"])
+        # Derived stages restart at the earliest bar written (gaps filled or revised)
+        written = [d for d in (counts["first_changed_date"], counts["first_new_date"]) if d]
+        revised_since = min(written) if written else None
+        print(f"Reconciled {row_count} rows: {counts['new']} new, {counts['changed']} revised, {counts['unchanged']} unchanged.")
+    elif row_count:
+        with metrics.stage("insert"):
+            inserted = storage.append(source_type, new_rows)
+        # rowcount is -1 when the driver cannot tell; assume everything was written
+        inserted = row_count if inserted is None or inserted < 0 else inserted
+        metrics.count("rows_inserted", inserted)
+        metrics.count("rows_ignored", row_count - inserted)
+        print(f"Inserted {inserted} new rows ({row_count - inserted} already stored).")
     else:
-        conn.close()
-        raise ValueError(f"Invalid source_type: {source_type}")
+        print("No new rows found.")
 
     # ----------------------------------------------------
-    # 4. Filter → sort → parse
+    # Recompute the derived metrics over the trailing window the new rows affect,
+    # and the rollup buckets from the one holding the first new date (SQL stages
+    # over the session's tables: only when the bars are stored there)
+    if row_count and storage.session_tables:
+        update_derived(session, source_type, symbol, market, since=revised_since)
+        update_rollups(session, source_type, symbol, market, interval, since=revised_since)
 
-    filtered_rows = filter_and_sort(series, max_data_date, full_load)
+    # ----------------------------------------------------
+    # Upsert metadata (not updated when no new data was retrieved)
+    if row_count and metadata is not None:
+        metadata.update(
+            source_type, symbol, market, interval,
+            result["max_data_date"], result["api_last_refresh"]
+        )
+    elif row_count:
+        with metrics.stage("metadata"):
+            upsert_metadata(
+                session,
+                source_type=source_type,
+                symbol=symbol,
+                market=market,
+                interval=interval,
+                max_data_date=result["max_data_date"],
+                api_last_refresh=result["api_last_refresh"]
+            )
 
-    new_rows = [
-        parser(date, values)
-        for date, values in filtered_rows
-    ]
 
-    if new_rows:
-        print(f"Parsed {len(new_rows)} rows.")
 
-    # ----------------------------------------------------
-    # 5. Insert into appropriate table
-    if new_rows:
-        inserter(conn, new_rows)
-        print(f"Inserted {len(new_rows)} new rows.")
 
-        max_data_date = extract_date(new_rows[-1], source_type)
-    else:
-        print("No new rows found.")
+# ------------------------------------------------------------------------------------ 
+# Function X: alphav_loader
+# Pass `session` to share one connection across loaders; otherwise a private
+# session is opened and closed for this call. columnar=True uses the columnar parser,
+# which pays off on full-history loads.
+def alphav_loader(alphav_params, source_type, symbol, market="USD", interval="daily", history_sweep=False, session=None, columnar=False, reconcile=False):
+    print(f"=== Loading {source_type}, {symbol} , {market} ===")
 
-    # ----------------------------------------------------
-    # 6. Upsert metadata
-    if new_rows:
-        upsert_metadata(
-            conn,
-            source_type=source_type,
-            symbol=symbol,
-            market=market,
-            interval=interval,
-            max_data_date=max_data_date,
-            api_last_refresh=api_last_refresh
+    with session_scope(session) as session:
+        # 1. Look up metadata to determine full vs incremental
+        max_data_date, full_load = resolve_load_window(
+            session, source_type, symbol, market, interval, history_sweep
+        )
+
+        # 2. Fetch → filter → sort → parse
+        result = fetch_and_parse(
+            alphav_params, source_type, symbol, market, max_data_date, full_load, columnar
         )
-        print("Metadata updated.")
-    else:
-        print("Metadata NOT updated; no new data retrieved.")
 
-    conn.close()
+        # 3. Insert rows and upsert metadata in one transaction
+        write_load_result(session, result, source_type, symbol, market, interval, reconcile=reconcile)
 
-    time.sleep(15)  # throttle calls to avoid rate limits
+    metrics.flush()
+
+
+
+
+# ------------------------------------------------------------------------------------ 
+# Function Y: alphav_batch_loader
+# jobs: list of (alphav_params, source_type, symbol, market, interval) tuples.
+# Fetches run concurrently under the client's shared rate limiter; DB reads and writes stay
+# on the calling thread so SQLite only ever sees one writer.
+# By default each symbol commits on its own, so one bad symbol does not undo the
+# rest. single_transaction=True writes the whole batch in one transaction (one
+# fsync); a write error then rolls back every symbol in the batch.
+# Metadata is read once into a MetadataIndex and written back in one bulk upsert at
+# the end of the batch. In per-symbol mode that upsert commits after the rows, so a
+# crash in between only means those dates are re-fetched (inserts are idempotent).
+# run_name records the batch in the run ledger (see run_ledger.py): a rerun on the
+# same day only loads the jobs that failed or never finished. A resumed run skips
+# the jobs marked ok, so with a ledger each job's metadata is flushed in the
+# transaction that writes its rows and marks it ok.
+def alphav_batch_loader(jobs, history_sweep=False, max_workers=4, session=None, single_transaction=False, columnar=False, reconcile=False, run_name=None):
+    loaded = []
+    failed = []
+
+    with session_scope(session) as session:
+        ledger = None
+        if run_name is not None:
+            ledger = RunLedger(session, run_name)
+            remaining = set(ledger.pending([job_key(*job[1:]) for job in jobs]))
+            jobs = [job for job in jobs if job_key(*job[1:]) in remaining]
+
+        metadata = MetadataIndex(session)
+        if single_transaction:
+            with session.transaction():
+                _run_batch(session, metadata, jobs, history_sweep, max_workers, columnar, reconcile, ledger, loaded, failed, True)
+                with metrics.stage("metadata", provider="alphavantage"):
+                    metadata.flush()
+            if ledger is not None:
+                ledger.finish()
+        else:
+            try:
+                _run_batch(session, metadata, jobs, history_sweep, max_workers, columnar, reconcile, ledger, loaded, failed, False)
+            finally:
+                with metrics.stage("metadata", provider="alphavantage"):
+                    metadata.flush()
+                if ledger is not None:
+                    ledger.finish()
+
+        # Refresh planner statistics for the tables this batch wrote to
+        if loaded:
+            analyze_tables(session, [SOURCE_TABLES[source_type] for source_type, *_ in loaded] + ["alphav_metadata"])
+
+    metrics.flush()
+    return loaded, failed
+
+
+def _run_batch(session, metadata, jobs, history_sweep, max_workers, columnar, reconcile, ledger, loaded, failed, atomic):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for alphav_params, source_type, symbol, market, interval in jobs:
+            print(f"=== Queueing {source_type}, {symbol} , {market} ===")
+            max_data_date, full_load = resolve_load_window(
+                session, source_type, symbol, market, interval, history_sweep, metadata
+            )
+            future = executor.submit(
+                fetch_and_parse,
+                alphav_params, source_type, symbol, market, max_data_date, full_load, columnar
+            )
+            futures[future] = (source_type, symbol, market, interval)
+
+        for future in as_completed(futures):
+            source_type, symbol, market, interval = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Load failed for {source_type}, {symbol}, {market}: {e}")
+                failed.append((source_type, symbol, market, interval))
+                if ledger is not None:
+                    ledger.mark(job_key(source_type, symbol, market, interval), "failed", str(e))
+                continue
+
+            print(f"=== Writing {source_type}, {symbol} , {market} ===")
+            try:
+                # The ledger entry commits with the rows and (per-symbol mode) the metadata
+                with session.transaction():
+                    write_load_result(session, result, source_type, symbol, market, interval, metadata, reconcile)
+                    if ledger is not None:
+                        if not atomic:
+                            metadata.flush()
+                        ledger.mark(job_key(source_type, symbol, market, interval), "ok")
+            except Exception as e:
+                if atomic:
+                    raise
+                print(f"Write failed for {source_type}, {symbol}, {market}: {e}")
+                failed.append((source_type, symbol, market, interval))
+                if ledger is not None:
+                    ledger.mark(job_key(source_type, symbol, market, interval), "failed", str(e))
+                continue
+
+            loaded.append((source_type, symbol, market, interval))
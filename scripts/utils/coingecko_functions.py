@@ -0,0 +1,406 @@
+import hashlib
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+from dotenv import load_dotenv
+
+from .db_session import session_scope
+from .http_client import get_client
+from .metrics import metrics
+
+
+# load .env from repo root (two levels above scripts/utils/)
+env_path = Path(__file__).resolve().parents[2] / ".env"
+if env_path.exists():
+    load_dotenv(env_path)
+
+
+### General setup for CoinGecko API
+
+# Pooled client shared by every CoinGecko endpoint (keep-alive, retries, rate limit).
+# The API key is read when a job runs, not at import.
+def coingecko_client():
+    api_key = os.environ.get("COINGECKO_API_KEY")
+    if not api_key:
+        raise RuntimeError("Missing COINGECKO_API_KEY environment variable")
+
+    # Define the headers with API key
+    headers = {
+        "accept": "application/json",
+        "x-cg-demo-api-key": api_key
+    }
+    return get_client("coingecko", headers=headers)
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: coingecko_coins_list
+# Diff-based sync: the download is hashed and compared with the digest stored in
+# sync_state; when it changed, it is loaded into a temp table and only the
+# differences are applied (anti-joins), in one transaction:
+#   new ids -> INSERT, changed symbol/name -> UPDATE, ids no longer listed -> DELETE.
+# Deletes are skipped when the download is much smaller than the stored list, so a
+# truncated response cannot wipe the table.
+COINS_LIST_SYNC = "coingecko_coins_list"
+MIN_DELETE_RATIO = 0.5
+
+CREATE_COINS_LIST_STAGE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS coins_list_incoming (
+        api_id  TEXT PRIMARY KEY,
+        symbol  TEXT,
+        name    TEXT
+    )
+"""
+
+INSERT_COINS_LIST_STAGE_SQL = """
+    INSERT OR REPLACE INTO coins_list_incoming (api_id, symbol, name)
+    VALUES (?, ?, ?)
+"""
+
+INSERT_NEW_COINS_SQL = """
+    INSERT INTO coingecko_coins_list (api_id, symbol, name)
+    SELECT i.api_id, i.symbol, i.name
+    FROM coins_list_incoming AS i
+    WHERE NOT EXISTS (
+        SELECT 1 FROM coingecko_coins_list AS c WHERE c.api_id = i.api_id
+    )
+"""
+
+UPDATE_CHANGED_COINS_SQL = """
+    UPDATE coingecko_coins_list
+    SET (symbol, name) = (
+        SELECT i.symbol, i.name FROM coins_list_incoming AS i
+        WHERE i.api_id = coingecko_coins_list.api_id
+    )
+    WHERE api_id IN (
+        SELECT i.api_id
+        FROM coins_list_incoming AS i
+        JOIN coingecko_coins_list AS c ON c.api_id = i.api_id
+        WHERE c.symbol IS NOT i.symbol OR c.name IS NOT i.name
+    )
+"""
+
+DELETE_DELISTED_COINS_SQL = """
+    DELETE FROM coingecko_coins_list
+    WHERE NOT EXISTS (
+        SELECT 1 FROM coins_list_incoming AS i WHERE i.api_id = coingecko_coins_list.api_id
+    )
+"""
+
+GET_SYNC_DIGEST_SQL = "SELECT digest FROM sync_state WHERE name = ?"
+
+UPSERT_SYNC_STATE_SQL = """
+    INSERT INTO sync_state (name, digest, row_count, synced_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (name) DO UPDATE SET
+        digest = excluded.digest,
+        row_count = excluded.row_count,
+        synced_at = excluded.synced_at
+"""
+
+def snapshot_digest(rows):
+    digest = hashlib.sha256()
+    for row in sorted(rows):
+        digest.update("\x1f".join("" if v is None else str(v) for v in row).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+def sync_coins_list(session, rows):
+    digest = snapshot_digest(rows)
+    stored = session.fetchone(GET_SYNC_DIGEST_SQL, (COINS_LIST_SYNC,))
+    if stored is not None and stored[0] == digest:
+        return {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": True}
+
+    with session.transaction():
+        session.execute(CREATE_COINS_LIST_STAGE_SQL)
+        session.execute("DELETE FROM coins_list_incoming")
+        session.executemany(INSERT_COINS_LIST_STAGE_SQL, rows)
+
+        existing = session.fetchone("SELECT COUNT(*) FROM coingecko_coins_list")[0]
+        incoming = session.fetchone("SELECT COUNT(*) FROM coins_list_incoming")[0]
+
+        inserted = session.execute(INSERT_NEW_COINS_SQL).rowcount
+        updated = session.execute(UPDATE_CHANGED_COINS_SQL).rowcount
+        if incoming >= existing * MIN_DELETE_RATIO:
+            deleted = session.execute(DELETE_DELISTED_COINS_SQL).rowcount
+        else:
+            print(f"Skipping deletes: received {incoming} coins, {existing} stored.")
+            deleted = 0
+
+        session.execute("DROP TABLE coins_list_incoming")
+        session.execute(UPSERT_SYNC_STATE_SQL, (COINS_LIST_SYNC, digest, incoming))
+
+    return {"inserted": inserted, "updated": updated, "deleted": deleted, "unchanged": False}
+
+def coins_list_loader(session=None):
+    with metrics.labels(provider="coingecko", job="coins_list"):
+        # Make the GET request and parse JSON
+        with metrics.stage("fetch"):
+            parsed_json = coingecko_client().get_json("coins/list")
+
+        rows = []
+        with metrics.stage("parse"):
+            for coin in parsed_json:
+                try:
+                    rows.append((coin["id"], coin["symbol"], coin["name"]))
+                except KeyError as e:
+                    print(f"Missing key in entry: {coin} — {e}")
+        metrics.count("rows_parsed", len(rows))
+
+        with session_scope(session) as session:
+            with metrics.stage("sync"):
+                counts = sync_coins_list(session, rows)
+        metrics.count("rows_inserted", counts["inserted"])
+        metrics.count("rows_updated", counts["updated"])
+        metrics.count("rows_deleted", counts["deleted"])
+
+    metrics.flush()
+    if counts["unchanged"]:
+        print("Coins list unchanged; nothing to write.")
+    else:
+        print(f"Coins list synced: {counts['inserted']} inserted, {counts['updated']} updated, {counts['deleted']} deleted.")
+    return counts
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: coingecko_market_data
+# Paginated collector for the top `top_n` coins by market cap. Pages are requested
+# concurrently (under the client's rate limit) with at most `max_workers` pages in
+# flight, and each page is written with one executemany as soon as it arrives, so
+# memory stays bounded to a few pages whatever top_n is.
+# Every run is stored as a snapshot: all rows share one snapshot_time. A run that
+# fails part-way removes its partial snapshot.
+MARKET_DATA_TOP_N = int(os.environ.get("COINGECKO_MARKET_TOP_N", 5000))
+MARKET_DATA_PER_PAGE = 250      # API maximum
+MARKET_DATA_WORKERS = 4
+
+INSERT_MARKET_DATA_SQL = """
+INSERT OR IGNORE INTO coingecko_market_data (
+    id, symbol, name, image, current_price, market_cap, market_cap_rank,
+    fully_diluted_valuation, total_volume, high_24h, low_24h, price_change_24h,
+    price_change_percentage_24h, market_cap_change_24h, market_cap_change_percentage_24h,
+    circulating_supply, total_supply, max_supply, ath, ath_change_percentage,
+    ath_date, atl, atl_change_percentage, atl_date, roi_times, roi_currency,
+    roi_percentage, last_updated, snapshot_time
+) VALUES (
+    ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+)
+"""
+
+DELETE_MARKET_SNAPSHOT_SQL = "DELETE FROM coingecko_market_data WHERE snapshot_time = ?"
+
+def parse_market_data_row(coin, snapshot_time):
+    roi = coin.get("roi") or {}
+    return (
+        coin.get("id"),
+        coin.get("symbol"),
+        coin.get("name"),
+        coin.get("image"),
+        coin.get("current_price"),
+        coin.get("market_cap"),
+        coin.get("market_cap_rank"),
+        coin.get("fully_diluted_valuation"),
+        coin.get("total_volume"),
+        coin.get("high_24h"),
+        coin.get("low_24h"),
+        coin.get("price_change_24h"),
+        coin.get("price_change_percentage_24h"),
+        coin.get("market_cap_change_24h"),
+        coin.get("market_cap_change_percentage_24h"),
+        coin.get("circulating_supply"),
+        coin.get("total_supply"),
+        coin.get("max_supply"),
+        coin.get("ath"),
+        coin.get("ath_change_percentage"),
+        coin.get("ath_date"),
+        coin.get("atl"),
+        coin.get("atl_change_percentage"),
+        coin.get("atl_date"),
+        roi.get("times"),
+        roi.get("currency"),
+        roi.get("percentage"),
+        coin.get("last_updated"),
+        snapshot_time
+    )
+
+def fetch_market_page(page, per_page):
+    params = {
+        "vs_currency": "usd",
+        "order": "market_cap_desc",
+        "per_page": per_page,
+        "page": page,
+        "sparkline": "false"
+    }
+    # Runs on a worker thread: labels are set here, not inherited from the caller
+    with metrics.labels(provider="coingecko", job="market_data"), metrics.stage("fetch"):
+        return coingecko_client().get_json("coins/markets", params)
+
+def market_data_loader(session=None, top_n=MARKET_DATA_TOP_N, per_page=MARKET_DATA_PER_PAGE, max_workers=MARKET_DATA_WORKERS):
+    snapshot_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    written = 0
+
+    with metrics.labels(provider="coingecko", job="market_data"), session_scope(session) as session:
+        try:
+            written = _collect_market_pages(session, top_n, per_page, max_workers, snapshot_time)
+        except BaseException:
+            with session.transaction():
+                session.execute(DELETE_MARKET_SNAPSHOT_SQL, (snapshot_time,))
+            raise
+
+    metrics.flush()
+    print(f"Market data snapshot {snapshot_time}: {written} coins.")
+    return written
+
+def _collect_market_pages(session, top_n, per_page, max_workers, snapshot_time):
+    written = 0
+    next_page = 1
+    last_page = -(-top_n // per_page)   # lowered when a short page shows the end of the market
+
+    # Pages are prefetched, so pages past the end of the market may be requested
+    # before the short last page is seen. A failed page (e.g. a replay cache miss) is
+    # only an error if it turns out not to be past the end; no new pages are
+    # requested after a failure.
+    failed = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+        while in_flight or (not failed and next_page <= last_page):
+            # Keep at most max_workers pages requested but not yet written
+            while not failed and next_page <= last_page and len(in_flight) < max_workers:
+                in_flight[executor.submit(fetch_market_page, next_page, per_page)] = next_page
+                next_page += 1
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = in_flight.pop(future)
+                try:
+                    coins = future.result()
+                except Exception as e:
+                    failed[page] = e
+                    continue
+                if page > last_page:
+                    continue   # past the end of the market
+                if len(coins) < per_page:
+                    last_page = min(last_page, page)
+                # The last page may run past top_n
+                coins = coins[:max(top_n - (page - 1) * per_page, 0)]
+
+                with metrics.stage("parse"):
+                    rows = [parse_market_data_row(coin, snapshot_time) for coin in coins]
+                metrics.count("rows_parsed", len(rows))
+
+                with metrics.stage("insert"), session.transaction():
+                    inserted = session.executemany(INSERT_MARKET_DATA_SQL, rows).rowcount
+                metrics.count("rows_inserted", inserted)
+                # A coin can move across a page boundary between requests
+                metrics.count("rows_ignored", len(rows) - inserted)
+                written += inserted
+
+    errors = [failed[page] for page in sorted(failed) if page <= last_page]
+    if errors:
+        raise errors[0]
+    return written
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 3: coingecko_price
+# Prices every id in the universe: explicit ids, else the watchlist file
+# (COINGECKO_WATCHLIST, one id per line), else every coin in coingecko_coins_list,
+# else DEFAULT_PRICE_IDS. Ids are split into chunks whose query string stays under
+# MAX_IDS_QUERY_LENGTH, the chunks are fetched concurrently under the rate limit,
+# and all rows are written with one executemany in one transaction.
+DEFAULT_PRICE_IDS = ["bitcoin", "ethereum", "ripple", "tether", "dogecoin", "solana"]
+PRICE_CURRENCIES = ["usd", "cad", "mxn", "gbp"]
+WATCHLIST_PATH = os.environ.get("COINGECKO_WATCHLIST")
+# URL-encoded length of the ids parameter; keeps the whole URL well under common 8 KB limits
+MAX_IDS_QUERY_LENGTH = int(os.environ.get("COINGECKO_IDS_QUERY_LENGTH", 4000))
+PRICE_WORKERS = 4
+
+INSERT_PRICE_SQL = """
+    INSERT OR IGNORE INTO coingecko_price
+    (crypto, currency, price, market_cap, "24h_vol", "24h_change", last_updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+def read_watchlist(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+def price_ids(session, ids=None, watchlist=WATCHLIST_PATH):
+    if ids:
+        return list(dict.fromkeys(ids))
+    if watchlist:
+        return list(dict.fromkeys(read_watchlist(watchlist)))
+    stored = [row[0] for row in session.fetchall("SELECT api_id FROM coingecko_coins_list ORDER BY api_id")]
+    return stored or list(DEFAULT_PRICE_IDS)
+
+# Function 3.1: Split ids so each request's ids parameter stays under max_length
+# once URL-encoded (a comma becomes %2C).
+def chunk_ids(ids, max_length=MAX_IDS_QUERY_LENGTH):
+    chunks, chunk, length = [], [], 0
+    for coin_id in ids:
+        size = len(quote(coin_id, safe="")) + (3 if chunk else 0)
+        if chunk and length + size > max_length:
+            chunks.append(chunk)
+            chunk, length = [], 0
+            size -= 3
+        chunk.append(coin_id)
+        length += size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+def fetch_price_chunk(ids, currencies):
+    params = {
+        "ids": ",".join(ids),
+        "vs_currencies": ",".join(currencies),  # Convert price to differnt currencies
+        "include_market_cap": "true",
+        "include_24hr_vol": "true",
+        "include_24hr_change": "true",
+        "include_last_updated_at": "true",
+        "precision": "2"  # Decimal precision
+    }
+    # Runs on a worker thread: labels are set here, not inherited from the caller
+    with metrics.labels(provider="coingecko", job="price"), metrics.stage("fetch"):
+        return coingecko_client().get_json("simple/price", params)
+
+# Function 3.2: Flatten {id: {cur: price, cur_market_cap: ..., last_updated_at: ...}}
+# into (crypto, currency, price, market_cap, vol, change, last_updated_at) rows.
+def flatten_prices(parsed_json, currencies):
+    return [
+        (crypto, currency, data[currency], data.get(f"{currency}_market_cap"),
+         data.get(f"{currency}_24h_vol"), data.get(f"{currency}_24h_change"), data["last_updated_at"])
+        for crypto, data in parsed_json.items()
+        if data.get("last_updated_at") is not None          # skip incomplete records
+        for currency in currencies
+        if data.get(currency) is not None
+    ]
+
+def price_loader(session=None, ids=None, currencies=PRICE_CURRENCIES, watchlist=WATCHLIST_PATH, max_workers=PRICE_WORKERS):
+    with metrics.labels(provider="coingecko", job="price"), session_scope(session) as session:
+        chunks = chunk_ids(price_ids(session, ids, watchlist))
+
+        rows = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(fetch_price_chunk, chunk, currencies) for chunk in chunks]
+            for future in as_completed(futures):
+                parsed_json = future.result()
+                with metrics.stage("parse"):
+                    rows.extend(flatten_prices(parsed_json, currencies))
+        metrics.count("rows_parsed", len(rows))
+
+        with metrics.stage("insert"), session.transaction():
+            inserted = session.executemany(INSERT_PRICE_SQL, rows).rowcount
+        metrics.count("rows_inserted", inserted)
+        metrics.count("rows_ignored", len(rows) - inserted)
+
+    metrics.flush()
+    print(f"Prices for {sum(map(len, chunks))} ids in {len(chunks)} requests: {inserted} rows inserted.")
+    return inserted
@@ -0,0 +1,184 @@
+import hashlib
+import math
+from array import array
+from itertools import repeat
+from operator import itemgetter
+
+# NumPy is optional: with it, string columns are converted in C in one call;
+# without it, the standard-library array module is used.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+
+
+# Common placeholders for missing values in AlphaVantage commodity series
+MISSING_VALUES = ("", ".", "-", "—", "N/A", "na", "None")
+
+# (column, payload key, kind) per source type; kind: f=float, i=int, m=float with missing values
+SERIES_FIELDS = {
+    "stocks": (
+        ("open", "1. open", "f"),
+        ("high", "2. high", "f"),
+        ("low", "3. low", "f"),
+        ("close", "4. close", "f"),
+        ("volume", "5. volume", "i"),
+    ),
+    "fx": (
+        ("open", "1. open", "f"),
+        ("high", "2. high", "f"),
+        ("low", "3. low", "f"),
+        ("close", "4. close", "f"),
+    ),
+    "crypto": (
+        ("open", "1. open", "f"),
+        ("high", "2. high", "f"),
+        ("low", "3. low", "f"),
+        ("close", "4. close", "f"),
+        ("volume", "5. volume", "f"),
+    ),
+    "commodity": (
+        ("value", "value", "m"),
+    ),
+}
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Lenient float conversion used for commodity values.
+def safe_float(val):
+    if val is None:
+        return None
+    s = str(val).strip()
+    if s in MISSING_VALUES:
+        return None
+    # remove thousands separators and spaces
+    s = s.replace(",", "").replace(" ", "")
+    try:
+        return float(s)
+    except (ValueError, TypeError):
+        return None
+
+# Function 1.1: Display-formatted numbers as floats, e.g. scraped table cells:
+# "12,345.67", "+1.23%", "-0.45", "−0.45", "4.125".
+# `decimal` is the page's decimal point ("." for en-US investing.com, "," for e.g.
+# "1.234,5"); the other separator groups thousands. Only when both separators appear
+# is the locale read from the text: the right-most one is the decimal point.
+def parse_number(text, decimal="."):
+    if text is None:
+        return None
+    s = str(text).strip().replace("\u2212", "-").replace("\xa0", "").replace(" ", "")
+    s = s.rstrip("%").lstrip("+")
+    if s in MISSING_VALUES:
+        return None
+
+    comma, dot = s.rfind(","), s.rfind(".")
+    if comma >= 0 and dot >= 0:
+        decimal = "," if comma > dot else "."
+    grouping = "," if decimal == "." else "."
+    s = s.replace(grouping, "").replace(decimal, ".")
+
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+# Function 1.2: Short digest of a row's values, for change detection on snapshots.
+# Numbers must already be parsed (12345.67 and "12,345.67" hash differently).
+def value_hash(values):
+    text = "\x1f".join("" if v is None else repr(v) for v in values)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: Typed column converters.
+def to_float_column(values):
+    if np is not None:
+        return np.array(values, dtype=np.float64)
+    return array("d", map(float, values))
+
+def to_int_column(values):
+    if np is not None:
+        return np.array(values, dtype=np.int64)
+    return array("q", map(int, values))
+
+# Missing placeholders become NaN (stored as NULL).
+def to_float_column_missing(values):
+    if np is not None:
+        text = np.char.strip(np.array(values, dtype=str))
+        text = np.char.replace(np.char.replace(text, ",", ""), " ", "")
+        text[np.isin(text, MISSING_VALUES)] = "nan"
+        try:
+            return text.astype(np.float64)
+        except ValueError:
+            # Unparseable stragglers: fall back to the lenient scalar path
+            return np.array(
+                [math.nan if v is None else v for v in map(safe_float, values)],
+                dtype=np.float64
+            )
+    return array("d", (math.nan if v is None else v for v in map(safe_float, values)))
+
+# NULLs become NaN (read path: values come back from SQLite, not as strings).
+def to_nullable_float_column(values):
+    if np is not None:
+        return np.array(values, dtype=np.float64)   # None -> nan
+    return array("d", (math.nan if v is None else v for v in values))
+
+# ISO dates as datetime64[D] with NumPy, plain strings otherwise.
+def to_date_column(values):
+    if np is not None:
+        return np.array(values, dtype="datetime64[D]")
+    return list(values)
+
+CONVERTERS = {
+    "f": to_float_column,
+    "i": to_int_column,
+    "m": to_float_column_missing,
+}
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 3: Turn (date, values) entries into typed columns in one pass.
+# Returns (dates, {column: array}).
+def parse_series_columns(source_type, entries):
+    fields = SERIES_FIELDS[source_type]
+    dates = [date for date, _ in entries]
+
+    if len(fields) == 1:
+        key = fields[0][1]
+        raw_columns = [[values.get(key) for _, values in entries]]
+    elif entries:
+        getter = itemgetter(*(key for _, key, _ in fields))
+        raw_columns = list(zip(*(getter(values) for _, values in entries)))
+    else:
+        raw_columns = [[] for _ in fields]
+
+    columns = {
+        name: CONVERTERS[kind](raw)
+        for (name, _, kind), raw in zip(fields, raw_columns)
+    }
+    return dates, columns
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 4: Lazily zip key values, dates and columns into executemany parameters.
+# Row layout matches the insert_*_rows SQL: key columns, date, value columns.
+def column_rows(source_type, keys, dates, columns):
+    lists = []
+    for name, _, kind in SERIES_FIELDS[source_type]:
+        column = columns[name]
+        values = column.tolist()
+        if kind == "m":
+            values = [None if v != v else v for v in values]
+        lists.append(values)
+
+    return zip(*[repeat(key) for key in keys], dates, *lists)
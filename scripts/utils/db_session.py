@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from .schema import ensure_schema
+
+
+
+
+# Path to the database file (override with GEDAP_DB_PATH)
+DB_PATH = os.environ.get("GEDAP_DB_PATH", "./GEDAP_DB.db")
+
+# Connection tuning applied to every session
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL;",        # readers are not blocked while we write
+    "PRAGMA synchronous = NORMAL;",      # fsync at checkpoints, not every commit (safe with WAL)
+    "PRAGMA cache_size = -65536;",       # 64 MB page cache
+    "PRAGMA mmap_size = 268435456;",     # 256 MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA busy_timeout = 5000;",
+    "PRAGMA foreign_keys = ON;",
+)
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: One SQLite connection shared by every loader in a run.
+# - Statements are prepared once and reused from the connection's statement cache,
+#   so keep SQL text constant (module-level strings) and pass values as parameters.
+# - Writes are grouped with `transaction()`; nested blocks join the outermost one,
+#   so a symbol's rows and metadata (or a whole batch) commit with a single fsync.
+#   A nested block runs in a savepoint: if it fails, only its own writes are undone
+#   and the outer transaction can still commit.
+# - Thread-safe: every call holds the session lock, and a transaction holds it
+#   until commit so other threads never see or join a half-written batch.
+# - The managed schema (see schema.py) is created/migrated on open unless migrate=False.
+class DBSession:
+    def __init__(self, db_path=DB_PATH, migrate=True):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(
+            db_path,
+            isolation_level=None,           # we issue BEGIN/COMMIT ourselves
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        for pragma in PRAGMAS:
+            self.conn.execute(pragma)
+
+        self.lock = threading.RLock()
+        self.depth = 0
+
+        if migrate:
+            ensure_schema(self)
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            savepoint = f"gedap_{self.depth}"
+            if self.depth == 0:
+                self.conn.execute("BEGIN IMMEDIATE;")
+            else:
+                self.conn.execute(f"SAVEPOINT {savepoint};")
+            self.depth += 1
+            try:
+                yield self
+            except BaseException:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.conn.execute("ROLLBACK;")
+                else:
+                    self.conn.execute(f"ROLLBACK TO {savepoint};")
+                    self.conn.execute(f"RELEASE {savepoint};")
+                raise
+            self.depth -= 1
+            if self.depth == 0:
+                self.conn.execute("COMMIT;")
+            else:
+                self.conn.execute(f"RELEASE {savepoint};")
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        with self.lock:
+            return self.conn.executemany(sql, rows)
+
+    def fetchone(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Use the caller's session, or open (and afterwards close) a private one.
+@contextmanager
+def session_scope(session=None):
+    if session is not None:
+        yield session
+        return
+
+    session = DBSession()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,317 @@
+import math
+
+from .columnar import np
+from .db_session import session_scope
+from .metrics import metrics
+from .queries import SERIES
+from .storage import require_session_tables
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Derived metrics, maintained after each AlphaVantage load instead of being recomputed
+# by every consumer:
+#   derived_daily_metrics  close, log return, moving averages and volatility (sample
+#                          stdev of daily log returns) per stocks / fx / crypto series
+#   derived_crypto_fx      USD crypto closes converted with the stored USD FX rates
+#                          (the latest rate on or before each date, so weekends use
+#                          Friday's rate)
+#
+# Updates are incremental: a series is only recomputed from the first date after
+# what was derived last (or an earlier revised date, see reconcile.py), reading just
+# the trailing LOOKBACK rows needed to fill the longest window. The series watermark
+# is alphav_metadata.max_data_date; refresh_derived() catches up every series whose
+# watermark is ahead of its derived rows.
+
+MA_WINDOWS = (20, 50, 200)
+VOL_WINDOWS = (20, 60)
+METRIC_COLUMNS = ("close", "log_return") + tuple(f"ma_{n}" for n in MA_WINDOWS) + tuple(f"vol_{n}" for n in VOL_WINDOWS)
+
+# Rows before the first recomputed date needed to fill every window
+LOOKBACK = max(max(MA_WINDOWS) - 1, max(VOL_WINDOWS))
+
+DERIVED_SOURCES = ("stocks", "fx", "crypto")
+
+# Crypto is converted from this fiat with the fx series stored as BASE -> currency
+BASE_CURRENCY = "USD"
+
+DERIVED_THROUGH_SQL = """
+    SELECT MAX(date) FROM derived_daily_metrics
+    WHERE source_type = ? AND symbol = ? AND market = ?
+"""
+
+UPSERT_METRICS_SQL = f"""
+    INSERT OR REPLACE INTO derived_daily_metrics
+    (source_type, symbol, market, date, {", ".join(METRIC_COLUMNS)})
+    VALUES ({", ".join("?" for _ in range(4 + len(METRIC_COLUMNS)))})
+"""
+
+CONVERTED_THROUGH_SQL = """
+    SELECT date, fx_date FROM derived_crypto_fx
+    WHERE crypto_code = ? AND currency = ?
+    ORDER BY date DESC LIMIT 1
+"""
+
+# Rows converted with a carried-forward rate go stale once a newer rate arrives
+NEWER_RATE_SQL = """
+    SELECT MIN(date) FROM alphav_fx_daily
+    WHERE from_currency = ? AND to_currency = ? AND date > ? AND date <= ?
+"""
+
+CONVERT_SQL = """
+    INSERT OR REPLACE INTO derived_crypto_fx (crypto_code, currency, date, close, fx_rate, fx_date)
+    SELECT c.crypto_code, f.to_currency, c.date, c.close * f.close, f.close, f.date
+    FROM alphav_crypto_daily AS c
+    JOIN alphav_fx_daily AS f
+      ON f.from_currency = c.fiat_currency
+     AND f.to_currency = ?
+     AND f.date = (
+        SELECT MAX(date) FROM alphav_fx_daily
+        WHERE from_currency = c.fiat_currency AND to_currency = ? AND date <= c.date
+     )
+    WHERE c.crypto_code = ? AND c.fiat_currency = ? AND c.date >= ?
+"""
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Series helpers (symbol/market follow alphav_metadata, as in queries.py).
+def _series_filter(source_type, symbol, market):
+    table, key_columns, _ = SERIES[source_type]
+    if len(key_columns) == 2:
+        return table, f"{key_columns[0]} = ? AND {key_columns[1]} = ?", (symbol, market)
+    return table, f"{key_columns[0]} = ?", (symbol,)
+
+def _first_date_after(session, source_type, symbol, market, date):
+    table, where, params = _series_filter(source_type, symbol, market)
+    if date is None:
+        row = session.fetchone(f"SELECT MIN(date) FROM {table} WHERE {where}", params)
+    else:
+        row = session.fetchone(f"SELECT MIN(date) FROM {table} WHERE {where} AND date > ?", (*params, date))
+    return row[0]
+
+# (date, close) rows from LOOKBACK rows before `start` onwards
+def _closes_from(session, source_type, symbol, market, start):
+    table, where, params = _series_filter(source_type, symbol, market)
+    first = session.fetchone(f"""
+        SELECT date FROM {table}
+        WHERE {where} AND date < ?
+        ORDER BY date DESC LIMIT 1 OFFSET ?
+    """, (*params, start, LOOKBACK - 1))
+    first_date = first[0] if first else ""
+    return session.fetchall(f"""
+        SELECT date, close FROM {table}
+        WHERE {where} AND date >= ?
+        ORDER BY date
+    """, (*params, first_date))
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: Window statistics over a list that may contain None. A value is only
+# produced once its window is full and complete (gaps: running count of None values).
+# fsum is exact, so a window gives the same result whether it is computed in a full
+# rebuild or an incremental update.
+def _gaps(values):
+    gaps = [0]
+    for value in values:
+        gaps.append(gaps[-1] + (value is None))
+    return gaps
+
+def _rolling_mean(values, gaps, i, n):
+    if i + 1 < n or gaps[i + 1] != gaps[i + 1 - n]:
+        return None
+    return math.fsum(values[i + 1 - n:i + 1]) / n
+
+# Two-pass sample stdev (deviations from the window mean), the formula NumPy's
+# std(ddof=1) uses, so both paths store the same volatility
+def _rolling_stdev(values, gaps, i, n):
+    mean = _rolling_mean(values, gaps, i, n)
+    if mean is None:
+        return None
+    deviations = math.fsum((value - mean) ** 2 for value in values[i + 1 - n:i + 1])
+    return math.sqrt(deviations / (n - 1))
+
+def _log_return(previous, current):
+    if previous is None or current is None or previous <= 0 or current <= 0:
+        return None
+    return math.log(current / previous)
+
+# Metric rows for the dates >= start
+def compute_metrics(rows, start):
+    dates = [row[0] for row in rows]
+    closes = [row[1] for row in rows]
+    if np is not None:
+        return _compute_metrics_numpy(dates, closes, start)
+    returns = [None] + [_log_return(closes[i - 1], closes[i]) for i in range(1, len(closes))]
+    close_gaps, return_gaps = _gaps(closes), _gaps(returns)
+
+    computed = []
+    for i, date in enumerate(dates):
+        if date < start:
+            continue
+        computed.append(
+            (date, closes[i], returns[i])
+            + tuple(_rolling_mean(closes, close_gaps, i, n) for n in MA_WINDOWS)
+            + tuple(_rolling_stdev(returns, return_gaps, i, n) for n in VOL_WINDOWS)
+        )
+    return computed
+
+
+
+
+# Same with NumPy: every window is reduced on its own (sliding_window_view), so again
+# a window's value does not depend on where the computation started.
+def _windows(values, n, reduce):
+    out = np.full(len(values), np.nan)
+    if len(values) >= n:
+        out[n - 1:] = reduce(np.lib.stride_tricks.sliding_window_view(values, n))
+    return out
+
+def _compute_metrics_numpy(dates, closes, start):
+    close = np.array([np.nan if c is None else c for c in closes], dtype=np.float64)
+    returns = np.full(len(close), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valid = (close[1:] > 0) & (close[:-1] > 0)
+        returns[1:] = np.where(valid, np.log(close[1:] / close[:-1]), np.nan)
+
+    columns = [close, returns]
+    columns += [_windows(close, n, lambda w: w.mean(axis=1)) for n in MA_WINDOWS]
+    columns += [_windows(returns, n, lambda w: w.std(axis=1, ddof=1)) for n in VOL_WINDOWS]
+
+    first = next((i for i, date in enumerate(dates) if date >= start), len(dates))
+    values = [
+        [None if v != v else v for v in column[first:].tolist()]
+        for column in columns
+    ]
+    return list(zip(dates[first:], *values))
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 3: Recompute one series' metrics from the first underived (or revised) date.
+# Returns the number of rows written.
+def update_series_metrics(session, source_type, symbol, market, since=None, full=False):
+    derived_through = None if full else session.fetchone(
+        DERIVED_THROUGH_SQL, (source_type, symbol, market)
+    )[0]
+    start = _first_date_after(session, source_type, symbol, market, derived_through)
+    if since is not None and (start is None or since < start):
+        start = since
+    if start is None:
+        return 0
+
+    rows = _closes_from(session, source_type, symbol, market, start)
+    computed = compute_metrics(rows, start)
+    session.executemany(
+        UPSERT_METRICS_SQL,
+        [(source_type, symbol, market) + row for row in computed]
+    )
+    return len(computed)
+
+
+# Function 4: Convert one crypto series into one currency from the first stale date.
+def update_conversion(session, crypto_code, currency, since=None, full=False):
+    start = None
+    last = None if full else session.fetchone(CONVERTED_THROUGH_SQL, (crypto_code, currency))
+    if last:
+        converted_through, last_fx_date = last
+        start = _first_date_after(session, "crypto", crypto_code, BASE_CURRENCY, converted_through)
+        stale = session.fetchone(
+            NEWER_RATE_SQL, (BASE_CURRENCY, currency, last_fx_date, converted_through)
+        )[0]
+        if stale is not None and (start is None or stale < start):
+            start = stale
+    else:
+        start = _first_date_after(session, "crypto", crypto_code, BASE_CURRENCY, None)
+
+    if since is not None and (start is None or since < start):
+        start = since
+    if start is None:
+        return 0
+
+    cursor = session.execute(CONVERT_SQL, (currency, currency, crypto_code, BASE_CURRENCY, start))
+    return max(cursor.rowcount, 0)
+
+def _stored_series(session, source_type, symbol=None, market=None):
+    sql = "SELECT symbol, market FROM alphav_metadata WHERE source_type = ? AND interval = 'daily'"
+    params = [source_type]
+    if symbol is not None:
+        sql += " AND symbol = ?"
+        params.append(symbol)
+    if market is not None:
+        sql += " AND market = ?"
+        params.append(market)
+    return session.fetchall(sql, params)
+
+# Every (crypto, currency) pair touched by a load of crypto_code or of the fx
+# series BASE -> currency. The loaded series itself is taken as given: its metadata
+# row may not be written yet (batch loads write metadata at the end).
+def update_conversions(session, crypto_code=None, currency=None, since=None, full=False):
+    if crypto_code is not None:
+        cryptos = [crypto_code]
+    else:
+        cryptos = [s for s, _ in _stored_series(session, "crypto", market=BASE_CURRENCY)]
+    if currency is not None:
+        currencies = [currency]
+    else:
+        currencies = [m for _, m in _stored_series(session, "fx", symbol=BASE_CURRENCY)]
+    written = 0
+    for code in cryptos:
+        for target in currencies:
+            written += update_conversion(session, code, target, since, full)
+    return written
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 5: Derived stage for one loaded series; call in the load's transaction.
+# since: earliest revised date, when the load rewrote stored bars.
+# convert=False skips the crypto FX conversions touched by this series.
+def update_derived(session, source_type, symbol, market, since=None, full=False, convert=True):
+    if source_type not in DERIVED_SOURCES:
+        return
+    with metrics.stage("derived"):
+        metric_rows = update_series_metrics(session, source_type, symbol, market, since, full)
+        converted = 0
+        if not convert:
+            pass
+        elif source_type == "crypto" and market == BASE_CURRENCY:
+            converted = update_conversions(session, crypto_code=symbol, since=since, full=full)
+        elif source_type == "fx" and symbol == BASE_CURRENCY:
+            converted = update_conversions(session, currency=market, since=since, full=full)
+    metrics.count("derived_rows", metric_rows + converted)
+    print(f"Derived metrics: {metric_rows} rows, {converted} converted closes.")
+
+
+# Function 6: Catch up every stored series whose alphav_metadata watermark is ahead of
+# its derived rows (backfill after upgrading, or full=True to rebuild everything).
+def refresh_derived(session=None, full=False):
+    require_session_tables("refresh_derived")
+    with session_scope(session) as session:
+        rows = session.fetchall(f"""
+            SELECT m.source_type, m.symbol, m.market
+            FROM alphav_metadata AS m
+            WHERE m.interval = 'daily'
+              AND m.source_type IN ({", ".join("?" for _ in DERIVED_SOURCES)})
+              AND (? OR m.max_data_date > COALESCE((
+                    SELECT MAX(d.date) FROM derived_daily_metrics AS d
+                    WHERE d.source_type = m.source_type AND d.symbol = m.symbol AND d.market = m.market
+                  ), ''))
+        """, (*DERIVED_SOURCES, int(full)))
+
+        for source_type, symbol, market in rows:
+            # A full rebuild converts each crypto series once, from the crypto side
+            convert = not (full and source_type == "fx")
+            with metrics.labels(provider="alphavantage", source_type=source_type, symbol=symbol, market=market):
+                with session.transaction():
+                    update_derived(session, source_type, symbol, market, full=full, convert=convert)
+
+        print(f"Refreshed derived metrics for {len(rows)} series.")
+    metrics.flush()
+    return len(rows)
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import time
+
+from .db_session import session_scope
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Single asyncio engine for a full refresh.
+# Every provider task runs on the same event loop; the blocking loaders run in worker
+# threads (asyncio.to_thread), so a slow provider overlaps with the others instead of
+# adding to the total. Per-provider semaphores cap how many of a provider's tasks run
+# at once, and the shared per-provider rate limiters in http_client keep every
+# request within quota. All tasks write through one shared DBSession.
+
+# Tasks of the same provider allowed to run at the same time (override from env)
+PROVIDER_CONCURRENCY = {
+    "alphavantage": int(os.environ.get("ALPHAVANTAGE_CONCURRENCY", 4)),
+    "coingecko": int(os.environ.get("COINGECKO_CONCURRENCY", 3)),
+    "investing": int(os.environ.get("INVESTING_CONCURRENCY", 1)),
+}
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: Runs (provider, name, func) tasks concurrently; func(session=...) is blocking.
+class IngestionEngine:
+    def __init__(self, session, concurrency=None):
+        self.session = session
+        self.concurrency = dict(PROVIDER_CONCURRENCY, **(concurrency or {}))
+        self.semaphores = {}
+
+    def _semaphore(self, provider):
+        # Created lazily so they bind to the running event loop
+        if provider not in self.semaphores:
+            self.semaphores[provider] = asyncio.Semaphore(self.concurrency.get(provider, 1))
+        return self.semaphores[provider]
+
+    async def run_task(self, provider, name, func):
+        async with self._semaphore(provider):
+            start = time.monotonic()
+            print(f"--> {provider}: {name}")
+            try:
+                result = await asyncio.to_thread(func, session=self.session)
+                status, error = "ok", None
+                # Batch loaders return (loaded, failed): report symbols that failed
+                if isinstance(result, tuple) and len(result) == 2 and result[1]:
+                    status, error = "partial", f"{len(result[1])} job(s) failed: {result[1]}"
+            except Exception as e:
+                status, error = "failed", str(e)
+            elapsed = time.monotonic() - start
+            print(f"<-- {provider}: {name} {status} in {elapsed:.1f}s")
+            return {"provider": provider, "name": name, "status": status, "seconds": elapsed, "error": error}
+
+    async def run(self, tasks):
+        start = time.monotonic()
+        results = await asyncio.gather(*(
+            self.run_task(provider, name, func) for provider, name, func in tasks
+        ))
+        print(f"Full refresh finished in {time.monotonic() - start:.1f}s")
+        return results
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Overall status of a run from its task results: "ok" when every task
+# succeeded, "failed" when none did, otherwise "partial".
+def run_status(results):
+    statuses = {result["status"] for result in results}
+    if statuses <= {"ok"}:
+        return "ok"
+    if statuses == {"failed"}:
+        return "failed"
+    return "partial"
+
+
+# Function 2: Run tasks under one event loop with a shared session.
+def run_tasks(tasks, concurrency=None, session=None):
+    with session_scope(session) as session:
+        engine = IngestionEngine(session, concurrency)
+        return asyncio.run(engine.run(tasks))
@@ -0,0 +1,167 @@
+from datetime import date as date_cls, timedelta
+
+from .alphav_functions import (
+    COMPACT_MARGIN, COMPACT_POINTS, OUTPUTSIZE_FUNCTIONS,
+    business_days_between, extract_date, fetch_and_parse,
+)
+from .db_session import session_scope
+from .derived import update_derived
+from .metadata_index import NOW_MS_SQL
+from .metrics import metrics
+from .reconcile import record_revision
+from .rollups import update_rollups
+from .storage import storage_for
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Gap scanner for the AlphaVantage series.
+# alphav_metadata only tracks max_data_date, so holes inside a series (a failed
+# write, a vendor outage since fixed) are never seen by the incremental loaders.
+# scan_series() compares the stored dates between a series' first and last date with
+# the expected calendar of its source type; plan_backfill() turns the holes into the
+# fewest requests (one per series, outputsize=compact when every hole is inside the
+# latest 100 points); fill_gaps() writes just the missing bars.
+#
+# Dates the vendor confirmed it does not have (holidays, suspended trading) are
+# recorded in alphav_known_gaps and skipped by later scans, so no quota is spent on
+# them twice. The calendar has no exchange holidays: each one costs one scan to learn.
+
+KNOWN_GAPS_SQL = """
+    SELECT date FROM alphav_known_gaps
+    WHERE source_type = ? AND symbol = ? AND market = ?
+"""
+
+RECORD_GAP_SQL = """
+    INSERT OR IGNORE INTO alphav_known_gaps (source_type, symbol, market, date)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Filled bars predate max_data_date, so only the token moves: series caches
+# (queries.py) revalidate on update_date.
+TOUCH_METADATA_SQL = f"""
+    UPDATE alphav_metadata
+    SET update_date = {NOW_MS_SQL}
+    WHERE source_type = ? AND symbol = ? AND market = ? AND interval = ?
+"""
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Expected dates between first and last (inclusive), by source type and
+# interval: crypto trades every day, stocks / fx / daily commodities on weekdays,
+# monthly commodities are dated on the first of the month.
+def expected_dates(source_type, interval, first, last):
+    day = date_cls.fromisoformat(first[:10])
+    end = date_cls.fromisoformat(last[:10])
+
+    if interval == "monthly":
+        day = day.replace(day=1)
+        dates = []
+        while day <= end:
+            dates.append(day.isoformat())
+            day = (day + timedelta(days=32)).replace(day=1)
+        return dates
+    if interval != "daily":
+        return []
+
+    weekdays_only = source_type != "crypto"
+    dates = []
+    while day <= end:
+        if not weekdays_only or day.weekday() < 5:
+            dates.append(day.isoformat())
+        day += timedelta(days=1)
+    return dates
+
+
+# Function 2: Missing dates of one stored series (empty when it has no holes or no rows).
+def scan_series(session, source_type, symbol, market, interval):
+    rows = storage_for(session).read_range(source_type, [symbol], market)
+    if not rows:
+        return []
+    stored = {row[1] for row in rows}
+    known = {row[0] for row in session.fetchall(KNOWN_GAPS_SQL, (source_type, symbol, market))}
+    return [
+        day for day in expected_dates(source_type, interval, rows[0][1], rows[-1][1])
+        if day not in stored and day not in known
+    ]
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 3: Plan the requests for a list of loader jobs
+# (alphav_params, source_type, symbol, market, interval); one entry per series with holes.
+def plan_backfill(jobs, session=None, today=None):
+    today = today or date_cls.today().isoformat()
+    plan = []
+    with session_scope(session) as session:
+        for alphav_params, source_type, symbol, market, interval in jobs:
+            missing = scan_series(session, source_type, symbol, market, interval)
+            if not missing:
+                continue
+
+            params = dict(alphav_params)
+            if params.get("function") in OUTPUTSIZE_FUNCTIONS:
+                in_compact = business_days_between(missing[0], today) + COMPACT_MARGIN <= COMPACT_POINTS
+                params["outputsize"] = "compact" if in_compact else "full"
+            plan.append({
+                "params": params,
+                "source_type": source_type,
+                "symbol": symbol,
+                "market": market,
+                "interval": interval,
+                "missing": missing,
+            })
+    return plan
+
+
+# Function 4: Fetch each planned series once and write only its missing bars. Dates
+# inside the fetched window that the vendor did not return become known gaps.
+# A fill is recorded in alphav_revisions (so the Parquet export rewrites the years
+# it touched) and bumps the series' update_date. Returns (filled, confirmed missing).
+def fill_gaps(plan, session=None):
+    filled = confirmed = 0
+    with session_scope(session) as session:
+        storage = storage_for(session)
+        for entry in plan:
+            source_type, symbol, market = entry["source_type"], entry["symbol"], entry["market"]
+            missing = set(entry["missing"])
+            print(f"=== Backfilling {source_type}, {symbol} , {market}: {len(missing)} missing dates ===")
+
+            with metrics.labels(provider="alphavantage", source_type=source_type, symbol=symbol, market=market):
+                try:
+                    result = fetch_and_parse(entry["params"], source_type, symbol, market, None, True)
+                except Exception as e:
+                    print(f"Backfill failed for {source_type}, {symbol}, {market}: {e}")
+                    continue
+
+                rows = list(result["rows"])
+                fetched = {extract_date(row, source_type) for row in rows}
+                gap_rows = [row for row in rows if extract_date(row, source_type) in missing]
+                oldest = min(fetched) if fetched else None
+                absent = sorted(d for d in missing - fetched if oldest is not None and d >= oldest)
+
+                with session.transaction():
+                    first_new = None
+                    if gap_rows:
+                        counts = storage.upsert(source_type, gap_rows)
+                        first_new = counts["first_new_date"]
+                        metrics.count("rows_inserted", counts["new"])
+                        record_revision(session, source_type, symbol, market, entry["interval"], counts)
+                        session.execute(TOUCH_METADATA_SQL, (source_type, symbol, market, entry["interval"]))
+                    session.executemany(
+                        RECORD_GAP_SQL, [(source_type, symbol, market, day) for day in absent]
+                    )
+                    if first_new is not None and storage.session_tables:
+                        update_derived(session, source_type, symbol, market, since=first_new)
+                        update_rollups(session, source_type, symbol, market, entry["interval"], since=first_new)
+
+            filled += len(gap_rows)
+            confirmed += len(absent)
+            print(f"Filled {len(gap_rows)} bars, {len(absent)} dates confirmed missing at the vendor.")
+
+    metrics.flush()
+    return filled, confirmed
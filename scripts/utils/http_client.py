@@ -0,0 +1,372 @@
+import codecs
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import metrics
+from .rate_limiter import QuotaExhaustedError, RateLimiter
+from .response_cache import ResponseCache
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Errors surfaced to loaders
+class ProviderError(RuntimeError):
+    pass
+
+# Raised when the provider keeps throttling us after every retry.
+# retry_after: the least number of seconds worth waiting before the next attempt.
+class ThrottleError(ProviderError):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# HTTP statuses worth retrying (rate limited or transient server errors)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: AlphaVantage answers HTTP 200 with a "Note"/"Information" body when
+# throttled and an "Error Message" body for bad requests; turn those into errors
+# instead of letting them look like an empty series.
+# Only the per-minute (or per-second burst) notices are worth retrying, after the
+# minute window has passed. The daily-limit notice raises QuotaExhaustedError and a
+# premium-only endpoint raises ProviderError: a retry would spend quota and fail again.
+THROTTLE_WINDOW = 60
+
+def check_alphavantage_payload(data):
+    if not isinstance(data, dict):
+        return
+    if "Note" in data or "Information" in data:
+        message = data.get("Note") or data.get("Information")
+        text = message.lower()
+        # The older per-minute note also quotes the daily figure, so test it first
+        if "per minute" in text or "per second" in text:
+            raise ThrottleError(message, retry_after=THROTTLE_WINDOW)
+        # Premium notices can name a *_DAILY function, and the daily-limit notice
+        # pitches the "premium plans", so match the premium wording itself
+        if "premium endpoint" in text or "premium feature" in text:
+            raise ProviderError(message)
+        if "per day" in text:
+            raise QuotaExhaustedError(message)
+        raise ThrottleError(message, retry_after=THROTTLE_WINDOW)
+    if "Error Message" in data:
+        raise ProviderError(data["Error Message"])
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Provider settings. Base URLs and quotas can be overridden from the environment
+# (e.g. to point the loaders at the local stand-in in benchmarks/).
+PROVIDERS = {
+    "alphavantage": {
+        "base_url": os.environ.get("ALPHAVANTAGE_BASE_URL", "https://www.alphavantage.co/"),
+        "headers": {"accept": "application/json"},
+        "requests_per_minute": int(os.environ.get("ALPHAVANTAGE_REQUESTS_PER_MINUTE", 5)),
+        "requests_per_day": int(os.environ.get("ALPHAVANTAGE_REQUESTS_PER_DAY", 25)),
+        "timeout": (5, 60),
+        "payload_check": check_alphavantage_payload,
+    },
+    "coingecko": {
+        "base_url": os.environ.get("COINGECKO_BASE_URL", "https://api.coingecko.com/api/v3/"),
+        "headers": {"accept": "application/json"},
+        "requests_per_minute": int(os.environ.get("COINGECKO_REQUESTS_PER_MINUTE", 30)),
+        "requests_per_day": None,
+        "timeout": (5, 30),
+        "payload_check": None,
+    },
+    "investing": {
+        "base_url": os.environ.get("INVESTING_BASE_URL", "https://www.investing.com/"),
+        "headers": {"User-Agent": "Mozilla/5.0"},
+        "requests_per_minute": int(os.environ.get("INVESTING_REQUESTS_PER_MINUTE", 20)),
+        "requests_per_day": None,
+        "timeout": (5, 30),
+        "payload_check": None,
+    },
+}
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: Pooled HTTP client for one provider.
+# - One requests.Session per provider: keep-alive connections are reused, so the
+#   TLS handshake is paid once per connection instead of once per call.
+# - gzip/deflate negotiated on every request.
+# - Retries 429/5xx, connection errors, timeouts and throttle payloads with
+#   jittered exponential backoff (honouring Retry-After when the server sends it,
+#   and the throttle window of a throttle payload).
+# - Every attempt spends a token from the provider's rate limiter; a daily-quota
+#   payload drains the limiter, so later calls fail without another request.
+# - get_json/get_text go through the shared response cache (see configure_cache);
+#   cache hits cost no quota and no network.
+class ProviderClient:
+    def __init__(self, name, base_url, headers=None, params=None, limiter=None,
+                 timeout=(5, 30), payload_check=None, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0, pool_size=16):
+        self.name = name
+        self.base_url = base_url
+        self.params = params or {}
+        self.limiter = limiter
+        self.timeout = timeout
+        self.payload_check = payload_check
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        self.session.headers.update(headers or {})
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        # "Full jitter": spread retries from concurrent workers apart
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    # GET with retries; returns the final requests.Response (status < 400).
+    def get(self, endpoint="", params=None, headers=None, stream=False):
+        url = self.base_url + endpoint.lstrip("/")
+        query = dict(self.params)
+        query.update(params or {})
+
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                response = self.session.get(
+                    url, params=query, headers=headers, timeout=self.timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise ProviderError(f"{self.name}: {e}") from e
+                metrics.count("retries", provider=self.name)
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 429:
+                metrics.count("throttle_events", provider=self.name, reason="http_429")
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                metrics.count("retries", provider=self.name)
+                response.close()
+                time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+                attempt += 1
+                continue
+
+            if response.status_code == 429:
+                raise ThrottleError(f"{self.name}: HTTP 429 after {attempt} retries")
+            response.raise_for_status()
+            return response
+
+    def _cache_params(self, params):
+        query = dict(self.params)
+        query.update(params or {})
+        return query
+
+    # Run the provider's payload check on a decoded body. A daily-quota payload
+    # drains the limiter, so later calls fail without spending another request.
+    def check_payload(self, data):
+        if self.payload_check is None:
+            return
+        try:
+            self.payload_check(data)
+        except QuotaExhaustedError:
+            metrics.count("throttle_events", provider=self.name, reason="quota")
+            if self.limiter is not None:
+                self.limiter.drain()
+            raise
+
+    # GET and decode JSON, retrying throttle payloads like HTTP 429.
+    # Only payloads that pass the check are cached.
+    def get_json(self, endpoint="", params=None):
+        cache = response_cache
+        if cache is not None:
+            body = cache.get(self.name, endpoint, self._cache_params(params))
+            if body is not None:
+                metrics.count("cache_hits", provider=self.name)
+                return json.loads(body)
+
+        attempt = 0
+        while True:
+            body = self.get(endpoint, params).content
+            metrics.count("bytes_downloaded", len(body), provider=self.name)
+            data = json.loads(body)
+            try:
+                self.check_payload(data)
+                break
+            except ThrottleError as e:
+                metrics.count("throttle_events", provider=self.name, reason="payload")
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt, e.retry_after))
+                attempt += 1
+
+        if cache is not None:
+            cache.put(self.name, endpoint, self._cache_params(params), body)
+        return data
+
+    def get_text(self, endpoint="", params=None):
+        cache = response_cache
+        if cache is not None:
+            body = cache.get(self.name, endpoint, self._cache_params(params))
+            if body is not None:
+                metrics.count("cache_hits", provider=self.name)
+                return body.decode("utf-8")
+
+        response = self.get(endpoint, params)
+        metrics.count("bytes_downloaded", len(response.content), provider=self.name)
+        if cache is not None:
+            cache.put(self.name, endpoint, self._cache_params(params), response.content)
+        return response.text
+
+    # Yield the decoded body in text chunks as it arrives. Closing the generator
+    # early closes the connection, so the rest of the payload is never downloaded.
+    # Only a body read to the end is cached (under the get_json key, so replays and
+    # a get_json of the same query are served from it); a cached body is replayed
+    # in chunks. With read_to_end=True and a writable cache, an early close still
+    # downloads the rest of the body (without yielding it) so it can be cached.
+    def stream_text(self, endpoint="", params=None, chunk_size=64 * 1024, read_to_end=False):
+        cache = response_cache
+        if cache is not None:
+            body = cache.get(self.name, endpoint, self._cache_params(params))
+            if body is not None:
+                metrics.count("cache_hits", provider=self.name)
+                text = body.decode("utf-8")
+                for i in range(0, len(text), chunk_size):
+                    yield text[i:i + chunk_size]
+                return
+
+        response = self.get(endpoint, params, stream=True)
+        parts = [] if cache is not None and not cache.replay else None
+        downloaded = 0
+        try:
+            # Decode here rather than in iter_content so the raw byte count is known
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            raw_chunks = response.iter_content(chunk_size=chunk_size)
+            for raw in raw_chunks:
+                downloaded += len(raw)
+                chunk = decoder.decode(raw)
+                if not chunk:
+                    continue
+                if parts is not None:
+                    parts.append(chunk)
+                yield chunk
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                if parts is not None:
+                    parts.append(tail)
+                yield tail
+            # Not reached when the consumer stops early, so partial bodies are never cached
+            if parts is not None:
+                self._cache_checked(cache, endpoint, params, "".join(parts))
+        except GeneratorExit:
+            # The consumer stopped early
+            if parts is not None and read_to_end:
+                for raw in raw_chunks:
+                    downloaded += len(raw)
+                    parts.append(decoder.decode(raw))
+                parts.append(decoder.decode(b"", final=True))
+                self._cache_checked(cache, endpoint, params, "".join(parts))
+            raise
+        finally:
+            response.close()
+            metrics.count("bytes_downloaded", downloaded, provider=self.name)
+
+    # Cache a streamed body only if it passes the payload check, like get_json
+    def _cache_checked(self, cache, endpoint, params, text):
+        body = text.encode("utf-8")
+        if self.payload_check is not None:
+            try:
+                self.payload_check(json.loads(body))
+            except (ValueError, ProviderError, QuotaExhaustedError):
+                return
+        cache.put(self.name, endpoint, self._cache_params(params), body)
+
+    def close(self):
+        self.session.close()
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: Shared client per provider (created on first use, then reused).
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(name, headers=None, params=None):
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            config = PROVIDERS[name]
+            limiter = None
+            if config["requests_per_minute"]:
+                limiter = RateLimiter(config["requests_per_minute"], config["requests_per_day"])
+
+            client = ProviderClient(
+                name,
+                config["base_url"],
+                headers=dict(config["headers"], **(headers or {})),
+                params=params,
+                limiter=limiter,
+                timeout=config["timeout"],
+                payload_check=config["payload_check"],
+            )
+            _clients[name] = client
+        return client
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 3: Response cache shared by every client.
+# Enabled by default; GEDAP_CACHE=0 disables it, GEDAP_REPLAY=1 replays cached
+# payloads only (no network; a missing payload raises CacheMissError).
+response_cache = None
+
+def configure_cache(enabled=True, replay=False, **cache_options):
+    global response_cache
+    if replay:
+        response_cache = ResponseCache(replay=True, **cache_options)
+    elif enabled:
+        response_cache = ResponseCache(**cache_options)
+    else:
+        response_cache = None
+    return response_cache
+
+configure_cache(
+    enabled=os.environ.get("GEDAP_CACHE", "1") != "0",
+    replay=os.environ.get("GEDAP_REPLAY", "0") == "1",
+)
+
+
+# Function 4: Command-line switches understood by every insert_* script:
+#   --replay    re-run from cached payloads only, no network
+#   --no-cache  always hit the network and do not store payloads
+def apply_cli_flags(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if "--replay" in argv:
+        configure_cache(replay=True)
+    elif "--no-cache" in argv:
+        configure_cache(enabled=False)
@@ -0,0 +1,190 @@
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+from .columnar import parse_number, value_hash
+from .db_session import session_scope
+from .http_client import get_client
+from .metrics import metrics
+
+# lxml (C parser) is optional; without it BeautifulSoup parses the table fragment.
+try:
+    import lxml.html as lxml_html
+except ImportError:
+    lxml_html = None
+
+
+
+
+# Opening tag of the indices table on the investing.com homepage
+TABLE_TAG = re.compile(r"<table\b[^>]*datatable-v2[^>]*>", re.IGNORECASE)
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Cut the indices table out of the homepage, so only that fragment is
+# parsed instead of the whole (several hundred KB) document.
+def extract_table(html):
+    match = TABLE_TAG.search(html)
+    if match is None:
+        raise ValueError("investing.com: datatable-v2 table not found")
+    end = html.find("</table>", match.end())
+    if end < 0:
+        raise ValueError("investing.com: datatable-v2 table is not closed")
+    return html[match.start():end + len("</table>")]
+
+
+# Function 1.1: Table rows as (name, last, high, low, change, percent, time) text.
+# Both parsers take a cell's full text and collapse its whitespace the same way, so
+# names (part of the change-detection key) do not depend on whether lxml is installed.
+def _cell_text(text):
+    return " ".join(text.split())
+
+def _table_cells_lxml(fragment):
+    table = lxml_html.fragment_fromstring(fragment)
+    for row in table.iter("tr"):
+        cells = row.findall("td")
+        if len(cells) >= 7:
+            time_tag = cells[6].find(".//time")
+            timestamp = time_tag.get("datetime") if time_tag is not None else None
+            yield [_cell_text(cell.text_content()) for cell in cells[:6]] + [timestamp]
+
+def _table_cells_bs4(fragment):
+    from bs4 import BeautifulSoup
+
+    table = BeautifulSoup(fragment, "html.parser")
+    for row in table.find_all("tr"):
+        cells = row.find_all("td")
+        if len(cells) >= 7:
+            # Extract the <time> tag inside the last cell
+            time_tag = cells[6].find("time")
+            timestamp = time_tag["datetime"] if time_tag and time_tag.has_attr("datetime") else None
+            yield [_cell_text(cell.get_text()) for cell in cells[:6]] + [timestamp]
+
+
+# Function 1.2: Scrape the indices table; numbers come back as floats
+# ("12,345.67" -> 12345.67, "+1.23%" -> 1.23).
+def scrape_indices():
+    html = get_client("investing").get_text("")
+    fragment = extract_table(html)
+    table_cells = _table_cells_lxml if lxml_html is not None else _table_cells_bs4
+
+    data = []
+    for name, last, high, low, change, percent, timestamp in table_cells(fragment):
+        data.append({
+            "name": name,
+            "last": parse_number(last),
+            "high": parse_number(high),
+            "low": parse_number(low),
+            "change": parse_number(change),
+            "percent": parse_number(percent),
+            "time": timestamp
+        })
+
+    return data
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: Insert one scraped snapshot into investing_indices.
+# Outside market hours every scrape returns the same market_time and values, so by
+# default a row is only written when (name, market_time, value_hash) is not stored
+# yet (INVESTING_SKIP_UNCHANGED=0 appends every row, the old behaviour).
+SKIP_UNCHANGED = os.environ.get("INVESTING_SKIP_UNCHANGED", "1") != "0"
+
+INSERT_INDICES_SQL = """
+    INSERT INTO investing_indices
+    (name, last_value, high_value, low_value, change, change_percent, market_time, insert_date, value_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Same parameters; ?1 = name, ?7 = market_time, ?9 = value_hash
+INSERT_CHANGED_INDICES_SQL = """
+    INSERT INTO investing_indices
+    (name, last_value, high_value, low_value, change, change_percent, market_time, insert_date, value_hash)
+    SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9
+    WHERE NOT EXISTS (
+        SELECT 1 FROM investing_indices
+        WHERE name = ?1 AND market_time IS ?7 AND value_hash = ?9
+    )
+"""
+
+def indices_loader(session=None, skip_unchanged=SKIP_UNCHANGED):
+    with metrics.labels(provider="investing", job="indices"):
+        _indices_loader(session, skip_unchanged)
+    metrics.flush()
+
+
+def _indices_loader(session, skip_unchanged):
+    with metrics.stage("fetch_parse"):
+        data = scrape_indices()
+
+    # One timestamp for the whole snapshot
+    snapshot_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    rows = []
+    for entry in data:
+        values = (entry["last"], entry["high"], entry["low"], entry["change"], entry["percent"])
+        rows.append((entry["name"], *values, entry["time"], snapshot_time, value_hash(values)))
+
+    metrics.count("rows_parsed", len(rows))
+
+    insert_sql = INSERT_CHANGED_INDICES_SQL if skip_unchanged else INSERT_INDICES_SQL
+    with session_scope(session) as session:
+        with metrics.stage("insert"), session.transaction():
+            inserted = session.executemany(insert_sql, rows).rowcount
+    metrics.count("rows_inserted", inserted)
+    metrics.count("rows_ignored", len(rows) - inserted)
+
+    print(f"Data inserted successfully! ({inserted} new rows, {len(rows) - inserted} unchanged)")
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 3: Retention compaction of investing_indices.
+# Each tier is (age in days, interval in seconds): snapshots older than the age keep
+# one row per index per interval, the latest one (highest id). The default turns
+# rows older than 7 days into hourly data and rows older than 90 days into daily data;
+# INVESTING_RETENTION="7:3600,90:86400" overrides it (empty disables compaction).
+# All tiers run as set-based DELETEs in one transaction; insert_date is UTC.
+RETENTION = os.environ.get("INVESTING_RETENTION", "7:3600,90:86400")
+
+COMPACT_INDICES_SQL = """
+    DELETE FROM investing_indices
+    WHERE insert_date < :cutoff
+      AND id NOT IN (
+          SELECT MAX(id) FROM investing_indices
+          WHERE insert_date < :cutoff
+          GROUP BY name, CAST(strftime('%s', insert_date) AS INTEGER) / :interval
+      )
+"""
+
+def parse_retention(text):
+    tiers = []
+    for part in text.split(","):
+        if part.strip():
+            days, interval = part.split(":")
+            tiers.append((float(days), int(interval)))
+    return sorted(tiers)
+
+
+def compact_indices(session=None, retention=RETENTION, now=None):
+    now = now or datetime.now(timezone.utc)
+    tiers = parse_retention(retention)
+    deleted = 0
+
+    with metrics.labels(provider="investing", job="indices_compaction"):
+        with session_scope(session) as session:
+            with metrics.stage("compact"), session.transaction():
+                for days, interval in tiers:
+                    cutoff = (now - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+                    deleted += session.execute(
+                        COMPACT_INDICES_SQL, {"cutoff": cutoff, "interval": interval}
+                    ).rowcount
+        metrics.count("rows_deleted", deleted)
+    metrics.flush()
+
+    print(f"Compacted investing_indices: {deleted} rows removed.")
+    return deleted
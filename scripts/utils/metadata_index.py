@@ -0,0 +1,73 @@
+# ------------------------------------------------------------------------------------
+# SQL for alphav_metadata
+LOAD_METADATA_SQL = """
+    SELECT source_type, symbol, market, interval, max_data_date, api_last_refresh, update_date
+    FROM alphav_metadata
+"""
+
+# update_date is the revalidation token of the series caches (queries.py) and the
+# Parquet export, so it has millisecond precision: a write in the same second as a
+# cached read must still change it. Gap fills (gaps.py) set it the same way.
+NOW_MS_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+UPSERT_METADATA_SQL = f"""
+    INSERT INTO alphav_metadata (
+        source_type, symbol, market, interval, max_data_date, api_last_refresh, update_date
+    )
+    VALUES (?, ?, ?, ?, ?, ?, {NOW_MS_SQL})
+    ON CONFLICT(source_type, symbol, market, interval)
+    DO UPDATE SET
+        max_data_date = excluded.max_data_date,
+        api_last_refresh = excluded.api_last_refresh,
+        update_date = {NOW_MS_SQL}
+"""
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: Run-level, in-memory view of alphav_metadata.
+# Every row is loaded with one query when a batch starts and lookups are served
+# from a dict keyed by (source_type, symbol, market, interval). Updates are
+# buffered and written back with a single executemany upsert by flush().
+class MetadataIndex:
+    def __init__(self, session):
+        self.session = session
+        self.rows = {}
+        self.pending = {}
+        self.reload()
+
+    def reload(self):
+        self.rows = {
+            (source_type, symbol, market, interval): {
+                "max_data_date": max_data_date,
+                "api_last_refresh": api_last_refresh,
+                "update_date": update_date,
+            }
+            for source_type, symbol, market, interval, max_data_date, api_last_refresh, update_date
+            in self.session.fetchall(LOAD_METADATA_SQL)
+        }
+
+    def get(self, source_type, symbol, market, interval):
+        return self.rows.get((source_type, symbol, market, interval))
+
+    def max_data_date(self, source_type, symbol, market, interval):
+        row = self.get(source_type, symbol, market, interval)
+        return row["max_data_date"] if row else None
+
+    def update(self, source_type, symbol, market, interval, max_data_date, api_last_refresh):
+        key = (source_type, symbol, market, interval)
+        row = self.rows.setdefault(key, {"update_date": None})
+        row["max_data_date"] = max_data_date
+        row["api_last_refresh"] = api_last_refresh
+        self.pending[key] = key + (max_data_date, api_last_refresh)
+
+    # Write buffered updates in one bulk upsert (joins the caller's transaction if any).
+    def flush(self):
+        if not self.pending:
+            return 0
+        with self.session.transaction():
+            self.session.executemany(UPSERT_METADATA_SQL, list(self.pending.values()))
+        flushed = len(self.pending)
+        self.pending.clear()
+        return flushed
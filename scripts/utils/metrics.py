@@ -0,0 +1,177 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Lightweight run instrumentation.
+#   with metrics.labels(provider="alphavantage", symbol="AAPL"):
+#       with metrics.stage("fetch"):
+#           ...
+#       metrics.count("rows_inserted", 250)
+#
+# Labels set with metrics.labels() apply to every stage and counter recorded inside
+# the block (per thread / task, via contextvars), so low-level code such as the HTTP
+# client reports bytes and throttle events under the symbol being loaded.
+#
+# Every stage and counter is appended to a JSON-lines event log; totals are written
+# in Prometheus text format by flush() (one .prom file per entry point, e.g.
+# metrics/insert_coingecko_price.prom, for node_exporter's textfile collector).
+# GEDAP_METRICS=0 keeps the in-memory totals but writes no files.
+
+METRICS_DIR = Path(os.environ.get("GEDAP_METRICS_DIR", "./metrics"))
+ENTRY_POINT = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] not in ("", "-c") else "gedap"
+LOG_FILE = Path(os.environ.get("GEDAP_METRICS_LOG", METRICS_DIR / "events.jsonl"))
+PROM_FILE = Path(os.environ.get("GEDAP_METRICS_PROM", METRICS_DIR / f"{ENTRY_POINT}.prom"))
+ENABLED = os.environ.get("GEDAP_METRICS", "1") != "0"
+
+# Counter help texts (exported as gedap_<name>_total)
+COUNTERS = {
+    "bytes_downloaded": "Response bytes downloaded (decoded body).",
+    "rows_parsed": "Rows parsed from provider payloads.",
+    "rows_inserted": "Rows written to the database.",
+    "rows_ignored": "Parsed rows skipped by the database (already stored).",
+    "rows_updated": "Stored rows changed by a sync.",
+    "rows_deleted": "Stored rows removed by a sync (e.g. delisted coins) or a compaction.",
+    "derived_rows": "Derived metric rows recomputed (returns, averages, FX conversions).",
+    "rollup_buckets": "Weekly/monthly/yearly rollup bars rewritten.",
+    "throttle_events": "Throttled responses (HTTP 429 or throttle payloads).",
+    "retries": "Requests retried after a transient error.",
+    "cache_hits": "Responses served from the local response cache.",
+}
+
+_labels = contextvars.ContextVar("gedap_metric_labels", default=())
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Prometheus label formatting
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: Process-wide registry of stage timings and counters (thread-safe).
+class Metrics:
+    def __init__(self, log_file=LOG_FILE, prom_file=PROM_FILE, enabled=ENABLED):
+        self.log_file = Path(log_file)
+        self.prom_file = Path(prom_file)
+        self.enabled = enabled
+        self.counters = {}      # (name, labels) -> value
+        self.timings = {}       # (stage, labels) -> [count, total seconds]
+        self.lock = threading.RLock()     # flush() renders while holding it
+        self.log_handle = None
+
+    @contextmanager
+    def labels(self, **labels):
+        merged = dict(_labels.get())
+        merged.update({k: v for k, v in labels.items() if v is not None})
+        token = _labels.set(tuple(sorted(merged.items())))
+        try:
+            yield
+        finally:
+            _labels.reset(token)
+
+    def _current(self, labels):
+        if not labels:
+            return _labels.get()
+        merged = dict(_labels.get())
+        merged.update({k: v for k, v in labels.items() if v is not None})
+        return tuple(sorted(merged.items()))
+
+    @contextmanager
+    def stage(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def observe(self, stage, seconds, **labels):
+        key_labels = self._current(labels)
+        with self.lock:
+            timing = self.timings.setdefault((stage, key_labels), [0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+        self.log("stage", key_labels, stage=stage, seconds=round(seconds, 6))
+
+    def count(self, name, value=1, **labels):
+        if not value:
+            return
+        key_labels = self._current(labels)
+        with self.lock:
+            self.counters[(name, key_labels)] = self.counters.get((name, key_labels), 0) + value
+        self.log("count", key_labels, counter=name, value=value)
+
+    def log(self, event, labels, **fields):
+        if not self.enabled:
+            return
+        record = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "event": event}
+        record.update(labels)
+        record.update(fields)
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            if self.log_handle is None:
+                self.log_file.parent.mkdir(parents=True, exist_ok=True)
+                self.log_handle = open(self.log_file, "a", buffering=1)
+            self.log_handle.write(line)
+
+    # Prometheus text exposition of the totals recorded so far
+    def render(self):
+        with self.lock:
+            timings = sorted(self.timings.items())
+            counters = sorted(self.counters.items())
+
+        lines = [
+            "# HELP gedap_stage_seconds Time spent per ingestion stage.",
+            "# TYPE gedap_stage_seconds summary",
+        ]
+        for (stage, labels), (count, total) in timings:
+            label_text = _format_labels((("stage", stage),) + labels)
+            lines.append(f"gedap_stage_seconds_sum{label_text} {total:.6f}")
+            lines.append(f"gedap_stage_seconds_count{label_text} {count}")
+
+        for name in sorted({name for (name, _), _ in counters}):
+            metric = f"gedap_{name}_total"
+            lines.append(f"# HELP {metric} {COUNTERS.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+            for (counter, labels), value in counters:
+                if counter == name:
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Write the .prom file atomically (the collector never reads a partial file).
+    # Loaders flush from their own threads: the lock serializes flushes and the temp
+    # file is unique per process and thread.
+    def flush(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.prom_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.prom_file.with_suffix(f".prom.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(self.render())
+            os.replace(tmp, self.prom_file)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.timings.clear()
+
+
+metrics = Metrics()
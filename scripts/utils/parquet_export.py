@@ -0,0 +1,249 @@
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from itertools import groupby
+from pathlib import Path
+
+from .columnar import SERIES_FIELDS
+from .db_session import session_scope
+from .queries import SERIES
+from .storage import require_session_tables
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Columnar export of the time-series tables to Parquet, partitioned as
+#   <export_dir>/source_type=<type>/symbol=<symbol>/year=<yyyy>/part-0.parquet
+# fx/crypto/price series fold the market into the symbol ("USD_EUR", "BTC_USD").
+#
+# Exports are incremental: _export_state.json remembers, per series, the watermark
+# exported last time (alphav_metadata max_data_date/update_date, or the newest
+# coingecko_price last_updated_at). Only the partitions from the watermark's year
+# onwards are rewritten for series that changed; untouched partitions stay as-is.
+# Bars rewritten before the watermark (reconcile revisions, backfilled gaps) are
+# read from alphav_revisions: the state also keeps the last revision id exported,
+# and a series with later revisions is rewritten from the year of its earliest
+# revised or new bar. A full export clears the partition directories first.
+
+EXPORT_DIR = os.environ.get("GEDAP_EXPORT_DIR", "./export")
+STATE_FILE = "_export_state.json"
+
+# source_type -> (table, key columns, value columns with Arrow type names), from the
+# read API's SERIES; integer fields of the payload (stocks volume) stay int64
+ARROW_TYPES = {"f": "float64", "i": "int64", "m": "float64"}
+
+ALPHAV_TABLES = {
+    source_type: (table, key_columns, tuple(
+        (name, ARROW_TYPES[kind])
+        for name, _, kind in SERIES_FIELDS[source_type] if name in value_columns
+    ))
+    for source_type, (table, key_columns, value_columns) in SERIES.items()
+}
+
+PRICE_COLUMNS = (
+    ("price", "float64"), ("market_cap", "float64"),
+    ("24h_vol", "float64"), ("24h_change", "float64"),
+)
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: pyarrow is an optional dependency, only needed for this stage.
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("pyarrow is required for Parquet export (pip install pyarrow)") from e
+    return pa, pq
+
+
+# Function 2: State file helpers
+def load_state(export_dir):
+    path = Path(export_dir) / STATE_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_state(export_dir, state):
+    path = Path(export_dir) / STATE_FILE
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# Function 3: Write one partition file atomically (readers never see a partial file).
+def write_partition(export_dir, source_type, symbol, year, columns):
+    pa, pq = _pyarrow()
+    directory = Path(export_dir) / f"source_type={source_type}" / f"symbol={symbol}" / f"year={year}"
+    directory.mkdir(parents=True, exist_ok=True)
+
+    table = pa.table(columns)
+    tmp = directory / "part-0.parquet.tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, directory / "part-0.parquet")
+
+
+# rows are (time key, value, ...) tuples; time_column is the Arrow array for the key.
+def _arrow_columns(time_name, time_column, rows, value_columns):
+    pa, _ = _pyarrow()
+    transposed = list(zip(*rows))[1:] if rows else [[] for _ in value_columns]
+    columns = {time_name: time_column}
+    for (name, type_name), values in zip(value_columns, transposed):
+        columns[name] = pa.array(values, type=getattr(pa, type_name)())
+    return columns
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 4: Export changed AlphaVantage series.
+REVISIONS_STATE = "alphav_revisions"
+
+REVISED_SINCE_SQL = """
+    SELECT source_type, symbol, market, interval,
+           MAX(id), MIN(first_changed_date), MIN(first_new_date)
+    FROM alphav_revisions
+    WHERE id > ?
+    GROUP BY source_type, symbol, market, interval
+"""
+
+# (source_type, symbol, market, interval) -> earliest bar rewritten since revision
+# `after`; returns it with the newest revision id read
+def revised_since(session, after):
+    revised = {}
+    last_id = after
+    for source_type, symbol, market, interval, max_id, first_changed, first_new in session.fetchall(
+        REVISED_SINCE_SQL, (after,)
+    ):
+        dates = [d for d in (first_changed, first_new) if d]
+        if dates:
+            revised[(source_type, symbol, market, interval)] = min(dates)
+        last_id = max(last_id, max_id)
+    return revised, last_id
+
+
+def export_alphav(session, export_dir, state, full=False):
+    pa, _ = _pyarrow()
+    require_session_tables("The AlphaVantage Parquet export")
+    written = 0
+    metadata = session.fetchall("""
+        SELECT source_type, symbol, market, interval, max_data_date, update_date
+        FROM alphav_metadata
+        ORDER BY source_type, symbol, market
+    """)
+    revised, last_revision = revised_since(session, state.get(REVISIONS_STATE, 0))
+
+    for source_type, symbol, market, interval, max_data_date, update_date in metadata:
+        if source_type not in ALPHAV_TABLES or max_data_date is None:
+            continue
+        table, key_columns, value_columns = ALPHAV_TABLES[source_type]
+
+        state_key = f"alphav/{source_type}/{symbol}/{market}/{interval}"
+        previous = state.get(state_key)
+        token = {"max_data_date": max_data_date, "update_date": update_date}
+        rewritten_from = revised.get((source_type, symbol, market, interval))
+        if previous == token and rewritten_from is None and not full:
+            continue
+
+        # Rewrite from the previously exported year (the open partition), or the year
+        # of the earliest revised bar, onwards
+        start_year = None
+        if not full and previous is not None:
+            start_year = min(d for d in (previous["max_data_date"], rewritten_from) if d)[:4]
+        key_params = (symbol,) if len(key_columns) == 1 else (symbol, market)
+        key_clause = " AND ".join(f"{column} = ?" for column in key_columns)
+        date_clause = " AND date >= ?" if start_year else ""
+        date_params = (f"{start_year}-01-01",) if start_year else ()
+
+        rows = session.fetchall(f"""
+            SELECT date, {", ".join(name for name, _ in value_columns)}
+            FROM {table}
+            WHERE {key_clause}{date_clause}
+            ORDER BY date
+        """, key_params + date_params)
+
+        partition_symbol = symbol if len(key_columns) == 1 else f"{symbol}_{market}"
+        for year, group in groupby(rows, key=lambda row: row[0][:4]):
+            group = list(group)
+            dates = pa.array([row[0] for row in group]).cast(pa.date32())
+            columns = _arrow_columns("date", dates, group, value_columns)
+            write_partition(export_dir, source_type, partition_symbol, year, columns)
+            written += 1
+
+        state[state_key] = token
+
+    state[REVISIONS_STATE] = last_revision
+    return written
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 5: Export changed CoinGecko price series (partitioned by last_updated_at year).
+def export_coingecko_price(session, export_dir, state, full=False):
+    pa, _ = _pyarrow()
+    written = 0
+    latest = session.fetchall("""
+        SELECT crypto, currency, MAX(last_updated_at)
+        FROM coingecko_price
+        GROUP BY crypto, currency
+    """)
+
+    for crypto, currency, last_updated_at in latest:
+        state_key = f"coingecko_price/{crypto}/{currency}"
+        previous = state.get(state_key)
+        if previous == last_updated_at and not full:
+            continue
+
+        start = 0
+        if previous is not None and not full:
+            previous_year = datetime.fromtimestamp(previous, timezone.utc).year
+            start = int(datetime(previous_year, 1, 1, tzinfo=timezone.utc).timestamp())
+
+        rows = session.fetchall("""
+            SELECT last_updated_at, price, market_cap, "24h_vol", "24h_change"
+            FROM coingecko_price
+            WHERE crypto = ? AND currency = ? AND last_updated_at >= ?
+            ORDER BY last_updated_at
+        """, (crypto, currency, start))
+
+        by_year = lambda row: datetime.fromtimestamp(row[0], timezone.utc).year
+        for year, group in groupby(rows, key=by_year):
+            group = list(group)
+            timestamps = pa.array([row[0] for row in group], type=pa.int64()).cast(pa.timestamp("s", tz="UTC"))
+            columns = _arrow_columns("last_updated_at", timestamps, group, PRICE_COLUMNS)
+            write_partition(export_dir, "coingecko_price", f"{crypto}_{currency}", year, columns)
+            written += 1
+
+        state[state_key] = last_updated_at
+
+    return written
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function X: parquet_exporter
+# full=True rewrites every partition and resets the watermarks; partitions of
+# series or years no longer stored are removed with the old tree.
+def parquet_exporter(export_dir=EXPORT_DIR, full=False, session=None):
+    _pyarrow()
+    Path(export_dir).mkdir(parents=True, exist_ok=True)
+    state = {} if full else load_state(export_dir)
+    if full:
+        for directory in Path(export_dir).glob("source_type=*"):
+            shutil.rmtree(directory)
+
+    with session_scope(session) as session:
+        written = export_alphav(session, export_dir, state, full)
+        written += export_coingecko_price(session, export_dir, state, full)
+
+    save_state(export_dir, state)
+    print(f"Exported {written} Parquet partitions to {export_dir}")
+    return written
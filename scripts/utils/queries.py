@@ -0,0 +1,306 @@
+import threading
+from collections import OrderedDict
+from itertools import groupby
+
+from .columnar import np, to_date_column, to_nullable_float_column
+from .db_session import session_scope
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Read API for the AlphaVantage time series.
+# Series come back as columns: {"date": datetime64[D] array, "open": float64 array, ...}
+# (array.array / lists when NumPy is not installed). Results are cached in a bounded
+# LRU keyed on (table, symbol, market, start, end) and revalidated against
+# alphav_metadata.update_date, so repeated dashboard reads skip SQLite entirely
+# until the loader writes new data for that series.
+# Returns, moving averages, volatility and FX-converted crypto closes are read from
+# the tables derived.py maintains (get_metrics, get_converted_close) instead of being
+# computed over full histories at read time. get_resampled() serves long ranges from
+# the weekly / monthly / yearly rollups instead of every daily bar.
+
+# source_type -> (table, key columns, value columns)
+SERIES = {
+    "stocks": ("alphav_stocks_daily", ("symbol",), ("open", "high", "low", "close", "volume")),
+    "fx": ("alphav_fx_daily", ("from_currency", "to_currency"), ("open", "high", "low", "close")),
+    "crypto": ("alphav_crypto_daily", ("crypto_code", "fiat_currency"), ("open", "high", "low", "close", "volume")),
+    "commodity": ("alphav_commodity", ("commodity_id",), ("value",)),
+}
+
+CACHE_SIZE = 256
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: Bounded LRU of column dicts, each stored with the metadata token it was read at.
+# A None token (no alphav_metadata row yet) is never cached: nothing would change it
+# when the series is first loaded.
+class SeriesCache:
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, token):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or token is None or entry[0] != token:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, token, columns):
+        if token is None:
+            return
+        with self.lock:
+            self.entries[key] = (token, columns)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+series_cache = SeriesCache()
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: SQL helpers
+def _range_clause(start, end):
+    clause, params = "", []
+    if start is not None:
+        clause += " AND date >= ?"
+        params.append(start)
+    if end is not None:
+        clause += " AND date <= ?"
+        params.append(end)
+    return clause, params
+
+# Metadata token per symbol: changes whenever the loader writes that series.
+# Commodities are stored under their native interval (daily or monthly), so the
+# interval filter only applies to the daily series tables.
+def _tokens(session, source_type, symbols, market, interval):
+    placeholders = ", ".join("?" for _ in symbols)
+    interval_clause = "" if source_type == "commodity" else " AND interval = ?"
+    interval_params = () if source_type == "commodity" else (interval,)
+    rows = session.fetchall(f"""
+        SELECT symbol, market, update_date, max_data_date
+        FROM alphav_metadata
+        WHERE source_type = ?{interval_clause} AND symbol IN ({placeholders})
+    """, (source_type, *interval_params, *symbols))
+
+    tokens = {}
+    for row_symbol, row_market, update_date, max_data_date in rows:
+        if len(SERIES[source_type][1]) == 1 or row_market == market:
+            tokens[row_symbol] = (update_date, max_data_date)
+    return tokens
+
+def _to_columns(source_type, rows):
+    return _rows_to_columns(SERIES[source_type][2], rows)
+
+# rows of (date, *value_columns)
+def _rows_to_columns(value_columns, rows):
+    if rows:
+        transposed = list(zip(*rows))
+    else:
+        transposed = [[] for _ in range(len(value_columns) + 1)]
+
+    columns = {"date": to_date_column(transposed[0])}
+    for name, values in zip(value_columns, transposed[1:]):
+        columns[name] = to_nullable_float_column(values)
+
+    # Cached arrays are shared between callers: make them read-only
+    if np is not None:
+        for array in columns.values():
+            array.flags.writeable = False
+    return columns
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: One series as columns, e.g. get_ohlc("stocks", "AAPL", "2024-01-01", "2024-06-30").
+# For fx, symbol is the from-currency and market the to-currency (as stored by the loader).
+def get_ohlc(source_type, symbol, start=None, end=None, market="USD", interval="daily", session=None):
+    return get_many([symbol], source_type, start, end, market, interval, session)[symbol]
+
+
+# Function 3: Several series of one source type; cache misses are read with one
+# query through the configured storage backend (see storage.py).
+def get_many(symbols, source_type, start=None, end=None, market="USD", interval="daily", session=None):
+    if source_type not in SERIES:
+        raise ValueError(f"Invalid source_type: {source_type}")
+    table = SERIES[source_type][0]
+    symbols = list(dict.fromkeys(symbols))
+
+    with session_scope(session) as session:
+        tokens = _tokens(session, source_type, symbols, market, interval)
+
+        results = {}
+        missing = []
+        for symbol in symbols:
+            key = (table, symbol, market, start, end)
+            cached = series_cache.get(key, tokens.get(symbol))
+            if cached is None:
+                missing.append(symbol)
+            else:
+                results[symbol] = cached
+
+        if missing:
+            from .storage import storage_for
+            rows = storage_for(session).read_range(source_type, missing, market, start, end)
+
+            grouped = {
+                symbol: [row[1:] for row in group]
+                for symbol, group in groupby(rows, key=lambda row: row[0])
+            }
+            for symbol in missing:
+                columns = _to_columns(source_type, grouped.get(symbol, []))
+                series_cache.put((table, symbol, market, start, end), tokens.get(symbol), columns)
+                results[symbol] = columns
+
+    return results
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 4: Precomputed metrics (derived.py) for one series, as columns: date, close,
+# log_return, ma_20, ma_50, ma_200, vol_20, vol_60. Cached like get_many; the loader
+# writes the metrics in the same transaction as the series, so the token covers both.
+def get_metrics(source_type, symbol, start=None, end=None, market="USD", session=None):
+    from .derived import DERIVED_SOURCES, METRIC_COLUMNS
+    from .storage import require_session_tables
+    if source_type not in DERIVED_SOURCES:
+        raise ValueError(f"No derived metrics for source_type: {source_type}")
+    require_session_tables("get_metrics")
+
+    with session_scope(session) as session:
+        token = _tokens(session, source_type, [symbol], market, "daily").get(symbol)
+        key = ("derived_daily_metrics", source_type, symbol, market, start, end)
+        cached = series_cache.get(key, token)
+        if cached is not None:
+            return cached
+
+        range_clause, range_params = _range_clause(start, end)
+        rows = session.fetchall(f"""
+            SELECT date, {", ".join(METRIC_COLUMNS)}
+            FROM derived_daily_metrics
+            WHERE source_type = ? AND symbol = ? AND market = ?{range_clause}
+            ORDER BY date
+        """, (source_type, symbol, market, *range_params))
+
+    columns = _rows_to_columns(METRIC_COLUMNS, rows)
+    series_cache.put(key, token, columns)
+    return columns
+
+
+# Function 5: A crypto close series converted into another currency, e.g.
+# get_converted_close("BTC", "MXN"): columns date, close, fx_rate.
+def get_converted_close(crypto_code, currency, start=None, end=None, session=None):
+    from .derived import BASE_CURRENCY
+    from .storage import require_session_tables
+    require_session_tables("get_converted_close")
+    with session_scope(session) as session:
+        token = (
+            _tokens(session, "crypto", [crypto_code], BASE_CURRENCY, "daily").get(crypto_code),
+            _tokens(session, "fx", [BASE_CURRENCY], currency, "daily").get(BASE_CURRENCY),
+        )
+        key = ("derived_crypto_fx", crypto_code, currency, start, end)
+        cached = series_cache.get(key, token)
+        if cached is not None:
+            return cached
+
+        range_clause, range_params = _range_clause(start, end)
+        rows = session.fetchall(f"""
+            SELECT date, close, fx_rate
+            FROM derived_crypto_fx
+            WHERE crypto_code = ? AND currency = ?{range_clause}
+            ORDER BY date
+        """, (crypto_code, currency, *range_params))
+
+    columns = _rows_to_columns(("close", "fx_rate"), rows)
+    series_cache.put(key, token, columns)
+    return columns
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 6: One series at the finest resolution that fits max_points, e.g.
+# get_resampled("stocks", "AAPL", "2005-01-01", max_points=500) -> ("weekly", columns).
+# Point counts come from the rollups (rollups.py): their bar counts give the number of
+# native rows without touching the daily table. Columns are named as in get_ohlc (the
+# bucket start is the date); when nothing fits, the coarsest resolution is returned.
+def get_resampled(source_type, symbol, start=None, end=None, market="USD", max_points=1000,
+                  interval="daily", session=None):
+    from .rollups import RESOLUTIONS, resolutions_for
+    from .storage import has_session_tables
+    if source_type not in SERIES:
+        raise ValueError(f"Invalid source_type: {source_type}")
+    value_columns = SERIES[source_type][2]
+    lower, upper = start or "", end or "9999-12-31"
+
+    # Rollups are only maintained when the bars are stored in SQLite
+    if not has_session_tables():
+        return interval, get_many([symbol], source_type, start, end, market, interval, session)[symbol]
+
+    with session_scope(session) as session:
+        counts = dict(
+            (resolution, (buckets, bars)) for resolution, buckets, bars in session.fetchall("""
+                SELECT resolution, COUNT(*), SUM(bars)
+                FROM alphav_rollups
+                WHERE source_type = ? AND symbol = ? AND market = ?
+                  AND bucket <= ? AND last_date >= ?
+                GROUP BY resolution
+            """, (source_type, symbol, market, upper, lower))
+        )
+        available = [r for r in RESOLUTIONS if r in counts and r in resolutions_for(interval)]
+        if not available:
+            return interval, get_many([symbol], source_type, start, end, market, interval, session)[symbol]
+
+        native_points = counts[available[0]][1]
+        if native_points <= max_points:
+            return interval, get_many([symbol], source_type, start, end, market, interval, session)[symbol]
+        resolution = next((r for r in available if counts[r][0] <= max_points), available[-1])
+
+        token = _tokens(session, source_type, [symbol], market, interval).get(symbol)
+        key = ("alphav_rollups", source_type, symbol, market, resolution, start, end)
+        cached = series_cache.get(key, token)
+        if cached is not None:
+            return resolution, cached
+
+        selected = ", ".join("close" if c == "value" else c for c in value_columns)
+        rows = session.fetchall(f"""
+            SELECT bucket, {selected}
+            FROM alphav_rollups
+            WHERE source_type = ? AND symbol = ? AND market = ? AND resolution = ?
+              AND bucket <= ? AND last_date >= ?
+            ORDER BY bucket
+        """, (source_type, symbol, market, resolution, upper, lower))
+
+    columns = _rows_to_columns(value_columns, rows)
+    series_cache.put(key, token, columns)
+    return resolution, columns
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 7: Columns as a pyarrow Table (optional dependency).
+def to_arrow(columns):
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("pyarrow is required for Arrow output (pip install pyarrow)") from e
+    return pa.table({name: values for name, values in columns.items()})
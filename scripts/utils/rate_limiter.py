@@ -0,0 +1,79 @@
+import threading
+import time
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Raised when waiting for a token would take longer than the caller allows
+# (e.g. the daily quota is spent and only refills tomorrow).
+class QuotaExhaustedError(RuntimeError):
+    pass
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: Token bucket. Holds up to `capacity` tokens and refills `capacity`
+# tokens every `period` seconds, continuously.
+class TokenBucket:
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / float(period)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    # Seconds until one token is available (0.0 if one is available now).
+    def wait_time(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 2: Rate limiter combining a per-minute and a per-day bucket.
+# Thread-safe: one instance is shared by every worker calling the same API.
+class RateLimiter:
+    def __init__(self, requests_per_minute, requests_per_day=None, max_wait=300):
+        self.buckets = [TokenBucket(requests_per_minute, 60)]
+        if requests_per_day:
+            self.buckets.append(TokenBucket(requests_per_day, 86400))
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+
+    # Block until every bucket has a token, then spend one from each.
+    # Returns immediately when quota is available.
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = max(bucket.wait_time(now) for bucket in self.buckets)
+                if wait == 0:
+                    for bucket in self.buckets:
+                        bucket.take()
+                    return
+                if self.max_wait is not None and wait > self.max_wait:
+                    raise QuotaExhaustedError(
+                        f"Rate limit quota exhausted; next request allowed in {wait:.0f}s"
+                    )
+            time.sleep(wait)
+
+    # The provider reported its daily quota spent: empty the daily bucket so the next
+    # acquire() raises QuotaExhaustedError instead of sending a doomed request.
+    def drain(self):
+        with self.lock:
+            for bucket in self.buckets[1:]:
+                bucket.tokens = 0.0
+                bucket.updated = time.monotonic()
@@ -0,0 +1,131 @@
+from .queries import SERIES
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Reconcile mode for AlphaVantage series.
+# Instead of pushing a whole fetched window through INSERT OR IGNORE, the window is
+# loaded into a temp staging table and compared with the stored bars set-wise:
+#   new       -> key not stored yet                      -> INSERT
+#   changed   -> key stored, any value differs (revision) -> UPDATE
+#   unchanged -> identical bar                            -> no write
+# Each run's counts (and the date range of revised bars, and the first new bar) go to
+# alphav_revisions.
+# Every lookup walks the staging rows and probes the target's primary key, so the
+# cost follows the fetched window, and only new/changed bars touch the table.
+
+RECONCILE_SQL = {}
+
+RECORD_REVISION_SQL = """
+    INSERT INTO alphav_revisions (
+        source_type, symbol, market, interval,
+        fetched_rows, new_rows, changed_rows, unchanged_rows,
+        first_changed_date, last_changed_date, first_new_date
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Build the statements for one source type (once, at import, so the
+# SQL text is constant and stays in the session's statement cache).
+def _build_sql(source_type):
+    table, key_columns, value_columns = SERIES[source_type]
+    keys = key_columns + ("date",)
+    stage = f"reconcile_stage_{source_type}"
+    changed = f"reconcile_changed_{source_type}"
+
+    all_columns = ", ".join(keys + value_columns)
+    # No declared types: staged values keep the Python type the parser produced, so
+    # the comparison with the stored bars is the same one INSERT would have made
+    column_defs = ", ".join(f"{c} NOT NULL" for c in keys) + ", " + ", ".join(value_columns)
+    key_match = lambda a, b: " AND ".join(f"{a}.{c} = {b}.{c}" for c in keys)
+    differs = " OR ".join(f"s.{c} IS NOT t.{c}" for c in value_columns)
+
+    return {
+        "create": [
+            f"CREATE TEMP TABLE IF NOT EXISTS {stage} ({column_defs}, PRIMARY KEY ({', '.join(keys)})) WITHOUT ROWID",
+            f"CREATE TEMP TABLE IF NOT EXISTS {changed} ({column_defs}, PRIMARY KEY ({', '.join(keys)})) WITHOUT ROWID",
+        ],
+        "clear": [f"DELETE FROM {stage}", f"DELETE FROM {changed}"],
+        "stage": f"""
+            INSERT OR REPLACE INTO {stage} ({all_columns})
+            VALUES ({", ".join("?" for _ in keys + value_columns)})
+        """,
+        "find_changed": f"""
+            INSERT INTO {changed} ({all_columns})
+            SELECT {", ".join(f"s.{c}" for c in keys + value_columns)}
+            FROM {stage} AS s
+            JOIN {table} AS t ON {key_match("t", "s")}
+            WHERE {differs}
+        """,
+        "update_changed": f"""
+            UPDATE {table}
+            SET ({", ".join(value_columns)}) = (
+                SELECT {", ".join(f"c.{v}" for v in value_columns)}
+                FROM {changed} AS c
+                WHERE {key_match("c", table)}
+            )
+            WHERE ({", ".join(keys)}) IN (SELECT {", ".join(keys)} FROM {changed})
+        """,
+        "new_range": f"""
+            SELECT MIN(date) FROM {stage} AS s
+            WHERE NOT EXISTS (SELECT 1 FROM {table} AS t WHERE {key_match("t", "s")})
+        """,
+        "insert_new": f"""
+            INSERT INTO {table} ({all_columns})
+            SELECT {all_columns}
+            FROM {stage} AS s
+            WHERE NOT EXISTS (SELECT 1 FROM {table} AS t WHERE {key_match("t", "s")})
+        """,
+        "changed_range": f"SELECT COUNT(*), MIN(date), MAX(date) FROM {changed}",
+        "staged": f"SELECT COUNT(*) FROM {stage}",
+    }
+
+for _source_type in SERIES:
+    RECONCILE_SQL[_source_type] = _build_sql(_source_type)
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: Reconcile parsed rows (insert_*_rows layout: keys, date, values) with
+# the stored series. Call inside a transaction. Returns the counts.
+def reconcile_rows(session, source_type, rows):
+    sql = RECONCILE_SQL[source_type]
+    for statement in sql["create"] + sql["clear"]:
+        session.execute(statement)
+
+    session.executemany(sql["stage"], rows)
+    fetched = session.fetchone(sql["staged"])[0]
+
+    session.execute(sql["find_changed"])
+    changed, first_changed, last_changed = session.fetchone(sql["changed_range"])
+    if changed:
+        session.execute(sql["update_changed"])
+    first_new = session.fetchone(sql["new_range"])[0]
+    new = session.execute(sql["insert_new"]).rowcount if first_new is not None else 0
+
+    for statement in sql["clear"]:
+        session.execute(statement)
+
+    return {
+        "fetched": fetched,
+        "new": new,
+        "changed": changed,
+        "unchanged": fetched - new - changed,
+        "first_changed_date": first_changed,
+        "last_changed_date": last_changed,
+        "first_new_date": first_new,
+    }
+
+
+# Function 3: Append one reconcile run to alphav_revisions.
+def record_revision(session, source_type, symbol, market, interval, counts):
+    session.execute(RECORD_REVISION_SQL, (
+        source_type, symbol, market, interval,
+        counts["fetched"], counts["new"], counts["changed"], counts["unchanged"],
+        counts["first_changed_date"], counts["last_changed_date"], counts["first_new_date"],
+    ))
@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+
+
+# Query parameters that must never reach the cache key (credentials)
+SECRET_PARAMS = {"apikey", "api_key", "x_cg_demo_api_key"}
+
+# Cache location and limits (override from the environment)
+CACHE_DIR = os.environ.get("GEDAP_CACHE_DIR", "./.gedap_cache")
+CACHE_MAX_BYTES = int(os.environ.get("GEDAP_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Seconds a cached payload stays fresh, per (provider, endpoint).
+# Daily series only change once a day; CoinGecko prices go stale in minutes.
+DEFAULT_TTL = 3600
+ENDPOINT_TTLS = {
+    ("alphavantage", "query"): 6 * 3600,
+    ("coingecko", "coins/list"): 24 * 3600,
+    ("coingecko", "coins/markets"): 300,
+    ("coingecko", "simple/price"): 60,
+    ("investing", ""): 60,
+}
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Raised in replay mode when a request has no cached payload.
+class CacheMissError(LookupError):
+    pass
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Cache key = sha256 of provider + endpoint + sorted params, API key removed.
+def cache_key(provider, endpoint, params):
+    clean = sorted(
+        (str(k), str(v))
+        for k, v in (params or {}).items()
+        if str(k).lower() not in SECRET_PARAMS
+    )
+    raw = json.dumps([provider, endpoint.strip("/"), clean], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: Content-addressed on-disk cache of raw (gzip-compressed) response bodies.
+# - Files live at <cache_dir>/<key[:2]>/<key>.gz; the file mtime is the fetch time
+#   (TTL) and the atime is bumped on every hit (LRU order for eviction).
+# - replay=True never expires entries and raises CacheMissError on a miss, so the
+#   whole ETL can be re-run from cached payloads with no network.
+class ResponseCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, ttls=None, replay=False):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttls = {**ENDPOINT_TTLS, **(ttls or {})}
+        self.replay = replay
+        self.lock = threading.Lock()
+        self.size = None   # bytes on disk, measured on first write
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.gz"
+
+    def ttl(self, provider, endpoint):
+        return self.ttls.get((provider, endpoint.strip("/")), DEFAULT_TTL)
+
+    # Cached body (bytes) or None when missing / expired.
+    def get(self, provider, endpoint, params):
+        path = self._path(cache_key(provider, endpoint, params))
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            if self.replay:
+                shown = {k: v for k, v in (params or {}).items() if str(k).lower() not in SECRET_PARAMS}
+                raise CacheMissError(f"No cached payload for {provider} {endpoint} {shown}")
+            return None
+
+        if not self.replay and time.time() - stat.st_mtime > self.ttl(provider, endpoint):
+            return None
+
+        with gzip.open(path, "rb") as f:
+            body = f.read()
+        # Mark as recently used, keep mtime (fetch time) unchanged
+        os.utime(path, (time.time(), stat.st_mtime))
+        return body
+
+    def put(self, provider, endpoint, params, body):
+        if self.replay:
+            return
+        path = self._path(cache_key(provider, endpoint, params))
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temp file then rename, so readers never see a partial entry
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(body)
+
+        with self.lock:
+            # An overwritten entry gives its old size back
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp, path)
+            if self.size is None:
+                self.size = sum(p.stat().st_size for p in self.cache_dir.glob("*/*.gz"))
+            else:
+                self.size += path.stat().st_size - replaced
+            over = self.size > self.max_bytes
+
+        if over:
+            self.evict()
+
+    # Drop least-recently-used entries until the cache fits in max_bytes.
+    def evict(self):
+        with self.lock:
+            entries = []
+            total = 0
+            for path in self.cache_dir.glob("*/*.gz"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+                total += stat.st_size
+
+            if total > self.max_bytes:
+                for _, size, path in sorted(entries):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+
+            self.size = total
+
+    def clear(self):
+        with self.lock:
+            for path in self.cache_dir.glob("*/*.gz"):
+                path.unlink()
+            self.size = 0
@@ -0,0 +1,181 @@
+from datetime import date as Date, timedelta
+
+from .db_session import session_scope
+from .metrics import metrics
+from .queries import SERIES
+from .storage import require_session_tables
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Weekly / monthly / yearly OHLCV rollups of the AlphaVantage series, in
+# alphav_rollups keyed on (source_type, symbol, market, resolution, bucket), where
+# bucket is the first calendar day of the week (Monday), month or year.
+#
+# Rollups are maintained after each load: every resolution is recomputed from the
+# bucket holding the first new (or revised) date, so a daily append rewrites just the
+# open week, month and year. Commodities store a single value per date; its rollup
+# uses it for open/high/low/close. A resolution is only kept when it is coarser than
+# the series' own interval (monthly commodities get yearly bars only).
+
+RESOLUTIONS = ("weekly", "monthly", "yearly")
+
+# Interval -> coarseness, for native series intervals and rollup resolutions
+INTERVAL_RANK = {"daily": 0, "weekly": 1, "monthly": 2, "quarterly": 3, "yearly": 4, "annual": 4}
+
+# Bucket start of a 'YYYY-MM-DD' date column ('weekday 0' moves to Sunday, then back to Monday)
+BUCKET_SQL = {
+    "weekly": "date(date, 'weekday 0', '-6 days')",
+    "monthly": "strftime('%Y-%m-01', date)",
+    "yearly": "strftime('%Y-01-01', date)",
+}
+
+# source_type -> (open, high, low, close, volume) source expressions
+OHLCV_COLUMNS = {
+    "stocks": ("open", "high", "low", "close", "volume"),
+    "fx": ("open", "high", "low", "close", "NULL"),
+    "crypto": ("open", "high", "low", "close", "volume"),
+    "commodity": ("value", "value", "value", "value", "NULL"),
+}
+
+ROLLED_THROUGH_SQL = """
+    SELECT last_date FROM alphav_rollups
+    WHERE source_type = ? AND symbol = ? AND market = ? AND resolution = ?
+    ORDER BY bucket DESC LIMIT 1
+"""
+
+CLEAR_FROM_SQL = """
+    DELETE FROM alphav_rollups
+    WHERE source_type = ? AND symbol = ? AND market = ? AND resolution = ? AND bucket >= ?
+"""
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Bucket start of a date in Python (same rules as BUCKET_SQL).
+def bucket_start(resolution, day):
+    day = Date.fromisoformat(str(day)[:10])
+    if resolution == "weekly":
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if resolution == "monthly":
+        return day.replace(day=1).isoformat()
+    if resolution == "yearly":
+        return day.replace(month=1, day=1).isoformat()
+    raise ValueError(f"Invalid resolution: {resolution}")
+
+def resolutions_for(interval):
+    rank = INTERVAL_RANK.get(interval or "daily", 0)
+    return [r for r in RESOLUTIONS if INTERVAL_RANK[r] > rank]
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: Rollup statement for one source type and resolution. Open and close are
+# the bars on the bucket's first and last date (primary-key lookups).
+def _build_sql(source_type, resolution):
+    table, key_columns, _ = SERIES[source_type]
+    open_, high, low, close, volume = OHLCV_COLUMNS[source_type]
+    keys = [f":k{i}" for i in range(len(key_columns))]
+    key_match = " AND ".join(f"{c} = {k}" for c, k in zip(key_columns, keys))
+
+    return f"""
+        INSERT OR REPLACE INTO alphav_rollups (
+            source_type, symbol, market, resolution, bucket,
+            first_date, last_date, open, high, low, close, volume, bars
+        )
+        SELECT
+            :source_type, :symbol, :market, :resolution, b.bucket,
+            b.first_date, b.last_date,
+            (SELECT {open_} FROM {table} WHERE {key_match} AND date = b.first_date),
+            b.high, b.low,
+            (SELECT {close} FROM {table} WHERE {key_match} AND date = b.last_date),
+            b.volume, b.bars
+        FROM (
+            SELECT
+                {BUCKET_SQL[resolution]} AS bucket,
+                MIN(date) AS first_date, MAX(date) AS last_date,
+                MAX({high}) AS high, MIN({low}) AS low,
+                SUM({volume}) AS volume, COUNT(*) AS bars
+            FROM {table}
+            WHERE {key_match} AND date >= :start
+            GROUP BY bucket
+        ) AS b
+    """
+
+ROLLUP_SQL = {
+    (source_type, resolution): _build_sql(source_type, resolution)
+    for source_type in SERIES
+    for resolution in RESOLUTIONS
+}
+
+def _key_params(source_type, symbol, market):
+    if len(SERIES[source_type][1]) == 2:
+        return {"k0": symbol, "k1": market}
+    return {"k0": symbol}
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 3: Roll one resolution of one series forward from its open bucket (or from
+# the bucket of `since`, for revised bars). Returns the number of buckets written.
+def update_rollup(session, source_type, symbol, market, resolution, since=None, full=False):
+    table, key_columns, _ = SERIES[source_type]
+    key_params = _key_params(source_type, symbol, market)
+    key_match = " AND ".join(f"{c} = :k{i}" for i, c in enumerate(key_columns))
+
+    rolled = None if full else session.fetchone(
+        ROLLED_THROUGH_SQL, (source_type, symbol, market, resolution)
+    )
+    if rolled:
+        first_new = session.fetchone(
+            f"SELECT MIN(date) FROM {table} WHERE {key_match} AND date > :after",
+            {**key_params, "after": rolled[0]},
+        )[0]
+    else:
+        first_new = session.fetchone(f"SELECT MIN(date) FROM {table} WHERE {key_match}", key_params)[0]
+
+    if since is not None and (first_new is None or since < first_new):
+        first_new = since
+    if first_new is None:
+        return 0
+
+    start = bucket_start(resolution, first_new)
+    session.execute(CLEAR_FROM_SQL, (source_type, symbol, market, resolution, "" if full else start))
+    cursor = session.execute(ROLLUP_SQL[(source_type, resolution)], {
+        **key_params,
+        "source_type": source_type, "symbol": symbol, "market": market,
+        "resolution": resolution, "start": start,
+    })
+    return max(cursor.rowcount, 0)
+
+
+# Function 4: Rollup stage for one loaded series; call in the load's transaction.
+def update_rollups(session, source_type, symbol, market, interval="daily", since=None, full=False):
+    written = 0
+    with metrics.stage("rollups"):
+        for resolution in resolutions_for(interval):
+            written += update_rollup(session, source_type, symbol, market, resolution, since, full)
+    metrics.count("rollup_buckets", written)
+    return written
+
+
+# Function 5: Catch up the rollups of every stored series (or rebuild them: full=True).
+def refresh_rollups(session=None, full=False):
+    require_session_tables("refresh_rollups")
+    with session_scope(session) as session:
+        series = session.fetchall("SELECT source_type, symbol, market, interval FROM alphav_metadata")
+        written = 0
+        for source_type, symbol, market, interval in series:
+            if source_type not in SERIES:
+                continue
+            with metrics.labels(provider="alphavantage", source_type=source_type, symbol=symbol, market=market):
+                with session.transaction():
+                    written += update_rollups(session, source_type, symbol, market, interval, full=full)
+
+        print(f"Refreshed rollups for {len(series)} series ({written} buckets written).")
+    metrics.flush()
+    return written
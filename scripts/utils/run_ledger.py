@@ -0,0 +1,98 @@
+import os
+from datetime import date as date_cls
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Run ledger: per-job status of a batch run, so a rerun resumes where the last one
+# stopped instead of fetching every symbol again.
+#   run_ledger       one row per (name, period) run: running / partial / complete
+#   run_ledger_jobs  one row per job of the run: pending / ok / failed, attempts, error
+#
+# A run covers one period (by default the current date): rerunning a job the same day
+# resumes that day's unfinished run ('running' after a crash, or 'partial') and only
+# loads its pending or failed jobs; once a run is complete, the next one that day
+# (a manual rerun after the close, a short scheduler interval) starts a new run, as
+# does the next day. A job is marked ok in the same transaction that writes its rows
+# and metadata. GEDAP_RESUME=0 always starts a new run.
+
+RESUME = os.environ.get("GEDAP_RESUME", "1") != "0"
+
+# Run statuses that a rerun resumes
+RESUMABLE = ("running", "partial")
+
+LATEST_RUN_SQL = """
+    SELECT run_id, status FROM run_ledger
+    WHERE name = ? AND period = ?
+    ORDER BY run_id DESC LIMIT 1
+"""
+
+START_RUN_SQL = "INSERT INTO run_ledger (name, period) VALUES (?, ?)"
+
+REGISTER_JOB_SQL = "INSERT OR IGNORE INTO run_ledger_jobs (run_id, job_key) VALUES (?, ?)"
+
+JOB_STATUS_SQL = "SELECT job_key, status FROM run_ledger_jobs WHERE run_id = ?"
+
+MARK_JOB_SQL = """
+    UPDATE run_ledger_jobs
+    SET status = ?, error = ?, attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE run_id = ? AND job_key = ?
+"""
+
+FINISH_RUN_SQL = """
+    UPDATE run_ledger
+    SET status = CASE WHEN EXISTS (
+            SELECT 1 FROM run_ledger_jobs WHERE run_id = ? AND status != 'ok'
+        ) THEN 'partial' ELSE 'complete' END,
+        finished_at = CURRENT_TIMESTAMP
+    WHERE run_id = ?
+"""
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Ledger key of an AlphaVantage job tuple.
+def job_key(source_type, symbol, market, interval):
+    return f"{source_type}:{symbol}:{market}:{interval}"
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: The ledger of one named run.
+class RunLedger:
+    def __init__(self, session, name, period=None, resume=RESUME):
+        self.session = session
+        self.name = name
+        self.period = period or date_cls.today().isoformat()
+
+        with session.transaction():
+            latest = session.fetchone(LATEST_RUN_SQL, (name, self.period))
+            if latest and resume and latest[1] in RESUMABLE:
+                self.run_id = latest[0]
+                self.resumed = True
+            else:
+                self.run_id = session.execute(START_RUN_SQL, (name, self.period)).lastrowid
+                self.resumed = False
+
+    # Registers the keys and returns the ones still to load (not ok in this run)
+    def pending(self, keys):
+        with self.session.transaction():
+            self.session.executemany(REGISTER_JOB_SQL, [(self.run_id, key) for key in keys])
+            done = {
+                key for key, status in self.session.fetchall(JOB_STATUS_SQL, (self.run_id,))
+                if status == "ok"
+            }
+        remaining = [key for key in keys if key not in done]
+        if self.resumed:
+            print(f"Resuming run {self.name} ({self.period}): {len(remaining)} of {len(keys)} jobs left")
+        return remaining
+
+    def mark(self, key, status, error=None):
+        self.session.execute(MARK_JOB_SQL, (status, error, self.run_id, key))
+
+    def finish(self):
+        with self.session.transaction():
+            self.session.execute(FINISH_RUN_SQL, (self.run_id, self.run_id))
@@ -0,0 +1,510 @@
+import re
+
+from .columnar import parse_number, value_hash
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Managed schema for GEDAP_DB.db.
+# The schema version is stored in PRAGMA user_version; ensure_schema() applies every
+# migration above it, in order, each in its own transaction.
+#
+# Time-series tables are WITHOUT ROWID tables clustered on (series key, date), so a
+# symbol's history is stored contiguously and range reads walk the primary key.
+# A secondary (date, close) index covers cross-symbol date-range queries.
+
+TABLES = {
+    "alphav_commodity_lookup": """
+        CREATE TABLE alphav_commodity_lookup (
+            commodity_id    TEXT PRIMARY KEY,
+            commodity_name  TEXT,
+            interval        TEXT,
+            unit            TEXT
+        )
+    """,
+    "alphav_stocks_daily": """
+        CREATE TABLE alphav_stocks_daily (
+            symbol  TEXT NOT NULL,
+            date    TEXT NOT NULL,
+            open    REAL,
+            high    REAL,
+            low     REAL,
+            close   REAL,
+            volume  INTEGER,
+            PRIMARY KEY (symbol, date)
+        ) WITHOUT ROWID
+    """,
+    "alphav_fx_daily": """
+        CREATE TABLE alphav_fx_daily (
+            from_currency  TEXT NOT NULL,
+            to_currency    TEXT NOT NULL,
+            date           TEXT NOT NULL,
+            open           REAL,
+            high           REAL,
+            low            REAL,
+            close          REAL,
+            PRIMARY KEY (from_currency, to_currency, date)
+        ) WITHOUT ROWID
+    """,
+    "alphav_crypto_daily": """
+        CREATE TABLE alphav_crypto_daily (
+            crypto_code    TEXT NOT NULL,
+            fiat_currency  TEXT NOT NULL,
+            date           TEXT NOT NULL,
+            open           REAL,
+            high           REAL,
+            low            REAL,
+            close          REAL,
+            volume         REAL,
+            PRIMARY KEY (crypto_code, fiat_currency, date)
+        ) WITHOUT ROWID
+    """,
+    "alphav_commodity": """
+        CREATE TABLE alphav_commodity (
+            commodity_id  TEXT NOT NULL REFERENCES alphav_commodity_lookup (commodity_id),
+            date          TEXT NOT NULL,
+            value         REAL,
+            PRIMARY KEY (commodity_id, date)
+        ) WITHOUT ROWID
+    """,
+    "alphav_metadata": """
+        CREATE TABLE alphav_metadata (
+            source_type       TEXT NOT NULL,
+            symbol            TEXT NOT NULL,
+            market            TEXT NOT NULL,
+            interval          TEXT NOT NULL,
+            max_data_date     TEXT,
+            api_last_refresh  TEXT,
+            insert_date       TEXT DEFAULT CURRENT_TIMESTAMP,
+            update_date       TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source_type, symbol, market, interval)
+        ) WITHOUT ROWID
+    """,
+    "coingecko_coins_list": """
+        CREATE TABLE coingecko_coins_list (
+            api_id  TEXT PRIMARY KEY,
+            symbol  TEXT,
+            name    TEXT
+        )
+    """,
+    # Wide rows (28 columns): a regular rowid table with a unique key is smaller
+    # and faster here than WITHOUT ROWID.
+    "coingecko_market_data": """
+        CREATE TABLE coingecko_market_data (
+            id                                TEXT NOT NULL,
+            symbol                            TEXT,
+            name                              TEXT,
+            image                             TEXT,
+            current_price                     REAL,
+            market_cap                        REAL,
+            market_cap_rank                   INTEGER,
+            fully_diluted_valuation           REAL,
+            total_volume                      REAL,
+            high_24h                          REAL,
+            low_24h                           REAL,
+            price_change_24h                  REAL,
+            price_change_percentage_24h       REAL,
+            market_cap_change_24h             REAL,
+            market_cap_change_percentage_24h  REAL,
+            circulating_supply                REAL,
+            total_supply                      REAL,
+            max_supply                        REAL,
+            ath                               REAL,
+            ath_change_percentage             REAL,
+            ath_date                          TEXT,
+            atl                               REAL,
+            atl_change_percentage             REAL,
+            atl_date                          TEXT,
+            roi_times                         REAL,
+            roi_currency                      TEXT,
+            roi_percentage                    REAL,
+            last_updated                      TEXT,
+            UNIQUE (id, last_updated)
+        )
+    """,
+    "coingecko_price": """
+        CREATE TABLE coingecko_price (
+            crypto           TEXT NOT NULL,
+            currency         TEXT NOT NULL,
+            price            REAL,
+            market_cap       REAL,
+            "24h_vol"        REAL,
+            "24h_change"     REAL,
+            last_updated_at  INTEGER NOT NULL,
+            PRIMARY KEY (crypto, currency, last_updated_at)
+        ) WITHOUT ROWID
+    """,
+    "investing_indices": """
+        CREATE TABLE investing_indices (
+            id              INTEGER PRIMARY KEY,
+            name            TEXT NOT NULL,
+            last_value      REAL,
+            high_value      REAL,
+            low_value       REAL,
+            change          REAL,
+            change_percent  REAL,
+            market_time     TEXT,
+            insert_date     TEXT NOT NULL
+        )
+    """,
+}
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_alphav_stocks_daily_date ON alphav_stocks_daily (date, close)",
+    "CREATE INDEX IF NOT EXISTS idx_alphav_fx_daily_date ON alphav_fx_daily (date, close)",
+    "CREATE INDEX IF NOT EXISTS idx_alphav_crypto_daily_date ON alphav_crypto_daily (date, close)",
+    "CREATE INDEX IF NOT EXISTS idx_alphav_commodity_date ON alphav_commodity (date, value)",
+    "CREATE INDEX IF NOT EXISTS idx_coingecko_coins_list_symbol ON coingecko_coins_list (symbol)",
+    "CREATE INDEX IF NOT EXISTS idx_coingecko_market_data_last_updated ON coingecko_market_data (last_updated)",
+    "CREATE INDEX IF NOT EXISTS idx_coingecko_price_last_updated ON coingecko_price (last_updated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_investing_indices_name_time ON investing_indices (name, market_time)",
+    "CREATE INDEX IF NOT EXISTS idx_investing_indices_insert_date ON investing_indices (insert_date)",
+]
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Helpers for inspecting the live database.
+def _normalize(sql):
+    return re.sub(r"\s+", " ", (sql or "").replace('"', "")).strip().lower()
+
+def table_sql(session, table):
+    row = session.fetchone(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    )
+    return row[0] if row else None
+
+def table_columns(session, table):
+    return [row[1] for row in session.fetchall(f'PRAGMA table_info("{table}")')]
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: Create `table` from its definition, or rebuild an existing table whose
+# definition differs (e.g. created by hand without keys or as a rowid table).
+# Rows are copied with INSERT OR IGNORE, so duplicates that break the new key are dropped.
+def create_or_rebuild(session, table, create_sql):
+    existing = table_sql(session, table)
+    if existing is None:
+        session.execute(create_sql)
+        return
+    if _normalize(existing) == _normalize(create_sql):
+        return
+
+    temp = f"{table}__rebuild"
+    session.execute(f'DROP TABLE IF EXISTS "{temp}"')
+    session.execute(create_sql.replace(f"CREATE TABLE {table} ", f'CREATE TABLE "{temp}" ', 1))
+
+    new_columns = table_columns(session, temp)
+    shared = [c for c in table_columns(session, table) if c in new_columns]
+    column_list = ", ".join(f'"{c}"' for c in shared)
+    session.execute(
+        f'INSERT OR IGNORE INTO "{temp}" ({column_list}) SELECT {column_list} FROM "{table}"'
+    )
+    session.execute(f'DROP TABLE "{table}"')
+    session.execute(f'ALTER TABLE "{temp}" RENAME TO "{table}"')
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Migrations: (version, description, function(session)). Append only; never edit a
+# released migration. TABLES/INDEXES above are the version 1 definitions; later
+# migrations define their own changes.
+def _migration_1(session):
+    for table, create_sql in TABLES.items():
+        create_or_rebuild(session, table, create_sql)
+    for index_sql in INDEXES:
+        session.execute(index_sql)
+
+# Earlier scrapes stored investing.com display strings ("12,345.67", "+1.23%");
+# convert them to numbers so queries on investing_indices skip string parsing.
+INVESTING_NUMBER_COLUMNS = ("last_value", "high_value", "low_value", "change", "change_percent")
+
+def _migration_2(session):
+    column_list = ", ".join(INVESTING_NUMBER_COLUMNS)
+    text_filter = " OR ".join(f"typeof({c}) = 'text'" for c in INVESTING_NUMBER_COLUMNS)
+    rows = session.fetchall(f"SELECT id, {column_list} FROM investing_indices WHERE {text_filter}")
+
+    assignments = ", ".join(f"{c} = ?" for c in INVESTING_NUMBER_COLUMNS)
+    session.executemany(
+        f"UPDATE investing_indices SET {assignments} WHERE id = ?",
+        [
+            tuple(value if isinstance(value, (int, float)) else parse_number(value) for value in values) + (row_id,)
+            for row_id, *values in rows
+        ]
+    )
+
+# Digest of the last synced snapshot per reference dataset (e.g. coins/list), so an
+# unchanged download is detected without touching the table.
+SYNC_STATE_SQL = """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        name       TEXT PRIMARY KEY,
+        digest     TEXT NOT NULL,
+        row_count  INTEGER NOT NULL,
+        synced_at  TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+def _migration_3(session):
+    session.execute(SYNC_STATE_SQL)
+
+# Market data is stored as timestamped snapshots: every run keeps its own copy of each
+# coin, keyed on (id, snapshot_time). Existing rows get their last_updated as the
+# snapshot time before the table is rebuilt with the new key.
+MARKET_DATA_SQL = """
+        CREATE TABLE coingecko_market_data (
+            id                                TEXT NOT NULL,
+            symbol                            TEXT,
+            name                              TEXT,
+            image                             TEXT,
+            current_price                     REAL,
+            market_cap                        REAL,
+            market_cap_rank                   INTEGER,
+            fully_diluted_valuation           REAL,
+            total_volume                      REAL,
+            high_24h                          REAL,
+            low_24h                           REAL,
+            price_change_24h                  REAL,
+            price_change_percentage_24h       REAL,
+            market_cap_change_24h             REAL,
+            market_cap_change_percentage_24h  REAL,
+            circulating_supply                REAL,
+            total_supply                      REAL,
+            max_supply                        REAL,
+            ath                               REAL,
+            ath_change_percentage             REAL,
+            ath_date                          TEXT,
+            atl                               REAL,
+            atl_change_percentage             REAL,
+            atl_date                          TEXT,
+            roi_times                         REAL,
+            roi_currency                      TEXT,
+            roi_percentage                    REAL,
+            last_updated                      TEXT,
+            snapshot_time                     TEXT NOT NULL,
+            UNIQUE (id, snapshot_time)
+        )
+    """
+
+MARKET_DATA_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_coingecko_market_data_last_updated ON coingecko_market_data (last_updated)",
+    "CREATE INDEX IF NOT EXISTS idx_coingecko_market_data_snapshot ON coingecko_market_data (snapshot_time)",
+]
+
+def _migration_4(session):
+    if "snapshot_time" not in table_columns(session, "coingecko_market_data"):
+        session.execute("ALTER TABLE coingecko_market_data ADD COLUMN snapshot_time TEXT")
+        session.execute("""
+            UPDATE coingecko_market_data
+            SET snapshot_time = COALESCE(strftime('%Y-%m-%d %H:%M:%S', last_updated), last_updated, CURRENT_TIMESTAMP)
+            WHERE snapshot_time IS NULL
+        """)
+    create_or_rebuild(session, "coingecko_market_data", MARKET_DATA_SQL)
+    for index_sql in MARKET_DATA_INDEXES:
+        session.execute(index_sql)
+
+# One row per reconcile run of an AlphaVantage series (see reconcile.py): how many
+# fetched bars were new, revised by the vendor, or unchanged.
+REVISIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS alphav_revisions (
+        id                  INTEGER PRIMARY KEY,
+        source_type         TEXT NOT NULL,
+        symbol              TEXT NOT NULL,
+        market              TEXT NOT NULL,
+        interval            TEXT NOT NULL,
+        run_time            TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        fetched_rows        INTEGER NOT NULL,
+        new_rows            INTEGER NOT NULL,
+        changed_rows        INTEGER NOT NULL,
+        unchanged_rows      INTEGER NOT NULL,
+        first_changed_date  TEXT,
+        last_changed_date   TEXT
+    )
+"""
+
+def _migration_5(session):
+    session.execute(REVISIONS_SQL)
+    session.execute(
+        "CREATE INDEX IF NOT EXISTS idx_alphav_revisions_series "
+        "ON alphav_revisions (source_type, symbol, market, run_time)"
+    )
+
+# Derived metrics maintained by derived.py after each AlphaVantage load. Series are
+# keyed like alphav_metadata: (source_type, symbol, market); fx is from/to currency.
+DERIVED_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS derived_daily_metrics (
+        source_type  TEXT NOT NULL,
+        symbol       TEXT NOT NULL,
+        market       TEXT NOT NULL,
+        date         TEXT NOT NULL,
+        close        REAL,
+        log_return   REAL,
+        ma_20        REAL,
+        ma_50        REAL,
+        ma_200       REAL,
+        vol_20       REAL,
+        vol_60       REAL,
+        PRIMARY KEY (source_type, symbol, market, date)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS derived_crypto_fx (
+        crypto_code  TEXT NOT NULL,
+        currency     TEXT NOT NULL,
+        date         TEXT NOT NULL,
+        close        REAL,
+        fx_rate      REAL,
+        fx_date      TEXT NOT NULL,
+        PRIMARY KEY (crypto_code, currency, date)
+    ) WITHOUT ROWID
+    """,
+]
+
+def _migration_6(session):
+    for table_sql in DERIVED_TABLES:
+        session.execute(table_sql)
+
+# Weekly / monthly / yearly bars maintained by rollups.py; bucket is the first
+# calendar day of the period, first_date/last_date the daily bars it covers.
+ROLLUPS_SQL = """
+    CREATE TABLE IF NOT EXISTS alphav_rollups (
+        source_type  TEXT NOT NULL,
+        symbol       TEXT NOT NULL,
+        market       TEXT NOT NULL,
+        resolution   TEXT NOT NULL,
+        bucket       TEXT NOT NULL,
+        first_date   TEXT NOT NULL,
+        last_date    TEXT NOT NULL,
+        open         REAL,
+        high         REAL,
+        low          REAL,
+        close        REAL,
+        volume       REAL,
+        bars         INTEGER NOT NULL,
+        PRIMARY KEY (source_type, symbol, market, resolution, bucket)
+    ) WITHOUT ROWID
+"""
+
+def _migration_7(session):
+    session.execute(ROLLUPS_SQL)
+
+# Run ledger (run_ledger.py) and the dates the gap scanner (gaps.py) confirmed the
+# vendor does not have, e.g. market holidays.
+LEDGER_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS run_ledger (
+        run_id       INTEGER PRIMARY KEY,
+        name         TEXT NOT NULL,
+        period       TEXT NOT NULL,
+        status       TEXT NOT NULL DEFAULT 'running',
+        started_at   TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        finished_at  TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_run_ledger_name ON run_ledger (name, period)",
+    """
+    CREATE TABLE IF NOT EXISTS run_ledger_jobs (
+        run_id      INTEGER NOT NULL REFERENCES run_ledger (run_id),
+        job_key     TEXT NOT NULL,
+        status      TEXT NOT NULL DEFAULT 'pending',
+        attempts    INTEGER NOT NULL DEFAULT 0,
+        error       TEXT,
+        updated_at  TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (run_id, job_key)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS alphav_known_gaps (
+        source_type  TEXT NOT NULL,
+        symbol       TEXT NOT NULL,
+        market       TEXT NOT NULL,
+        date         TEXT NOT NULL,
+        checked_at   TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (source_type, symbol, market, date)
+    ) WITHOUT ROWID
+    """,
+]
+
+def _migration_8(session):
+    for table_sql in LEDGER_TABLES:
+        session.execute(table_sql)
+
+# Digest of an investing_indices row's values, so a snapshot whose (name, market_time)
+# and values are already stored is skipped (see investing_functions.py).
+def _migration_9(session):
+    if "value_hash" not in table_columns(session, "investing_indices"):
+        session.execute("ALTER TABLE investing_indices ADD COLUMN value_hash TEXT")
+
+    column_list = ", ".join(INVESTING_NUMBER_COLUMNS)
+    rows = session.fetchall(f"SELECT id, {column_list} FROM investing_indices WHERE value_hash IS NULL")
+    session.executemany(
+        "UPDATE investing_indices SET value_hash = ? WHERE id = ?",
+        [(value_hash(values), row_id) for row_id, *values in rows]
+    )
+
+# Earliest newly inserted bar of a reconcile run (a refilled hole can predate the
+# revised bars), so the Parquet export knows which older partitions to rewrite.
+def _migration_10(session):
+    if "first_new_date" not in table_columns(session, "alphav_revisions"):
+        session.execute("ALTER TABLE alphav_revisions ADD COLUMN first_new_date TEXT")
+
+MIGRATIONS = [
+    (1, "create managed tables, keys and date-range indexes", _migration_1),
+    (2, "convert investing_indices display strings to numbers", _migration_2),
+    (3, "add sync_state for diff-based reference syncs", _migration_3),
+    (4, "store coingecko_market_data as timestamped snapshots", _migration_4),
+    (5, "add alphav_revisions for reconcile runs", _migration_5),
+    (6, "add derived_daily_metrics and derived_crypto_fx", _migration_6),
+    (7, "add alphav_rollups for weekly/monthly/yearly bars", _migration_7),
+    (8, "add run ledger and alphav_known_gaps", _migration_8),
+    (9, "add value_hash to investing_indices for change detection", _migration_9),
+    (10, "add first_new_date to alphav_revisions", _migration_10),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 3: Bring the database up to SCHEMA_VERSION.
+# Foreign keys are switched off while tables are rebuilt (SQLite only allows this
+# outside a transaction) and checked before each migration commits.
+def ensure_schema(session):
+    current = session.fetchone("PRAGMA user_version")[0]
+    if current >= SCHEMA_VERSION:
+        return current
+
+    session.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"Applying schema migration {version}: {description}")
+            with session.transaction():
+                migrate(session)
+                problems = session.fetchall("PRAGMA foreign_key_check")
+                if problems:
+                    raise RuntimeError(f"Migration {version} left foreign key violations: {problems[:5]}")
+                session.execute(f"PRAGMA user_version = {version}")
+            current = version
+    finally:
+        session.execute("PRAGMA foreign_keys = ON")
+
+    return current
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 4: Refresh planner statistics after bulk loads.
+# analysis_limit bounds the rows sampled per index, keeping this cheap on big tables.
+def analyze_tables(session, tables):
+    session.execute("PRAGMA analysis_limit = 1000")
+    for table in sorted(set(tables)):
+        session.execute(f'ANALYZE "{table}"')
@@ -0,0 +1,301 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from .queries import SERIES, _range_clause
+from .reconcile import reconcile_rows
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Storage backends for the AlphaVantage series bars (GEDAP_STORAGE=sqlite|duckdb).
+# Ingestion and the read API only use the Storage interface:
+#   append(source_type, rows)      bulk insert, keys already stored are skipped
+#   upsert(source_type, rows)      insert new bars, rewrite revised ones; returns the
+#                                  reconcile counts (new / changed / unchanged and
+#                                  the first new / changed dates)
+#   read_range(source_type, symbols, market, start, end)
+#                                  (key, date, *values) rows ordered by key and date
+# Rows use the insert layout of queries.SERIES: key columns, ISO date, value columns.
+#
+# sqlite (default) keeps the bars in the session's database, so the SQL stages that
+# build on them (derived metrics, rollups) run in the same transaction.
+# duckdb stores the bars in an embedded columnar file (GEDAP_DUCKDB_PATH); metadata,
+# lookups, revisions and the CoinGecko / investing tables stay in SQLite. Bars are
+# committed before their metadata, so a crash in between only means a re-fetch.
+# Derived metrics, rollups and the Parquet export read the bars from the SQLite
+# tables, so on DuckDB they are not maintained: get_metrics, get_converted_close,
+# the refresh jobs and the export raise (require_session_tables) instead of serving
+# empty or stale data, and get_resampled reads the daily bars.
+
+STORAGE = os.environ.get("GEDAP_STORAGE", "sqlite")
+DUCKDB_PATH = os.environ.get("GEDAP_DUCKDB_PATH", "./GEDAP_DB.duckdb")
+
+# DuckDB column types (values default to DOUBLE)
+DUCKDB_TYPES = {("stocks", "volume"): "BIGINT"}
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Range read shared by both backends.
+# Symbols are the first key column; two-column keys are filtered on one market
+def _read_sql(source_type, symbols, market, start, end, date_expr="date"):
+    table, key_columns, value_columns = SERIES[source_type]
+    range_clause, range_params = _range_clause(start, end)
+    placeholders = ", ".join("?" for _ in symbols)
+    market_clause = f" AND {key_columns[1]} = ?" if len(key_columns) == 2 else ""
+    market_params = [market] if len(key_columns) == 2 else []
+
+    sql = f"""
+        SELECT {key_columns[0]}, {date_expr}, {", ".join(value_columns)}
+        FROM {table}
+        WHERE {key_columns[0]} IN ({placeholders}){market_clause}{range_clause}
+        ORDER BY {key_columns[0]}, date
+    """
+    return sql, (*symbols, *market_params, *range_params)
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 1: The interface.
+class Storage(ABC):
+    name = None
+    # True when the bars live in the DBSession database (SQL stages can join them)
+    session_tables = False
+
+    @abstractmethod
+    def append(self, source_type, rows):
+        ...
+
+    @abstractmethod
+    def upsert(self, source_type, rows):
+        ...
+
+    @abstractmethod
+    def read_range(self, source_type, symbols, market=None, start=None, end=None):
+        ...
+
+    @abstractmethod
+    def transaction(self):
+        ...
+
+    def close(self):
+        pass
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 2: SQLite, on the caller's DBSession (and inside its transactions).
+# SQL is kept constant so the session's statement cache reuses the prepared statement.
+APPEND_SQL = {
+    source_type: f"""
+        INSERT OR IGNORE INTO {table}
+        ({", ".join(key_columns + ("date",) + value_columns)})
+        VALUES ({", ".join("?" for _ in key_columns + ("date",) + value_columns)})
+    """
+    for source_type, (table, key_columns, value_columns) in SERIES.items()
+}
+
+class SQLiteStorage(Storage):
+    name = "sqlite"
+    session_tables = True
+
+    def __init__(self, session):
+        self.session = session
+
+    # Returns the number of rows actually written (INSERT OR IGNORE skips stored dates)
+    def append(self, source_type, rows):
+        return self.session.executemany(APPEND_SQL[source_type], rows).rowcount
+
+    def upsert(self, source_type, rows):
+        return reconcile_rows(self.session, source_type, rows)
+
+    def read_range(self, source_type, symbols, market=None, start=None, end=None):
+        return self.session.fetchall(*_read_sql(source_type, symbols, market, start, end))
+
+    def transaction(self):
+        return self.session.transaction()
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Class 3: Embedded DuckDB (optional dependency). Rows are staged as one Arrow table
+# (or a temp table without pyarrow) and written with set-based statements.
+class DuckDBStorage(Storage):
+    name = "duckdb"
+    session_tables = False
+
+    def __init__(self, path=DUCKDB_PATH):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise RuntimeError("duckdb is required for GEDAP_STORAGE=duckdb (pip install duckdb)") from e
+        self.path = path
+        self.conn = duckdb.connect(path)
+        self.lock = threading.RLock()
+        self.depth = 0
+        for source_type in SERIES:
+            self.conn.execute(self._table_sql(source_type))
+
+    def _table_sql(self, source_type):
+        table, key_columns, value_columns = SERIES[source_type]
+        columns = [f"{c} VARCHAR NOT NULL" for c in key_columns] + ["date DATE NOT NULL"]
+        columns += [f"{c} {DUCKDB_TYPES.get((source_type, c), 'DOUBLE')}" for c in value_columns]
+        return f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {", ".join(columns)},
+                PRIMARY KEY ({", ".join(key_columns + ("date",))})
+            )
+        """
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            if self.depth == 0:
+                self.conn.begin()
+            self.depth += 1
+            try:
+                yield self
+            except BaseException:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.conn.rollback()
+                raise
+            self.depth -= 1
+            if self.depth == 0:
+                self.conn.commit()
+
+    # Typed SELECT over the staged rows, registered as `incoming`
+    def _stage(self, source_type, rows):
+        table, key_columns, value_columns = SERIES[source_type]
+        columns = key_columns + ("date",) + value_columns
+        rows = list(rows)
+        try:
+            import pyarrow as pa
+        except ImportError:
+            pa = None
+
+        if pa is not None:
+            transposed = list(zip(*rows)) if rows else [[] for _ in columns]
+            self.conn.register("incoming", pa.table({c: list(v) for c, v in zip(columns, transposed)}))
+        else:
+            self.conn.execute(f"CREATE OR REPLACE TEMP TABLE incoming AS SELECT * FROM {table} LIMIT 0")
+            self.conn.executemany(
+                f"INSERT INTO incoming VALUES ({', '.join('?' for _ in columns)})", rows
+            )
+
+        typed = [f"CAST({c} AS VARCHAR) AS {c}" for c in key_columns] + ["CAST(date AS DATE) AS date"]
+        typed += [f"CAST({c} AS {DUCKDB_TYPES.get((source_type, c), 'DOUBLE')}) AS {c}" for c in value_columns]
+        return f"SELECT {', '.join(typed)} FROM incoming", len(rows)
+
+    def _unstage(self):
+        self.conn.unregister("incoming")
+        self.conn.execute("DROP TABLE IF EXISTS incoming")
+
+    def append(self, source_type, rows):
+        table = SERIES[source_type][0]
+        with self.transaction():
+            staged, _ = self._stage(source_type, rows)
+            try:
+                return self.conn.execute(f"INSERT OR IGNORE INTO {table} {staged}").fetchone()[0]
+            finally:
+                self._unstage()
+
+    def upsert(self, source_type, rows):
+        table, key_columns, value_columns = SERIES[source_type]
+        keys = key_columns + ("date",)
+        key_match = " AND ".join(f"t.{c} = s.{c}" for c in keys)
+        differs = " OR ".join(f"s.{c} IS DISTINCT FROM t.{c}" for c in value_columns)
+
+        with self.transaction():
+            staged, fetched = self._stage(source_type, rows)
+            try:
+                self.conn.execute(f"CREATE OR REPLACE TEMP TABLE reconcile_stage AS {staged}")
+                changed, first_changed, last_changed = self.conn.execute(f"""
+                    SELECT COUNT(*), MIN(s.date), MAX(s.date)
+                    FROM reconcile_stage AS s JOIN {table} AS t ON {key_match}
+                    WHERE {differs}
+                """).fetchone()
+                if changed:
+                    self.conn.execute(f"""
+                        UPDATE {table} AS t
+                        SET {", ".join(f"{c} = s.{c}" for c in value_columns)}
+                        FROM reconcile_stage AS s
+                        WHERE {key_match} AND ({differs})
+                    """)
+                first_new = self.conn.execute(f"""
+                    SELECT MIN(s.date) FROM reconcile_stage AS s
+                    WHERE NOT EXISTS (SELECT 1 FROM {table} AS t WHERE {key_match})
+                """).fetchone()[0]
+                new = self.conn.execute(f"""
+                    INSERT INTO {table}
+                    SELECT * FROM reconcile_stage AS s
+                    WHERE NOT EXISTS (SELECT 1 FROM {table} AS t WHERE {key_match})
+                """).fetchone()[0]
+            finally:
+                self.conn.execute("DROP TABLE IF EXISTS reconcile_stage")
+                self._unstage()
+
+        return {
+            "fetched": fetched,
+            "new": new,
+            "changed": changed,
+            "unchanged": fetched - new - changed,
+            "first_changed_date": str(first_changed) if first_changed else None,
+            "last_changed_date": str(last_changed) if last_changed else None,
+            "first_new_date": str(first_new) if first_new else None,
+        }
+
+    def read_range(self, source_type, symbols, market=None, start=None, end=None):
+        sql, params = _read_sql(source_type, symbols, market, start, end, "CAST(date AS VARCHAR)")
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: The configured backend for a session. The DuckDB connection is opened
+# once per process and shared (DuckDB allows one writing process per file).
+BACKENDS = {"sqlite": SQLiteStorage, "duckdb": DuckDBStorage}
+
+_duckdb = {}
+_duckdb_lock = threading.Lock()
+
+def _backend(backend=None):
+    backend = backend or STORAGE
+    if backend not in BACKENDS:
+        raise ValueError(f"Invalid GEDAP_STORAGE: {backend}")
+    return backend
+
+def storage_for(session, backend=None):
+    backend = _backend(backend)
+    if backend == "sqlite":
+        return SQLiteStorage(session)
+    with _duckdb_lock:
+        if DUCKDB_PATH not in _duckdb:
+            _duckdb[DUCKDB_PATH] = DuckDBStorage(DUCKDB_PATH)
+        return _duckdb[DUCKDB_PATH]
+
+
+# Function 3: Guard for the stages that read the bars from the SQLite tables
+# (derived metrics, rollups, Parquet export); checked without opening the backend.
+def has_session_tables(backend=None):
+    return BACKENDS[_backend(backend)].session_tables
+
+def require_session_tables(feature, backend=None):
+    if not has_session_tables(backend):
+        raise RuntimeError(
+            f"{feature} reads the bars from the SQLite tables and is not maintained "
+            f"with GEDAP_STORAGE={_backend(backend)}"
+        )
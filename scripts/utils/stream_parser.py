@@ -0,0 +1,157 @@
+import json
+import re
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Incremental JSON reader for AlphaVantage "Time Series" payloads.
+# The payload is read chunk by chunk and each (date, values) entry is decoded as
+# soon as it is complete, so an incremental load can stop reading as soon as it
+# reaches dates it already has (AlphaVantage returns newest dates first).
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _ChunkReader:
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf = ""
+        self.pos = 0
+        self.done = False
+
+    # Append chunks until the unread part of the buffer has at least doubled,
+    # so re-decoding a value that spans many chunks stays linear overall.
+    def more(self):
+        if self.done:
+            return False
+        pending = [self.buf[self.pos:]]
+        needed = max(len(pending[0]), 1)
+        added = 0
+        while added < needed:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                self.done = True
+                break
+            if isinstance(chunk, bytes):
+                chunk = chunk.decode("utf-8")
+            pending.append(chunk)
+            added += len(chunk)
+        self.buf = "".join(pending)
+        self.pos = 0
+        return added > 0
+
+    # Next non-whitespace character (not consumed), or None at end of input.
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of streamed payload")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.more():
+                    raise
+                continue
+            # A number ending exactly at the buffer edge may continue in the next chunk
+            if end == len(self.buf) and isinstance(value, (int, float)) and self.more():
+                continue
+            self.pos = end
+            return value
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 1: Yield (date, values) from the "Time Series ..." object as it streams in.
+# Top-level keys read before the series (e.g. "Meta Data") are stored in `top`,
+# and the series key itself in top["_series_key"].
+# A body that ends before its closing brace (dropped connection) raises ValueError
+# instead of reading as a shorter series.
+def iter_time_series(chunks, top):
+    reader = _ChunkReader(chunks)
+    reader.expect("{")
+    while True:
+        char = reader.peek()
+        if char is None:
+            raise ValueError("Streamed payload ended before the end of the object")
+        if char == "}":
+            return
+        if char == ",":
+            reader.pos += 1
+            continue
+
+        key = reader.value()
+        reader.expect(":")
+
+        if "Time Series" not in key:
+            top[key] = reader.value()
+            continue
+
+        top["_series_key"] = key
+        reader.expect("{")
+        while True:
+            char = reader.peek()
+            if char is None:
+                raise ValueError("Streamed payload ended inside the time series")
+            if char == "}":
+                reader.pos += 1
+                break
+            if char == ",":
+                reader.pos += 1
+                continue
+            date = reader.value()
+            reader.expect(":")
+            yield date, reader.value()
+
+
+
+
+# ------------------------------------------------------------------------------------
+# Function 2: Parse only the entries newer than max_data_date.
+# Returns (top, rows, covered): rows are parsed tuples in ascending date order
+# (None when the payload has no time series, e.g. throttle/error payloads; `top`
+# then holds the whole body, which the caller checks instead of fetching it again,
+# see alphav_functions.stream_alpha_vantage); covered is True when
+# the payload reached back to max_data_date, i.e. no dates were left out between.
+def parse_new_entries(chunks, parser, max_data_date):
+    top = {}
+    entries = []
+    previous = None
+    descending = True
+    covered = max_data_date is None
+
+    for date, values in iter_time_series(chunks, top):
+        if previous is not None and date > previous:
+            descending = False   # unexpected order: filter everything, no early stop
+        previous = date
+
+        if max_data_date is not None and date <= max_data_date:
+            covered = True
+            if descending:
+                break
+            continue
+        entries.append((date, parser(date, values)))
+
+    if "_series_key" not in top:
+        return top, None, covered
+
+    if descending:
+        entries.reverse()
+    else:
+        entries.sort(key=lambda x: x[0])
+
+    return top, [row for _, row in entries], covered
@@ -0,0 +1,18 @@
+import os
+
+# No response cache, metrics files or real keys while testing
+os.environ.setdefault("GEDAP_CACHE", "0")
+os.environ.setdefault("GEDAP_METRICS", "0")
+os.environ.setdefault("ALPHAVANTAGE_API_KEY", "test")
+os.environ.setdefault("ALPHAVANTAGE_REQUESTS_PER_MINUTE", "0")
+
+import pytest
+
+from scripts.utils.db_session import DBSession
+
+
+# A migrated database per test
+@pytest.fixture
+def session(tmp_path):
+    with DBSession(str(tmp_path / "gedap.db")) as session:
+        yield session
@@ -0,0 +1,48 @@
+from urllib.parse import quote
+
+from scripts.utils.coingecko_functions import chunk_ids, sync_coins_list
+
+COINS = [(f"coin-{i}", f"c{i}", f"Coin {i}") for i in range(10)]
+
+
+def _stored(session):
+    return session.fetchall("SELECT api_id, symbol, name FROM coingecko_coins_list ORDER BY api_id")
+
+
+def test_sync_coins_list_applies_only_the_differences(session):
+    assert sync_coins_list(session, COINS) == {"inserted": 10, "updated": 0, "deleted": 0, "unchanged": False}
+
+    # Same download: the digest matches and nothing is written
+    assert sync_coins_list(session, list(reversed(COINS)))["unchanged"]
+
+    incoming = COINS[1:9] + [("coin-3", "c3", "Coin Three"), ("coin-new", "new", "New Coin")]
+    incoming.remove(COINS[3])
+    counts = sync_coins_list(session, incoming)
+    assert counts == {"inserted": 1, "updated": 1, "deleted": 2, "unchanged": False}
+    assert _stored(session) == sorted(incoming)
+
+
+def test_partial_or_empty_list_does_not_wipe_the_table(session):
+    sync_coins_list(session, COINS)
+
+    # Less than MIN_DELETE_RATIO of the stored list: new and changed rows apply, no deletes
+    partial = [("coin-0", "c0", "Coin Zero"), ("coin-new", "new", "New Coin")]
+    assert sync_coins_list(session, partial) == {"inserted": 1, "updated": 1, "deleted": 0, "unchanged": False}
+    assert len(_stored(session)) == 11
+
+    assert sync_coins_list(session, [])["deleted"] == 0
+    assert len(_stored(session)) == 11
+
+
+def test_chunk_ids_splits_at_the_encoded_length():
+    # "aaaa,aaaa,aaaa" encodes to 4 + 7 + 7 = 18 characters
+    assert chunk_ids(["aaaa"] * 3, max_length=18) == [["aaaa"] * 3]
+    assert chunk_ids(["aaaa"] * 3, max_length=17) == [["aaaa"] * 2, ["aaaa"]]
+    # An id longer than the limit still gets its own request
+    assert chunk_ids(["a" * 30, "b"], max_length=10) == [["a" * 30], ["b"]]
+    assert chunk_ids([], max_length=10) == []
+
+    ids = [f"coin {i}/x" for i in range(200)]
+    chunks = chunk_ids(ids, max_length=100)
+    assert [coin_id for chunk in chunks for coin_id in chunk] == ids
+    assert all(len(quote(",".join(chunk), safe="")) <= 100 for chunk in chunks)
@@ -0,0 +1,76 @@
+import pytest
+
+from scripts.utils import alphav_functions, columnar
+from scripts.utils.columnar import parse_number
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("4.125", 4.125),
+    ("1.234", 1.234),
+    ("-1.234", -1.234),
+    ("1,234.5", 1234.5),
+    ("1,234", 1234.0),
+    ("37,545.33", 37545.33),
+    ("1,234,567.89", 1234567.89),
+    ("-0.123%", -0.123),
+    ("+1.23%", 1.23),
+    ("−0.45", -0.45),
+    ("12", 12.0),
+])
+def test_parse_number_en_us(text, expected):
+    assert parse_number(text) == expected
+
+
+def test_parse_number_comma_decimal():
+    assert parse_number("4,125", decimal=",") == 4.125
+    assert parse_number("1.234,5", decimal=",") == 1234.5
+    assert parse_number("1 234,5", decimal=",") == 1234.5
+    # Both separators present: the right-most one is the decimal point either way
+    assert parse_number("1.234,5") == 1234.5
+
+
+@pytest.mark.parametrize("text", [None, "", "-", "N/A", "abc"])
+def test_parse_number_missing(text):
+    assert parse_number(text) is None
+
+
+# Newest first, like the payloads; values as AlphaVantage formats them
+OHLCV = {
+    "2024-01-03": {"1. open": "185.6400", "2. high": "186.9500", "3. low": "183.8200",
+                   "4. close": "184.2500", "5. volume": "58414460"},
+    "2024-01-02": {"1. open": "0.00001234", "2. high": "1e-5", "3. low": "0.1",
+                   "4. close": "42000.12345678", "5. volume": "0"},
+    "2024-01-01": {"1. open": "1", "2. high": "2", "3. low": "0.5",
+                   "4. close": "1.5", "5. volume": "12"},
+}
+COMMODITY = [("2024-03-01", {"value": "78.25"}), ("2024-02-01", {"value": "."}),
+             ("2024-01-01", {"value": "1,234.5"}), ("2023-12-01", {"value": ""})]
+
+ROW_PARSERS = {
+    "stocks": lambda d, v: alphav_functions.parse_stocks_row("IBM", d, v),
+    "fx": lambda d, v: alphav_functions.parse_fx_row("EUR", "USD", d, v),
+    "crypto": lambda d, v: alphav_functions.parse_crypto_row("BTC", "USD", d, v),
+    "commodity": lambda d, v: alphav_functions.parse_commodity_row("WTI", d, v),
+}
+
+
+@pytest.fixture(params=["numpy", "python"])
+def columnar_path(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(columnar, "np", None)
+    elif columnar.np is None:
+        pytest.skip("numpy is not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("source_type", ["stocks", "fx", "crypto", "commodity"])
+def test_columnar_parse_matches_the_row_parsers(source_type, columnar_path):
+    entries = COMMODITY if source_type == "commodity" else list(OHLCV.items())
+    symbol, market = {"stocks": ("IBM", None), "fx": ("EUR", "USD"),
+                      "crypto": ("BTC", "USD"), "commodity": ("WTI", None)}[source_type]
+
+    rows = [ROW_PARSERS[source_type](date, values) for date, values in entries]
+    parsed = list(alphav_functions.parse_columns(source_type, symbol, market, entries))
+
+    assert parsed == rows
+    assert [tuple(map(type, row)) for row in parsed] == [tuple(map(type, row)) for row in rows]
@@ -0,0 +1,44 @@
+import pytest
+
+from scripts.utils.db_session import DBSession
+
+INSERT_SQL = "INSERT INTO coingecko_coins_list (api_id, symbol, name) VALUES (?, ?, ?)"
+
+
+def _ids(session):
+    return [row[0] for row in session.fetchall("SELECT api_id FROM coingecko_coins_list ORDER BY api_id")]
+
+
+def test_inner_failure_rolls_back_only_its_own_writes(session):
+    with session.transaction():
+        session.execute(INSERT_SQL, ("outer-1", "o1", "Outer 1"))
+        with pytest.raises(ValueError):
+            with session.transaction():
+                session.execute(INSERT_SQL, ("inner", "i", "Inner"))
+                raise ValueError("bad symbol")
+        session.execute(INSERT_SQL, ("outer-2", "o2", "Outer 2"))
+    assert _ids(session) == ["outer-1", "outer-2"]
+    assert session.depth == 0
+
+
+def test_nested_blocks_commit_with_the_outer_transaction(tmp_path):
+    path = str(tmp_path / "gedap.db")
+    with DBSession(path) as session:
+        with session.transaction():
+            with session.transaction():
+                session.execute(INSERT_SQL, ("inner", "i", "Inner"))
+            # Not visible to another connection until the outer block commits
+            with DBSession(path, migrate=False) as other:
+                assert _ids(other) == []
+        with DBSession(path, migrate=False) as other:
+            assert _ids(other) == ["inner"]
+
+
+def test_outer_failure_rolls_back_committed_inner_blocks(session):
+    with pytest.raises(ValueError):
+        with session.transaction():
+            with session.transaction():
+                session.execute(INSERT_SQL, ("inner", "i", "Inner"))
+            raise ValueError("batch failed")
+    assert _ids(session) == []
+    assert session.depth == 0
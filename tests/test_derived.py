@@ -0,0 +1,69 @@
+import math
+
+import pytest
+
+from scripts.utils import derived
+from scripts.utils.derived import compute_metrics, update_series_metrics
+
+ALL_METRICS = "SELECT * FROM derived_daily_metrics ORDER BY date"
+
+
+def _bars(count, offset=0):
+    # Deterministic wavy closes over consecutive days
+    bars = []
+    for i in range(offset, offset + count):
+        close = 100 + 10 * math.sin(i / 7) + i * 0.05
+        bars.append(("IBM", f"{2020 + i // 360}-{1 + i % 360 // 30:02d}-{1 + i % 30:02d}", close, close + 1, close - 1, close, 1000 + i))
+    return bars
+
+
+def _append(session, bars):
+    session.executemany("INSERT INTO alphav_stocks_daily VALUES (?, ?, ?, ?, ?, ?, ?)", bars)
+
+
+@pytest.fixture(params=["numpy", "python"])
+def metrics_path(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(derived, "np", None)
+    elif derived.np is None:
+        pytest.skip("numpy is not installed")
+    return request.param
+
+
+def test_incremental_metrics_equal_a_full_rebuild(session, metrics_path):
+    with session.transaction():
+        _append(session, _bars(250))
+        assert update_series_metrics(session, "stocks", "IBM", "USD") == 250
+        _append(session, _bars(40, offset=250))
+        assert update_series_metrics(session, "stocks", "IBM", "USD") == 40
+        # A revised close inside the lookback window
+        session.execute("UPDATE alphav_stocks_daily SET close = close * 1.01 WHERE date = ?", (_bars(1, 260)[0][1],))
+        update_series_metrics(session, "stocks", "IBM", "USD", since=_bars(1, 260)[0][1])
+    incremental = session.fetchall(ALL_METRICS)
+
+    with session.transaction():
+        update_series_metrics(session, "stocks", "IBM", "USD", full=True)
+    assert session.fetchall(ALL_METRICS) == incremental
+
+    last = incremental[-1]
+    assert all(value is not None for value in last[4:])
+
+
+def test_numpy_and_python_paths_agree(monkeypatch):
+    if derived.np is None:
+        pytest.skip("numpy is not installed")
+    # Steady 1% daily growth with tiny noise: returns have a large mean and a small
+    # spread, where a one-pass sum(x²) - n·mean² formula loses most of its digits
+    rows = [(bar[1], 100 * 1.01 ** i * (1 + 1e-7 * math.sin(i))) for i, bar in enumerate(_bars(300))]
+    rows[120] = (rows[120][0], None)
+    with_numpy = compute_metrics(rows, rows[0][0])
+    monkeypatch.setattr(derived, "np", None)
+    without = compute_metrics(rows, rows[0][0])
+
+    assert len(with_numpy) == len(without)
+    for a, b in zip(with_numpy, without):
+        assert a[0] == b[0]
+        for x, y in zip(a[1:], b[1:]):
+            assert (x is None) == (y is None)
+            if x is not None:
+                assert x == pytest.approx(y, rel=1e-12, abs=1e-15)
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from scripts.utils.engine import run_status, run_tasks
+
+
+def test_semaphores_cap_concurrent_tasks_per_provider(session):
+    active, peak = {}, {}
+    lock = threading.Lock()
+
+    def job(provider):
+        def run(session):
+            with lock:
+                active[provider] = active.get(provider, 0) + 1
+                peak[provider] = max(peak.get(provider, 0), active[provider])
+            time.sleep(0.05)
+            with lock:
+                active[provider] -= 1
+        return run
+
+    tasks = [("alphavantage", f"av {i}", job("alphavantage")) for i in range(6)]
+    tasks += [("investing", f"inv {i}", job("investing")) for i in range(3)]
+    results = run_tasks(tasks, concurrency={"alphavantage": 2, "investing": 1}, session=session)
+
+    assert [r["status"] for r in results] == ["ok"] * 9
+    assert peak == {"alphavantage": 2, "investing": 1}
+    assert run_status(results) == "ok"
+
+
+def test_a_failing_provider_does_not_stop_the_others(session):
+    done = []
+
+    def ok(name):
+        return lambda session: done.append(name)
+
+    def broken(session):
+        raise RuntimeError("provider down")
+
+    results = run_tasks([
+        ("alphavantage", "stocks daily", ok("stocks daily")),
+        ("coingecko", "price", broken),
+        ("coingecko", "market data", lambda session: (3, ["bitcoin"])),
+        ("investing", "indices", ok("indices")),
+    ], session=session)
+
+    assert sorted(done) == ["indices", "stocks daily"]
+    assert [(r["name"], r["status"]) for r in results] == [
+        ("stocks daily", "ok"), ("price", "failed"), ("market data", "partial"), ("indices", "ok"),
+    ]
+    assert results[1]["error"] == "provider down"
+    assert run_status(results) == "partial"
+    assert run_status(results[1:2]) == "failed"
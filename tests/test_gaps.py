@@ -0,0 +1,54 @@
+from scripts.utils import gaps
+from scripts.utils.gaps import expected_dates, fill_gaps, plan_backfill, scan_series
+from scripts.utils.queries import get_ohlc
+from scripts.utils.storage import SQLiteStorage
+
+
+def test_expected_dates_by_source_type():
+    # Friday to Tuesday
+    assert expected_dates("stocks", "daily", "2024-01-05", "2024-01-09") == ["2024-01-05", "2024-01-08", "2024-01-09"]
+    assert expected_dates("crypto", "daily", "2024-01-05", "2024-01-07") == ["2024-01-05", "2024-01-06", "2024-01-07"]
+    assert expected_dates("commodity", "monthly", "2023-11-15", "2024-02-01") == [
+        "2023-11-01", "2023-12-01", "2024-01-01", "2024-02-01",
+    ]
+    assert expected_dates("commodity", "quarterly", "2023-01-01", "2024-01-01") == []
+    assert expected_dates("stocks", "daily", "2024-01-09", "2024-01-05") == []
+
+
+def _bar(day, close=1.5):
+    return ("IBM", day, 1.0, 2.0, 0.5, close, 100)
+
+
+STORED = ["2024-01-02", "2024-01-03", "2024-01-05", "2024-01-08", "2024-01-10"]
+JOBS = [({"function": "TIME_SERIES_DAILY", "symbol": "IBM"}, "stocks", "IBM", "USD", "daily")]
+
+
+def _store(session):
+    with session.transaction():
+        SQLiteStorage(session).append("stocks", [_bar(day) for day in STORED])
+        session.execute("""
+            INSERT INTO alphav_metadata (source_type, symbol, market, interval, max_data_date, update_date)
+            VALUES ('stocks', 'IBM', 'USD', 'daily', '2024-01-10', '2024-01-10 00:00:00')
+        """)
+
+
+def test_plan_and_fill(session, monkeypatch):
+    _store(session)
+    assert scan_series(session, "stocks", "IBM", "USD", "daily") == ["2024-01-04", "2024-01-09"]
+
+    plan = plan_backfill(JOBS, session=session, today="2024-01-11")
+    assert plan[0]["params"]["outputsize"] == "compact"
+    assert plan_backfill(JOBS, session=session, today="2025-01-11")[0]["params"]["outputsize"] == "full"
+
+    before = get_ohlc("stocks", "IBM", session=session)
+    # The vendor has 01-04 but not 01-09 (a holiday, say)
+    fetched = [_bar(day) for day in STORED[:2] + ["2024-01-04"] + STORED[2:]]
+    monkeypatch.setattr(gaps, "fetch_and_parse", lambda *args: {"rows": fetched})
+    assert fill_gaps(plan, session=session) == (1, 1)
+
+    # The cached series is revalidated and the fill is visible
+    assert len(get_ohlc("stocks", "IBM", session=session)["close"]) == len(before["close"]) + 1
+    assert session.fetchone("SELECT update_date FROM alphav_metadata")[0] != "2024-01-10 00:00:00"
+    assert session.fetchone("SELECT new_rows, first_new_date FROM alphav_revisions") == (1, "2024-01-04")
+    # Known gaps are not planned again
+    assert plan_backfill(JOBS, session=session, today="2024-01-11") == []
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from scripts.utils import http_client
+from scripts.utils.http_client import (
+    ProviderClient, ProviderError, ThrottleError, check_alphavantage_payload,
+)
+from scripts.utils.rate_limiter import QuotaExhaustedError, RateLimiter
+
+PER_MINUTE = ("Thank you for using Alpha Vantage! Our standard API call frequency is "
+              "5 calls per minute and 500 calls per day.")
+DAILY = ("Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests "
+         "per day. Please subscribe to any of the premium plans to instantly remove all daily rate limits.")
+PREMIUM = ("Thank you for using Alpha Vantage! This is a premium endpoint. You may subscribe "
+           "to any of the premium plans to instantly unlock all premium endpoints.")
+PREMIUM_DAILY = ("Thank you for using Alpha Vantage! The outputsize=full parameter value is a "
+                 "premium feature for the TIME_SERIES_DAILY endpoint.")
+
+
+def test_per_minute_note_is_retried_after_the_window():
+    with pytest.raises(ThrottleError) as raised:
+        check_alphavantage_payload({"Note": PER_MINUTE})
+    assert raised.value.retry_after >= 60
+
+
+def test_daily_limit_and_premium_are_not_retryable():
+    with pytest.raises(QuotaExhaustedError):
+        check_alphavantage_payload({"Information": DAILY})
+    with pytest.raises(ProviderError) as raised:
+        check_alphavantage_payload({"Information": PREMIUM})
+    assert not isinstance(raised.value, ThrottleError)
+
+
+def test_premium_notice_naming_a_daily_function_is_not_the_quota():
+    with pytest.raises(ProviderError) as raised:
+        check_alphavantage_payload({"Information": PREMIUM_DAILY})
+    assert not isinstance(raised.value, (ThrottleError, QuotaExhaustedError))
+
+
+def test_error_message_and_series_payloads():
+    with pytest.raises(ProviderError):
+        check_alphavantage_payload({"Error Message": "Invalid API call."})
+    check_alphavantage_payload({"Meta Data": {}, "Time Series (Daily)": {}})
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.content = json.dumps(payload).encode("utf-8")
+
+
+def _client(monkeypatch, payloads, limiter=None):
+    client = ProviderClient("alphavantage", "http://stub/", limiter=limiter,
+                            payload_check=check_alphavantage_payload)
+    calls, sleeps = [], []
+    monkeypatch.setattr(http_client, "response_cache", None)
+    monkeypatch.setattr(http_client.time, "sleep", sleeps.append)
+    monkeypatch.setattr(client, "get", lambda *args, **kwargs: calls.append(args) or FakeResponse(payloads.pop(0)))
+    return client, calls, sleeps
+
+
+def test_get_json_waits_a_minute_then_succeeds(monkeypatch):
+    client, calls, sleeps = _client(monkeypatch, [{"Note": PER_MINUTE}, {"Meta Data": {"a": 1}}])
+    assert client.get_json("query") == {"Meta Data": {"a": 1}}
+    assert len(calls) == 2
+    assert sleeps == [60.0]
+
+
+def test_get_json_stops_at_the_daily_limit(monkeypatch):
+    limiter = RateLimiter(1000, 25)
+    client, calls, sleeps = _client(monkeypatch, [{"Information": DAILY}], limiter)
+    with pytest.raises(QuotaExhaustedError):
+        client.get_json("query")
+    assert len(calls) == 1 and not sleeps
+    # Later calls fail in the limiter, without another request
+    with pytest.raises(QuotaExhaustedError):
+        limiter.acquire()
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from scripts.utils import investing_functions
+from scripts.utils.investing_functions import INSERT_INDICES_SQL, compact_indices, indices_loader, parse_retention
+
+NOW = datetime(2024, 6, 30, 12, 0, tzinfo=timezone.utc)
+
+# Cells with nested markup and layout whitespace, as on the homepage
+TABLE = """<table class="datatable-v2_table">
+  <tr>
+    <td><a href="/indices/us-30"><span>Dow</span> <span>Jones</span>
+        <span class="flag"></span></a></td>
+    <td> 37,545.33 </td><td>37,700.10</td><td>37,400.00</td>
+    <td><span>-12.50</span></td><td> <span>-0.03%</span></td>
+    <td><time datetime="2024-01-02T21:00:00Z">21:00</time></td>
+  </tr>
+  <tr><td>header</td></tr>
+</table>"""
+
+
+def test_parse_retention():
+    assert parse_retention("90:86400, 7:3600") == [(7.0, 3600), (90.0, 86400)]
+    assert parse_retention("") == []
+
+
+def test_unchanged_snapshots_are_skipped(session, monkeypatch):
+    snapshot = [{"name": "Dow Jones", "last": 37545.33, "high": 37700.1, "low": 37400.0,
+                 "change": -12.5, "percent": -0.03, "time": "2024-01-02T21:00:00Z"}]
+    monkeypatch.setattr(investing_functions, "scrape_indices", lambda: [dict(row) for row in snapshot])
+    count = lambda: session.fetchone("SELECT COUNT(*) FROM investing_indices")[0]
+
+    indices_loader(session=session)
+    indices_loader(session=session)
+    assert count() == 1
+
+    snapshot[0]["last"] = 37550.0
+    indices_loader(session=session)
+    assert count() == 2
+
+    indices_loader(session=session, skip_unchanged=False)
+    assert count() == 3
+
+
+def _minute_rows(days):
+    rows = []
+    for minute in range(days * 24 * 60, 0, -1):
+        stamp = (NOW - timedelta(minutes=minute)).strftime("%Y-%m-%d %H:%M:%S")
+        rows.append(("Dow Jones", minute, minute, minute, 0.0, 0.0, stamp, stamp, str(minute)))
+    return rows
+
+
+def test_compaction_tiers(session):
+    with session.transaction():
+        session.executemany(INSERT_INDICES_SQL, _minute_rows(10))
+
+    deleted = compact_indices(session=session, retention="7:3600,9:86400", now=NOW)
+
+    by_age = lambda start, end: session.fetchone(
+        "SELECT COUNT(*) FROM investing_indices WHERE insert_date >= ? AND insert_date < ?",
+        ((NOW - timedelta(days=start)).strftime("%Y-%m-%d %H:%M:%S"),
+         (NOW - timedelta(days=end)).strftime("%Y-%m-%d %H:%M:%S")),
+    )[0]
+    assert by_age(7, 0) == 7 * 24 * 60          # recent minutes untouched
+    assert by_age(9, 7) == 2 * 24               # hourly
+    assert by_age(10, 9) == 2                   # daily: 12:00 is mid-day, so two calendar days
+    assert deleted == 10 * 24 * 60 - session.fetchone("SELECT COUNT(*) FROM investing_indices")[0]
+
+    # The latest snapshot of each hour is the one kept
+    kept = session.fetchall("""
+        SELECT insert_date FROM investing_indices
+        WHERE insert_date >= '2024-06-22 12:00:00' AND insert_date < '2024-06-22 14:00:00'
+        ORDER BY insert_date
+    """)
+    assert kept == [("2024-06-22 12:59:00",), ("2024-06-22 13:59:00",)]
+
+    # Compacting again finds nothing to remove
+    assert compact_indices(session=session, retention="7:3600,9:86400", now=NOW) == 0
+
+
+def test_compaction_disabled(session):
+    with session.transaction():
+        session.executemany(INSERT_INDICES_SQL, _minute_rows(1))
+    assert compact_indices(session=session, retention="", now=NOW + timedelta(days=30)) == 0
+
+
+def test_lxml_and_bs4_read_the_same_cells(monkeypatch):
+    monkeypatch.setattr(investing_functions, "lxml_html", pytest.importorskip("lxml.html"))
+    pytest.importorskip("bs4")
+
+    fragment = investing_functions.extract_table("<html><body>" + TABLE + "</body></html>")
+    rows = list(investing_functions._table_cells_lxml(fragment))
+    assert rows == list(investing_functions._table_cells_bs4(fragment))
+    assert rows == [["Dow Jones", "37,545.33", "37,700.10", "37,400.00", "-12.50", "-0.03%",
+                     "2024-01-02T21:00:00Z"]]
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from scripts.utils import coingecko_functions
+from scripts.utils.coingecko_functions import market_data_loader
+from scripts.utils.response_cache import CacheMissError
+
+
+def _market(monkeypatch, coin_count):
+    coins = [{"id": f"coin-{i}", "symbol": f"c{i}", "market_cap_rank": i + 1} for i in range(coin_count)]
+    requested = []
+
+    def fake_fetch_market_page(page, per_page):
+        requested.append(page)
+        return coins[(page - 1) * per_page:page * per_page]
+
+    monkeypatch.setattr(coingecko_functions, "fetch_market_page", fake_fetch_market_page)
+    return requested
+
+
+def _snapshot_ids(session):
+    return {row[0] for row in session.fetchall("SELECT id FROM coingecko_market_data")}
+
+
+@pytest.mark.parametrize("coin_count", [620, 500])
+def test_market_data_stops_after_the_last_page(session, monkeypatch, coin_count):
+    requested = _market(monkeypatch, coin_count)
+    assert market_data_loader(session, top_n=5000, per_page=250, max_workers=1) == coin_count
+    # A short (or empty) page is the end of the market: no page after it is requested
+    assert requested == list(range(1, coin_count // 250 + 2))
+    assert len(_snapshot_ids(session)) == coin_count
+
+
+def test_market_data_stops_at_top_n(session, monkeypatch):
+    requested = _market(monkeypatch, 2000)
+    assert market_data_loader(session, top_n=300, per_page=250, max_workers=4) == 300
+    assert sorted(requested) == [1, 2]
+    assert _snapshot_ids(session) == {f"coin-{i}" for i in range(300)}
+
+
+def test_failed_page_deletes_the_partial_snapshot(session, monkeypatch):
+    requested = _market(monkeypatch, 2000)
+    fetch = coingecko_functions.fetch_market_page
+
+    def failing_fetch(page, per_page):
+        if page == 3:
+            raise RuntimeError("HTTP 500")
+        return fetch(page, per_page)
+
+    monkeypatch.setattr(coingecko_functions, "fetch_market_page", failing_fetch)
+    with pytest.raises(RuntimeError):
+        market_data_loader(session, top_n=2000, per_page=250, max_workers=1)
+    # Pages 1 and 2 were written before page 3 failed; none of them are kept
+    assert requested == [1, 2]
+    assert _snapshot_ids(session) == set()
+
+
+def test_missing_page_after_the_short_last_page_is_the_end(session, monkeypatch):
+    requested = _market(monkeypatch, 620)
+    fetch = coingecko_functions.fetch_market_page
+
+    def fetch_prefetched(page, per_page):
+        # The short page 3 arrives after the prefetched page 4 has already failed
+        if page == 3:
+            time.sleep(0.05)
+        if page == 4:
+            raise CacheMissError("No cached payload for coingecko coins/markets {'page': 4}")
+        return fetch(page, per_page)
+
+    monkeypatch.setattr(coingecko_functions, "fetch_market_page", fetch_prefetched)
+    assert market_data_loader(session, top_n=5000, per_page=250, max_workers=4) == 620
+    assert {1, 2, 3} <= set(requested)
+    assert len(_snapshot_ids(session)) == 620
@@ -0,0 +1,66 @@
+import time
+
+from scripts.utils.metadata_index import MetadataIndex
+
+KEY = ("stocks", "IBM", "USD", "daily")
+TOKEN_SQL = """
+    SELECT update_date FROM alphav_metadata
+    WHERE source_type = ? AND symbol = ? AND market = ? AND interval = ?
+"""
+
+
+def test_update_date_changes_within_the_same_second(session):
+    metadata = MetadataIndex(session)
+    tokens = []
+    for refresh in ("2024-06-03", "2024-06-03", "2024-06-04"):
+        metadata.update(*KEY, refresh, refresh)
+        metadata.flush()
+        tokens.append(session.fetchone(TOKEN_SQL, KEY)[0])
+        time.sleep(0.002)
+
+    # Inserts and updates both carry milliseconds, so every write moves the token
+    assert all("." in token for token in tokens)
+    assert len(set(tokens)) == 3
+    metadata.reload()
+    assert metadata.get(*KEY)["update_date"] == tokens[-1]
+
+
+def _stored(session):
+    return session.fetchall(
+        "SELECT symbol, max_data_date FROM alphav_metadata WHERE source_type = 'stocks' ORDER BY symbol"
+    )
+
+
+def test_buffered_updates_are_written_in_one_flush(session, monkeypatch):
+    metadata = MetadataIndex(session)
+    batches = []
+    executemany = session.executemany
+    monkeypatch.setattr(session, "executemany", lambda sql, rows: batches.append(rows) or executemany(sql, rows))
+
+    metadata.update(*KEY, "2024-06-03", "2024-06-03")
+    metadata.update("stocks", "AAPL", "USD", "daily", "2024-06-03", "2024-06-03")
+    # A second update of the same series replaces the buffered one
+    metadata.update(*KEY, "2024-06-04", "2024-06-04")
+
+    # Lookups see the updates before anything is written
+    assert metadata.max_data_date(*KEY) == "2024-06-04"
+    assert _stored(session) == []
+
+    assert metadata.flush() == 2
+    assert len(batches) == 1 and len(batches[0]) == 2
+    assert _stored(session) == [("AAPL", "2024-06-03"), ("IBM", "2024-06-04")]
+    assert metadata.flush() == 0 and len(batches) == 1
+
+
+def test_reload_picks_up_rows_written_elsewhere(session):
+    metadata = MetadataIndex(session)
+    assert metadata.get(*KEY) is None
+
+    other = MetadataIndex(session)
+    other.update(*KEY, "2024-06-03", "2024-06-03")
+    other.flush()
+    assert metadata.get(*KEY) is None
+
+    metadata.reload()
+    assert metadata.max_data_date(*KEY) == "2024-06-03"
+    assert metadata.get(*KEY)["update_date"] is not None
@@ -0,0 +1,94 @@
+import json
+import threading
+
+import pytest
+
+from scripts.utils.metrics import Metrics
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = Metrics(log_file=tmp_path / "events.jsonl", prom_file=tmp_path / "test.prom", enabled=True)
+    yield registry
+    if registry.log_handle is not None:
+        registry.log_handle.close()
+
+
+def test_counters_and_timings_aggregate_per_label_set(registry):
+    with registry.labels(provider="alphavantage", symbol="IBM"):
+        registry.count("rows_inserted", 250)
+        registry.count("rows_inserted", 50)
+        registry.count("rows_ignored", 0)
+        registry.observe("fetch", 0.5)
+        registry.observe("fetch", 1.5)
+        # Labels passed to a call are merged over the block's labels
+        registry.count("rows_inserted", 7, symbol="AAPL")
+    registry.count("retries")
+
+    ibm = (("provider", "alphavantage"), ("symbol", "IBM"))
+    assert registry.counters == {
+        ("rows_inserted", ibm): 300,
+        ("rows_inserted", (("provider", "alphavantage"), ("symbol", "AAPL"))): 7,
+        ("retries", ()): 1,
+    }
+    assert registry.timings == {("fetch", ibm): [2, 2.0]}
+
+    with registry.stage("parse", provider="coingecko"):
+        pass
+    assert registry.timings[("parse", (("provider", "coingecko"),))][0] == 1
+
+
+def test_every_event_is_appended_to_the_jsonl_log(registry):
+    with registry.labels(provider="coingecko"):
+        registry.count("rows_parsed", 10)
+        registry.observe("insert", 0.25)
+    registry.log_handle.flush()
+
+    events = [json.loads(line) for line in registry.log_file.read_text().splitlines()]
+    assert [(e["event"], e["provider"]) for e in events] == [("count", "coingecko"), ("stage", "coingecko")]
+    assert events[0]["counter"] == "rows_parsed" and events[0]["value"] == 10
+    assert events[1]["stage"] == "insert" and events[1]["seconds"] == 0.25
+    assert all("ts" in e for e in events)
+
+
+def test_render_writes_prometheus_text(registry):
+    registry.observe("fetch", 1.25, provider="alphavantage")
+    registry.count("throttle_events", 2, provider="alphavantage", reason='say "slow"')
+    text = registry.render()
+
+    assert 'gedap_stage_seconds_sum{stage="fetch",provider="alphavantage"} 1.250000' in text
+    assert 'gedap_stage_seconds_count{stage="fetch",provider="alphavantage"} 1' in text
+    assert "# TYPE gedap_throttle_events_total counter" in text
+    assert 'gedap_throttle_events_total{provider="alphavantage",reason="say \\"slow\\""} 2' in text
+
+    registry.flush()
+    assert registry.prom_file.read_text() == text
+    assert list(registry.prom_file.parent.glob("*.tmp")) == []
+
+
+def test_concurrent_flushes_do_not_collide(registry):
+    registry.count("rows_inserted", 1)
+    errors = []
+
+    def flush_many():
+        try:
+            for _ in range(50):
+                registry.flush()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=flush_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert "gedap_rows_inserted_total 1" in registry.prom_file.read_text()
+
+
+def test_disabled_registry_keeps_totals_but_writes_nothing(tmp_path):
+    registry = Metrics(log_file=tmp_path / "events.jsonl", prom_file=tmp_path / "test.prom", enabled=False)
+    registry.count("rows_inserted", 3)
+    registry.flush()
+    assert registry.counters == {("rows_inserted", ()): 3}
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,36 @@
+from scripts.utils.alphav_functions import (
+    COMPACT_MARGIN, COMPACT_POINTS, business_days_between, choose_outputsize,
+)
+
+DAILY = {"function": "TIME_SERIES_DAILY", "symbol": "IBM"}
+
+
+def test_business_days_between():
+    # Friday -> Monday skips the weekend
+    assert business_days_between("2024-01-05", "2024-01-08") == 1
+    assert business_days_between("2024-01-01", "2024-01-08") == 5
+    assert business_days_between("2024-01-01", "2024-01-29") == 20
+    assert business_days_between("2024-01-08", "2024-01-01") == 0
+    assert business_days_between("2024-01-06 00:00:00", "2024-01-07") == 0
+
+
+def test_choose_outputsize_compact_for_small_gaps():
+    params = choose_outputsize(DAILY, "2024-01-05", False, today="2024-01-12")
+    assert params["outputsize"] == "compact"
+    assert "outputsize" not in DAILY
+
+
+def test_choose_outputsize_full_for_large_gaps_and_first_loads():
+    # Exactly at the limit still fits; one business day more does not
+    limit = COMPACT_POINTS - COMPACT_MARGIN
+    assert business_days_between("2024-01-01", "2024-05-06") == limit
+    assert choose_outputsize(DAILY, "2024-01-01", False, today="2024-05-06")["outputsize"] == "compact"
+    assert choose_outputsize(DAILY, "2024-01-01", False, today="2024-05-07")["outputsize"] == "full"
+    assert choose_outputsize(DAILY, None, True)["outputsize"] == "full"
+
+
+def test_choose_outputsize_leaves_other_functions_and_explicit_sizes():
+    crypto = {"function": "DIGITAL_CURRENCY_DAILY", "symbol": "BTC", "market": "USD"}
+    assert choose_outputsize(crypto, "2024-01-05", False, today="2024-01-12") == crypto
+    explicit = dict(DAILY, outputsize="full")
+    assert choose_outputsize(explicit, "2024-01-05", False, today="2024-01-12") == explicit
@@ -0,0 +1,74 @@
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from scripts.utils.parquet_export import parquet_exporter
+from scripts.utils.reconcile import reconcile_rows, record_revision
+
+BARS = [
+    ("IBM", "2022-06-01", 1.0, 2.0, 0.5, 1.5, 100),
+    ("IBM", "2023-06-01", 2.0, 3.0, 1.5, 2.5, 200),
+    ("IBM", "2024-06-01", 3.0, 4.0, 2.5, 3.5, 300),
+]
+
+UPSERT_METADATA_SQL = """
+    INSERT OR REPLACE INTO alphav_metadata (source_type, symbol, market, interval, max_data_date, update_date)
+    VALUES ('stocks', 'IBM', 'USD', 'daily', ?, ?)
+"""
+
+
+def _partition(export_dir, year):
+    return pq.read_table(export_dir / "source_type=stocks" / "symbol=IBM" / f"year={year}" / "part-0.parquet")
+
+
+def test_revised_bars_in_older_years_are_exported(session, tmp_path):
+    export_dir = tmp_path / "export"
+    with session.transaction():
+        reconcile_rows(session, "stocks", BARS)
+        session.execute(UPSERT_METADATA_SQL, ("2024-06-01", "2024-06-01 00:00:00"))
+    assert parquet_exporter(str(export_dir), session=session) == 3
+
+    # Nothing changed: nothing rewritten
+    assert parquet_exporter(str(export_dir), session=session) == 0
+
+    # A vendor revision in 2022 and a refilled hole in 2023, watermark unchanged
+    with session.transaction():
+        counts = reconcile_rows(session, "stocks", [
+            ("IBM", "2022-06-01", 1.0, 2.0, 0.5, 9.9, 100),
+            ("IBM", "2023-06-02", 2.5, 3.0, 2.0, 2.7, 150),
+        ])
+        record_revision(session, "stocks", "IBM", "USD", "daily", counts)
+    assert parquet_exporter(str(export_dir), session=session) == 3
+    assert _partition(export_dir, 2022).column("close").to_pylist() == [9.9]
+    assert _partition(export_dir, 2023).num_rows == 2
+
+
+def test_full_export_removes_stale_partitions(session, tmp_path):
+    export_dir = tmp_path / "export"
+    stale = export_dir / "source_type=stocks" / "symbol=GONE" / "year=2020"
+    stale.mkdir(parents=True)
+    (stale / "part-0.parquet").write_bytes(b"")
+
+    with session.transaction():
+        reconcile_rows(session, "stocks", BARS)
+        session.execute(UPSERT_METADATA_SQL, ("2024-06-01", "2024-06-01 00:00:00"))
+    parquet_exporter(str(export_dir), full=True, session=session)
+
+    assert not (export_dir / "source_type=stocks" / "symbol=GONE").exists()
+    assert _partition(export_dir, 2024).column("volume").to_pylist() == [300]
+
+
+def test_export_script_runs_only_through_main(session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with session.transaction():
+        reconcile_rows(session, "stocks", BARS)
+        session.execute(UPSERT_METADATA_SQL, ("2024-06-01", "2024-06-01 00:00:00"))
+
+    # Importing the script does not export anything
+    from scripts import export_parquet
+    assert not (tmp_path / "export").exists()
+
+    assert export_parquet.main(session=session, argv=["--full"]) == 3
+    schema = _partition(tmp_path / "export", 2024).schema
+    assert str(schema.field("volume").type) == "int64"
+    assert str(schema.field("close").type) == "double"
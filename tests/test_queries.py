@@ -0,0 +1,21 @@
+from scripts.utils.metadata_index import MetadataIndex
+from scripts.utils.queries import get_ohlc, series_cache
+from scripts.utils.storage import SQLiteStorage
+
+
+def test_series_read_before_its_first_load_is_not_cached(session):
+    series_cache.clear()
+    assert len(get_ohlc("stocks", "IBM", session=session)["close"]) == 0
+    assert series_cache.entries == {}
+
+    # First load: bars and the metadata row that makes the series cacheable
+    with session.transaction():
+        SQLiteStorage(session).append("stocks", [("IBM", "2024-01-02", 1.0, 2.0, 0.5, 1.5, 100)])
+        metadata = MetadataIndex(session)
+        metadata.update("stocks", "IBM", "USD", "daily", "2024-01-02", "2024-01-02")
+        metadata.flush()
+
+    assert list(get_ohlc("stocks", "IBM", session=session)["close"]) == [1.5]
+    hits = series_cache.hits
+    assert list(get_ohlc("stocks", "IBM", session=session)["close"]) == [1.5]
+    assert series_cache.hits == hits + 1
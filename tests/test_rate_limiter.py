@@ -0,0 +1,88 @@
+import pytest
+
+from scripts.utils import rate_limiter
+from scripts.utils.rate_limiter import QuotaExhaustedError, RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def test_bucket_refills_continuously_up_to_capacity(clock):
+    bucket = TokenBucket(5, 60)
+    for _ in range(5):
+        assert bucket.wait_time(clock.now) == 0.0
+        bucket.take()
+
+    # One token every 12 seconds
+    assert bucket.wait_time(clock.now) == pytest.approx(12.0)
+    assert bucket.wait_time(clock.now + 6) == pytest.approx(6.0)
+    assert bucket.wait_time(clock.now + 12) == 0.0
+
+    # A long idle period never stores more than the capacity
+    bucket.wait_time(clock.now + 3600)
+    assert bucket.tokens == 5.0
+
+
+def test_acquire_sleeps_until_the_next_token(clock):
+    limiter = RateLimiter(5)
+    for _ in range(5):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    limiter.acquire()
+    assert clock.sleeps == [pytest.approx(12.0)]
+
+
+def test_acquire_raises_instead_of_waiting_past_max_wait(clock):
+    limiter = RateLimiter(1, max_wait=30)
+    limiter.acquire()
+    with pytest.raises(QuotaExhaustedError):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    # No max_wait: the same wait is slept through
+    unbounded = RateLimiter(1, max_wait=None)
+    unbounded.acquire()
+    unbounded.acquire()
+    assert clock.sleeps == [pytest.approx(60.0)]
+
+
+def test_daily_quota_stops_requests_until_it_refills(clock):
+    limiter = RateLimiter(1000, 3)
+    for _ in range(3):
+        limiter.acquire()
+    with pytest.raises(QuotaExhaustedError):
+        limiter.acquire()
+
+    clock.now += 86400
+    limiter.acquire()
+
+
+def test_drain_empties_only_the_daily_bucket(clock):
+    limiter = RateLimiter(5, 25)
+    limiter.drain()
+    assert limiter.buckets[0].tokens == 5.0
+    with pytest.raises(QuotaExhaustedError):
+        limiter.acquire()
+
+    # Without a daily bucket there is nothing to drain
+    per_minute = RateLimiter(5)
+    per_minute.drain()
+    per_minute.acquire()
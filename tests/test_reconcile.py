@@ -0,0 +1,41 @@
+from scripts.utils.reconcile import reconcile_rows, record_revision
+
+BARS = [
+    ("BTC", "USD", "2024-01-01", 1.0, 2.0, 0.5, 1.5, 10.0),
+    ("BTC", "USD", "2024-01-02", 1.5, 2.5, 1.0, 2.0, 20.0),
+    ("BTC", "USD", "2024-01-03", 2.0, 3.0, 1.5, 2.5, 30.0),
+]
+
+
+def _closes(session):
+    return session.fetchall("SELECT date, close FROM alphav_crypto_daily ORDER BY date")
+
+
+def test_reconcile_counts(session):
+    with session.transaction():
+        first = reconcile_rows(session, "crypto", BARS[:2])
+    assert (first["fetched"], first["new"], first["changed"], first["unchanged"]) == (2, 2, 0, 0)
+    assert first["first_new_date"] == "2024-01-01"
+
+    revised = ("BTC", "USD", "2024-01-02", 1.5, 2.5, 1.0, 2.2, 20.0)
+    with session.transaction():
+        counts = reconcile_rows(session, "crypto", [BARS[0], revised, BARS[2]])
+        record_revision(session, "crypto", "BTC", "USD", "daily", counts)
+    assert (counts["fetched"], counts["new"], counts["changed"], counts["unchanged"]) == (3, 1, 1, 1)
+    assert (counts["first_changed_date"], counts["last_changed_date"]) == ("2024-01-02", "2024-01-02")
+    assert counts["first_new_date"] == "2024-01-03"
+    assert _closes(session) == [("2024-01-01", 1.5), ("2024-01-02", 2.2), ("2024-01-03", 2.5)]
+
+    assert session.fetchone(
+        "SELECT new_rows, changed_rows, unchanged_rows, first_changed_date, first_new_date FROM alphav_revisions"
+    ) == (1, 1, 1, "2024-01-02", "2024-01-03")
+
+
+def test_reconcile_unchanged_window_writes_nothing(session):
+    with session.transaction():
+        reconcile_rows(session, "crypto", BARS)
+    with session.transaction():
+        counts = reconcile_rows(session, "crypto", BARS)
+    assert (counts["new"], counts["changed"], counts["unchanged"]) == (0, 0, 3)
+    assert counts["first_changed_date"] is None and counts["first_new_date"] is None
+    assert session.fetchone("SELECT COUNT(*) FROM alphav_crypto_daily")[0] == 3
@@ -0,0 +1,86 @@
+import os
+import time
+
+import pytest
+
+from scripts.utils.response_cache import CacheMissError, ResponseCache, cache_key
+
+
+def _entries(cache):
+    return sorted(cache.cache_dir.glob("*/*.gz"))
+
+
+def _disk_size(cache):
+    return sum(path.stat().st_size for path in _entries(cache))
+
+
+def test_cache_key_ignores_the_api_key_and_param_order():
+    base = cache_key("alphavantage", "query", {"function": "FX_DAILY", "from_symbol": "EUR"})
+    assert cache_key("alphavantage", "/query", {"from_symbol": "EUR", "function": "FX_DAILY",
+                                                "apikey": "secret"}) == base
+    assert cache_key("alphavantage", "query", {"function": "FX_DAILY", "from_symbol": "EUR",
+                                               "APIKEY": "other"}) == base
+    assert cache_key("alphavantage", "query", {"function": "FX_DAILY", "from_symbol": "GBP"}) != base
+
+
+def test_entries_expire_after_the_endpoint_ttl(tmp_path):
+    cache = ResponseCache(tmp_path, ttls={("alphavantage", "query"): 100})
+    params = {"function": "FX_DAILY", "from_symbol": "EUR"}
+    cache.put("alphavantage", "query", params, b'{"ok": 1}')
+    assert cache.get("alphavantage", "query", params) == b'{"ok": 1}'
+
+    # The mtime is the fetch time: push it past the TTL
+    (path,) = _entries(cache)
+    old = time.time() - 200
+    os.utime(path, (old, old))
+    assert cache.get("alphavantage", "query", params) is None
+
+    # Replay mode never expires entries
+    replay = ResponseCache(tmp_path, ttls={("alphavantage", "query"): 100}, replay=True)
+    assert replay.get("alphavantage", "query", params) == b'{"ok": 1}'
+
+
+def test_replay_miss_raises_without_showing_the_api_key(tmp_path):
+    cache = ResponseCache(tmp_path, replay=True)
+    with pytest.raises(CacheMissError) as raised:
+        cache.get("alphavantage", "query", {"function": "FX_DAILY", "apikey": "secret"})
+    assert "secret" not in str(raised.value)
+
+    # Replay mode never writes either
+    cache.put("alphavantage", "query", {"function": "FX_DAILY"}, b"{}")
+    assert _entries(cache) == []
+
+
+def test_eviction_drops_the_least_recently_used_entries(tmp_path):
+    cache = ResponseCache(tmp_path)
+    bodies = {name: os.urandom(2000) for name in ("a", "b", "c")}
+    for name, body in bodies.items():
+        cache.put("coingecko", "coins/markets", {"page": name}, body)
+    size = _disk_size(cache) // 3
+
+    # "a" was fetched first but read most recently, so "b" is the LRU entry
+    now = time.time()
+    for age, name in ((30, "a"), (20, "b"), (10, "c")):
+        path = cache._path(cache_key("coingecko", "coins/markets", {"page": name}))
+        os.utime(path, (now - age, now - age))
+    assert cache.get("coingecko", "coins/markets", {"page": "a"}) == bodies["a"]
+
+    cache.max_bytes = size * 3 + size // 2
+    cache.put("coingecko", "coins/markets", {"page": "d"}, os.urandom(2000))
+
+    assert cache.get("coingecko", "coins/markets", {"page": "b"}) is None
+    for name in ("a", "c", "d"):
+        assert cache.get("coingecko", "coins/markets", {"page": name}) is not None
+    assert cache.size == _disk_size(cache) <= cache.max_bytes
+
+
+def test_overwriting_an_entry_does_not_count_it_twice(tmp_path):
+    cache = ResponseCache(tmp_path)
+    params = {"function": "FX_DAILY", "from_symbol": "EUR"}
+    cache.put("alphavantage", "query", params, b"first")
+    cache.put("alphavantage", "query", {"function": "FX_DAILY", "from_symbol": "GBP"}, b"other")
+    for _ in range(5):
+        cache.put("alphavantage", "query", params, os.urandom(1000))
+
+    assert len(_entries(cache)) == 2
+    assert cache.size == _disk_size(cache)
@@ -0,0 +1,55 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from scripts.utils.rollups import BUCKET_SQL, RESOLUTIONS, bucket_start, resolutions_for, update_rollups
+
+# Two years of days, across a leap day and year boundaries
+DAYS = [(date(2023, 12, 1) + timedelta(days=i)).isoformat() for i in range(800)]
+
+
+@pytest.mark.parametrize("resolution", RESOLUTIONS)
+def test_bucket_start_matches_bucket_sql(resolution):
+    conn = sqlite3.connect(":memory:")
+    sql = f"SELECT {BUCKET_SQL[resolution]} FROM (SELECT ? AS date)"
+    for day in DAYS:
+        assert bucket_start(resolution, day) == conn.execute(sql, (day,)).fetchone()[0], day
+
+
+def test_bucket_start_values():
+    assert bucket_start("weekly", "2024-01-07") == "2024-01-01"   # Sunday -> Monday before
+    assert bucket_start("weekly", "2024-01-08") == "2024-01-08"
+    assert bucket_start("monthly", "2024-02-29") == "2024-02-01"
+    assert bucket_start("yearly", "2024-12-31 23:59:59") == "2024-01-01"
+    with pytest.raises(ValueError):
+        bucket_start("hourly", "2024-01-01")
+
+
+def test_resolutions_for():
+    assert resolutions_for("daily") == ["weekly", "monthly", "yearly"]
+    assert resolutions_for("monthly") == ["yearly"]
+    assert resolutions_for("annual") == []
+
+
+def test_incremental_rollups_equal_a_full_rebuild(session):
+    bars = [("IBM", day, i, i + 2, i - 1, i + 1, 10) for i, day in enumerate(DAYS[:100])]
+    more = [("IBM", day, i, i + 2, i - 1, i + 1, 10) for i, day in enumerate(DAYS[100:130], start=100)]
+    insert = "INSERT INTO alphav_stocks_daily VALUES (?, ?, ?, ?, ?, ?, ?)"
+    query = "SELECT * FROM alphav_rollups ORDER BY resolution, bucket"
+
+    with session.transaction():
+        session.executemany(insert, bars)
+        update_rollups(session, "stocks", "IBM", "USD")
+        session.executemany(insert, more)
+        update_rollups(session, "stocks", "IBM", "USD")
+    incremental = session.fetchall(query)
+
+    with session.transaction():
+        update_rollups(session, "stocks", "IBM", "USD", full=True)
+    assert session.fetchall(query) == incremental
+
+    monthly = {row[4]: row for row in incremental if row[3] == "monthly"}
+    december = monthly["2023-12-01"]
+    # open of the first bar, close of the last, 31 bars
+    assert (december[7], december[10], december[12]) == (0, 31, 31)
@@ -0,0 +1,70 @@
+from scripts.utils import alphav_functions
+from scripts.utils.run_ledger import RunLedger, job_key
+
+
+def test_unfinished_run_resumes_its_pending_jobs(session):
+    ledger = RunLedger(session, "x", period="2024-01-02")
+    assert ledger.pending(["a", "b"]) == ["a", "b"]
+    with session.transaction():
+        ledger.mark("a", "ok")
+        ledger.mark("b", "failed", "boom")
+    ledger.finish()
+
+    rerun = RunLedger(session, "x", period="2024-01-02")
+    assert rerun.resumed and rerun.run_id == ledger.run_id
+    assert rerun.pending(["a", "b"]) == ["b"]
+
+
+def test_crashed_run_resumes(session):
+    ledger = RunLedger(session, "x", period="2024-01-02")
+    ledger.pending(["a", "b"])
+    # No finish(): the run is still 'running'
+    assert RunLedger(session, "x", period="2024-01-02").pending(["a", "b"]) == ["a", "b"]
+
+
+def test_complete_run_starts_a_new_one(session):
+    ledger = RunLedger(session, "x", period="2024-01-02")
+    ledger.pending(["a", "b"])
+    with session.transaction():
+        ledger.mark("a", "ok")
+        ledger.mark("b", "ok")
+    ledger.finish()
+    assert session.fetchone("SELECT status FROM run_ledger WHERE run_id = ?", (ledger.run_id,))[0] == "complete"
+
+    rerun = RunLedger(session, "x", period="2024-01-02")
+    assert not rerun.resumed and rerun.run_id != ledger.run_id
+    assert rerun.pending(["a", "b"]) == ["a", "b"]
+
+
+def test_no_resume_and_new_period(session):
+    ledger = RunLedger(session, "x", period="2024-01-02")
+    ledger.pending(["a"])
+    assert RunLedger(session, "x", period="2024-01-02", resume=False).run_id != ledger.run_id
+    assert RunLedger(session, "x", period="2024-01-03").run_id != ledger.run_id
+
+
+def test_batch_commits_metadata_with_the_ledger_mark(session, monkeypatch):
+    def fetch_and_parse(params, source_type, symbol, market, max_data_date, full_load, columnar=False):
+        return {
+            "meta": {}, "rows": [(symbol, "2024-01-02", 1.0, 2.0, 0.5, 1.5, 100)], "row_count": 1,
+            "max_data_date": "2024-01-02", "api_last_refresh": None,
+        }
+
+    seen = {}
+
+    class CheckingLedger(RunLedger):
+        def mark(self, key, status, error=None):
+            # Same connection, same transaction: the job's metadata must already be there
+            seen[key] = session.fetchone(
+                "SELECT max_data_date FROM alphav_metadata WHERE source_type = 'stocks' AND symbol = ?",
+                (key.split(":")[1],),
+            )
+            super().mark(key, status, error)
+
+    monkeypatch.setattr(alphav_functions, "fetch_and_parse", fetch_and_parse)
+    monkeypatch.setattr(alphav_functions, "RunLedger", CheckingLedger)
+    jobs = [({"function": "TIME_SERIES_DAILY", "symbol": s}, "stocks", s, "USD", "daily") for s in ("IBM", "AAPL")]
+    loaded, failed = alphav_functions.alphav_batch_loader(jobs, session=session, run_name="stocks")
+
+    assert len(loaded) == 2 and not failed
+    assert seen == {job_key("stocks", s, "USD", "daily"): ("2024-01-02",) for s in ("IBM", "AAPL")}
@@ -0,0 +1,125 @@
+import os
+import signal
+import threading
+import time as real_time
+
+import pytest
+
+from scripts import scheduler
+from scripts.scheduler import Job, Scheduler, select_jobs
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def strftime(self, fmt):
+        return real_time.strftime(fmt)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    return clock
+
+
+def _job(name, interval, main):
+    job = Job(name, f"insert_{name}", interval)
+    job.main = main
+    return job
+
+
+def test_jobs_run_when_their_interval_is_due(session, clock):
+    runs = []
+    jobs = [_job(name, interval, lambda session, name=name: runs.append(name))
+            for name, interval in (("price", 60), ("coins_list", 600))]
+    sched = Scheduler(jobs, session)
+    try:
+        # Everything is due on start
+        sched.run_once()
+        assert sorted(runs) == ["coins_list", "price"]
+        assert sched.seconds_until_next() == 60
+
+        clock.now = 59
+        assert sched.dispatch() == []
+        clock.now = 60
+        sched.run_once()
+        assert runs[2:] == ["price"]
+
+        clock.now = 600
+        sched.run_once()
+        assert sorted(runs[3:]) == ["coins_list", "price"]
+    finally:
+        sched.stop()
+
+
+def test_a_running_job_is_not_dispatched_again(session, clock):
+    release = threading.Event()
+    runs = []
+    job = _job("price", 0, lambda session: runs.append(1) or release.wait(5))
+    sched = Scheduler([job], session)
+    try:
+        (first,) = sched.dispatch()
+        # Due again (interval 0) but still running
+        assert sched.dispatch() == []
+        release.set()
+        first.result()
+        assert not job.running
+        sched.run_once()
+        assert len(runs) == 2
+    finally:
+        sched.stop()
+
+
+def test_a_failing_job_is_rescheduled(session, clock, capsys):
+    def broken(session):
+        raise RuntimeError("provider down")
+
+    job = _job("price", 60, broken)
+    sched = Scheduler([job], session)
+    try:
+        sched.run_once()
+    finally:
+        sched.stop()
+    assert "price failed: provider down" in capsys.readouterr().out
+    assert job.next_run == 60 and not job.running
+
+
+def test_select_jobs_by_name():
+    assert [job.name for job in select_jobs([])] == [name for name, _, _ in scheduler.JOBS]
+    assert [job.name for job in select_jobs(["--only", "coingecko_price", "--only", "investing_indices"])] == [
+        "coingecko_price", "investing_indices",
+    ]
+    with pytest.raises(SystemExit):
+        select_jobs(["--only", "nope"])
+
+
+@pytest.fixture
+def stub_main(monkeypatch, session):
+    runs = []
+    monkeypatch.setattr(scheduler, "DBSession", lambda: session)
+    monkeypatch.setattr(Job, "load", lambda self: lambda session: runs.append(self.name))
+    handler = signal.getsignal(signal.SIGTERM)
+    yield runs
+    signal.signal(signal.SIGTERM, handler)
+
+
+def test_once_runs_the_selected_jobs_and_exits(stub_main):
+    scheduler.main(["--once", "--only", "coingecko_price", "--only", "alphav_fx_daily"])
+    assert sorted(stub_main) == ["alphav_fx_daily", "coingecko_price"]
+
+
+def test_sigterm_stops_the_scheduler_after_running_jobs(stub_main, monkeypatch):
+    def terminate(session):
+        stub_main.append("price")
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    monkeypatch.setattr(Job, "load", lambda self: terminate)
+    start = real_time.monotonic()
+    scheduler.main(["--only", "coingecko_price"])
+    assert stub_main == ["price"]
+    assert real_time.monotonic() - start < 5
@@ -0,0 +1,62 @@
+import sqlite3
+
+from scripts.utils.db_session import DBSession
+from scripts.utils.schema import SCHEMA_VERSION, TABLES, table_columns, table_sql
+
+
+def test_migrations_on_an_empty_database(session):
+    assert session.fetchone("PRAGMA user_version")[0] == SCHEMA_VERSION
+    for table in TABLES:
+        assert table_sql(session, table) is not None
+    for table in ("sync_state", "alphav_revisions", "derived_daily_metrics", "alphav_rollups",
+                  "run_ledger", "run_ledger_jobs", "alphav_known_gaps"):
+        assert table_sql(session, table) is not None
+    assert "snapshot_time" in table_columns(session, "coingecko_market_data")
+    assert "value_hash" in table_columns(session, "investing_indices")
+    assert "first_new_date" in table_columns(session, "alphav_revisions")
+    assert session.fetchall("PRAGMA foreign_key_check") == []
+
+
+# Tables as the original scripts created them by hand: no keys, rowid tables,
+# duplicate bars and investing.com display strings.
+LEGACY = [
+    "CREATE TABLE alphav_stocks_daily (symbol TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, volume INTEGER)",
+    "INSERT INTO alphav_stocks_daily VALUES ('IBM', '2024-01-02', 1, 2, 0.5, 1.5, 100)",
+    "INSERT INTO alphav_stocks_daily VALUES ('IBM', '2024-01-02', 1, 2, 0.5, 1.5, 100)",
+    "INSERT INTO alphav_stocks_daily VALUES ('IBM', '2024-01-03', 1.5, 2.5, 1, 2, 200)",
+    "CREATE TABLE coingecko_market_data (id TEXT, symbol TEXT, current_price REAL, last_updated TEXT)",
+    "INSERT INTO coingecko_market_data VALUES ('bitcoin', 'btc', 42000, '2024-01-02T10:00:00.000Z')",
+    """CREATE TABLE investing_indices (id INTEGER PRIMARY KEY, name TEXT NOT NULL, last_value REAL,
+       high_value REAL, low_value REAL, change REAL, change_percent REAL, market_time TEXT, insert_date TEXT NOT NULL)""",
+    """INSERT INTO investing_indices (name, last_value, high_value, low_value, change, change_percent, market_time, insert_date)
+       VALUES ('Dow Jones', '37,545.33', '37,700.10', '37,400.00', '-12.50', '+1.23%', '2024-01-02T21:00:00Z', '2024-01-02 21:05:00')""",
+    """INSERT INTO investing_indices (name, last_value, high_value, low_value, change, change_percent, market_time, insert_date)
+       VALUES ('US 10Y', '4.125', '4.130', '4.100', '-0.005', '-0.123%', '2024-01-02T21:00:00Z', '2024-01-02 21:05:00')""",
+]
+
+
+def test_migrations_on_a_baseline_database(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    for sql in LEGACY:
+        conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+    with DBSession(path) as session:
+        assert session.fetchone("PRAGMA user_version")[0] == SCHEMA_VERSION
+        assert "WITHOUT ROWID" in table_sql(session, "alphav_stocks_daily")
+        assert session.fetchall("SELECT date, volume FROM alphav_stocks_daily ORDER BY date") == [
+            ("2024-01-02", 100), ("2024-01-03", 200),
+        ]
+        assert session.fetchone("SELECT snapshot_time FROM coingecko_market_data")[0] == "2024-01-02 10:00:00"
+
+        rows = session.fetchall(
+            "SELECT last_value, high_value, change, change_percent, value_hash FROM investing_indices ORDER BY id"
+        )
+        assert [row[:4] for row in rows] == [(37545.33, 37700.10, -12.5, 1.23), (4.125, 4.13, -0.005, -0.123)]
+        assert all(row[4] is not None for row in rows)
+
+    # Reopening an up-to-date database applies nothing
+    with DBSession(path) as session:
+        assert session.fetchone("PRAGMA user_version")[0] == SCHEMA_VERSION
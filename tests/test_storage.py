@@ -0,0 +1,66 @@
+import pytest
+
+from scripts.utils import storage
+from scripts.utils.queries import get_converted_close, get_metrics, get_resampled
+from scripts.utils.storage import DuckDBStorage, SQLiteStorage, Storage, require_session_tables
+
+BARS = [
+    ("IBM", "2024-01-02", 1.0, 2.0, 0.5, 1.5, 100),
+    ("IBM", "2024-01-03", 1.5, 2.5, 1.0, 2.0, 200),
+]
+
+
+def test_storage_is_abstract():
+    with pytest.raises(TypeError):
+        Storage()
+
+    class Partial(Storage):
+        def append(self, source_type, rows):
+            return 0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_sqlite_storage_round_trip(session):
+    backend = SQLiteStorage(session)
+    with backend.transaction():
+        assert backend.append("stocks", BARS[:1]) == 1
+        counts = backend.upsert("stocks", [BARS[0], BARS[1]])
+    assert (counts["new"], counts["unchanged"]) == (1, 1)
+    assert backend.read_range("stocks", ["IBM"], start="2024-01-03") == [BARS[1]]
+
+
+def test_duckdb_storage_matches_sqlite(session, tmp_path):
+    pytest.importorskip("duckdb")
+    backend = DuckDBStorage(str(tmp_path / "bars.duckdb"))
+    try:
+        assert backend.append("stocks", BARS[:1]) == 1
+        revised = BARS[1][:5] + (2.2, 200)
+        counts = backend.upsert("stocks", [BARS[0], revised])
+        assert (counts["new"], counts["changed"], counts["unchanged"]) == (1, 0, 1)
+        counts = backend.upsert("stocks", [BARS[1]])
+        assert counts["changed"] == 1 and counts["first_changed_date"] == "2024-01-03"
+        assert backend.read_range("stocks", ["IBM"]) == BARS
+    finally:
+        backend.close()
+
+
+def test_sqlite_only_reads_refuse_other_backends(session, monkeypatch):
+    require_session_tables("get_metrics")
+    monkeypatch.setattr(storage, "STORAGE", "duckdb")
+    with pytest.raises(RuntimeError, match="GEDAP_STORAGE=duckdb"):
+        get_metrics("stocks", "IBM", session=session)
+    with pytest.raises(RuntimeError):
+        get_converted_close("BTC", "EUR", session=session)
+    with pytest.raises(ValueError):
+        require_session_tables("export", backend="parquet")
+
+
+def test_resampled_reads_daily_bars_without_rollups(session, monkeypatch):
+    with session.transaction():
+        SQLiteStorage(session).append("stocks", BARS)
+    monkeypatch.setattr(storage, "STORAGE", "duckdb")
+    monkeypatch.setattr(storage, "storage_for", lambda session, backend=None: SQLiteStorage(session))
+    resolution, columns = get_resampled("stocks", "IBM", max_points=1, session=session)
+    assert resolution == "daily" and len(columns["close"]) == 2
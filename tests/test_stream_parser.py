@@ -0,0 +1,200 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from scripts.utils import alphav_functions, http_client
+from scripts.utils.db_session import DBSession
+from scripts.utils.http_client import ProviderClient, ProviderError, check_alphavantage_payload
+from scripts.utils.metrics import metrics
+from scripts.utils.rate_limiter import QuotaExhaustedError, RateLimiter
+from scripts.utils.response_cache import ResponseCache
+from scripts.utils.stream_parser import parse_new_entries
+
+DATES = ["2024-01-05", "2024-01-04", "2024-01-03", "2024-01-02", "2024-01-01"]
+PAYLOAD = json.dumps({
+    "Meta Data": {"2. Symbol": "IBM"},
+    "Time Series (Daily)": {d: {"4. close": str(i)} for i, d in enumerate(DATES)},
+})
+
+
+def chunked(text, size=16):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def test_parse_new_entries_stops_at_max_data_date():
+    parsed, read = [], []
+    chunks = (read.append(c) or c for c in chunked(PAYLOAD))
+    top, rows, covered = parse_new_entries(chunks, lambda d, v: parsed.append(d) or d, "2024-01-03")
+
+    assert rows == ["2024-01-04", "2024-01-05"]
+    assert covered
+    assert parsed == ["2024-01-05", "2024-01-04"]
+    assert top["Meta Data"] == {"2. Symbol": "IBM"}
+    # The tail of the payload is never read
+    assert sum(map(len, read)) < len(PAYLOAD)
+
+
+def test_parse_new_entries_not_covered_and_unordered():
+    _, rows, covered = parse_new_entries(chunked(PAYLOAD), lambda d, v: d, "2023-12-01")
+    assert rows == sorted(DATES) and not covered
+
+    shuffled = json.dumps({"Time Series (Daily)": {d: {} for d in ["2024-01-02", "2024-01-05", "2024-01-01"]}})
+    _, rows, covered = parse_new_entries(chunked(shuffled), lambda d, v: d, "2024-01-01")
+    assert rows == ["2024-01-02", "2024-01-05"] and covered
+
+
+def test_parse_new_entries_without_series():
+    top, rows, _ = parse_new_entries(chunked('{"Error Message": "bad"}'), lambda d, v: d, None)
+    assert rows is None and top == {"Error Message": "bad"}
+
+
+def test_truncated_payload_is_an_error():
+    for cut in (len(PAYLOAD) // 2, len(PAYLOAD) - 1):
+        with pytest.raises(ValueError):
+            parse_new_entries(chunked(PAYLOAD[:cut]), lambda d, v: d, "2023-12-01")
+
+
+class FakeStreamResponse:
+    encoding = "utf-8"
+
+    def __init__(self, text, size=8):
+        self.body = self.content = text.encode("utf-8")
+        self.closed = False
+        self.served = (self.body[i:i + size] for i in range(0, len(self.body), size))
+
+    def iter_content(self, chunk_size):
+        return self.served
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_text_caches_only_complete_bodies(monkeypatch, tmp_path):
+    cache = ResponseCache(cache_dir=tmp_path)
+    monkeypatch.setattr(http_client, "response_cache", cache)
+    client = ProviderClient("alphavantage", "http://stub/", payload_check=check_alphavantage_payload)
+    responses = []
+    monkeypatch.setattr(client, "get", lambda *args, **kwargs: responses.append(FakeStreamResponse(PAYLOAD))
+                        or responses[-1])
+
+    # Stop reading early, like an incremental load: the rest is not downloaded
+    stream = client.stream_text("query", {"symbol": "IBM"})
+    next(stream)
+    stream.close()
+    assert responses[0].closed and next(responses[0].served, None) is not None
+    assert cache.get("alphavantage", "query", {"symbol": "IBM"}) is None
+
+    assert "".join(client.stream_text("query", {"symbol": "IBM"})) == PAYLOAD
+    assert cache.get("alphavantage", "query", {"symbol": "IBM"}) == PAYLOAD.encode("utf-8")
+    # Replays serve the streamed body to either read path
+    replay = ResponseCache(cache_dir=tmp_path, replay=True)
+    monkeypatch.setattr(http_client, "response_cache", replay)
+    assert "".join(client.stream_text("query", {"symbol": "IBM"})) == PAYLOAD
+    assert client.get_json("query", {"symbol": "IBM"}) == json.loads(PAYLOAD)
+
+
+def test_stream_text_counts_raw_bytes(monkeypatch):
+    text = json.dumps({"Meta Data": {"2. Symbol": "Nestlé €"}}, ensure_ascii=False)
+    client = ProviderClient("alphavantage", "http://stub/")
+    monkeypatch.setattr(http_client, "response_cache", None)
+    # 3-byte chunks split the multi-byte characters across chunks
+    monkeypatch.setattr(client, "get", lambda *args, **kwargs: FakeStreamResponse(text, size=3))
+    metrics.reset()
+
+    assert "".join(client.stream_text("query", {"symbol": "NESN"})) == text
+    downloaded = metrics.counters[("bytes_downloaded", (("provider", "alphavantage"),))]
+    assert downloaded == len(text.encode("utf-8")) > len(text)
+
+
+def test_stream_series_less_payload_reads_as_empty_and_covered(monkeypatch):
+    client = ProviderClient("alphavantage", "http://stub/", payload_check=check_alphavantage_payload)
+    requests = []
+    monkeypatch.setattr(http_client, "response_cache", None)
+    monkeypatch.setattr(alphav_functions, "alphavantage_client", lambda: client)
+    monkeypatch.setattr(client, "get", lambda *args, **kwargs: requests.append(args) or
+                        FakeStreamResponse('{"Meta Data": {"2. Symbol": "IBM"}}'))
+
+    meta, rows, covered = alphav_functions.stream_alpha_vantage(
+        {"function": "TIME_SERIES_DAILY"}, lambda d, v: d, "2024-01-01")
+    assert (meta, rows, covered) == ({"2. Symbol": "IBM"}, [], True)
+    assert len(requests) == 1
+
+
+def test_stream_fallback_parses_the_body_already_read(monkeypatch):
+    client = ProviderClient("alphavantage", "http://stub/", payload_check=check_alphavantage_payload)
+    requests = []
+    monkeypatch.setattr(http_client, "response_cache", None)
+    monkeypatch.setattr(alphav_functions, "alphavantage_client", lambda: client)
+    monkeypatch.setattr(client, "get", lambda *args, **kwargs: requests.append(args) or
+                        FakeStreamResponse('{"Error Message": "Invalid API call."}'))
+
+    with pytest.raises(ProviderError):
+        alphav_functions.stream_alpha_vantage({"function": "TIME_SERIES_DAILY"}, lambda d, v: d, "2024-01-01")
+    assert len(requests) == 1
+
+
+def test_stream_quota_payload_drains_the_limiter(monkeypatch):
+    limiter = RateLimiter(1000, 25)
+    client = ProviderClient("alphavantage", "http://stub/", limiter=limiter,
+                            payload_check=check_alphavantage_payload)
+    monkeypatch.setattr(http_client, "response_cache", None)
+    monkeypatch.setattr(alphav_functions, "alphavantage_client", lambda: client)
+    monkeypatch.setattr(client, "get", lambda *args, **kwargs: FakeStreamResponse(
+        json.dumps({"Information": "Our standard API rate limit is 25 requests per day."})))
+
+    with pytest.raises(QuotaExhaustedError):
+        alphav_functions.stream_alpha_vantage({"function": "TIME_SERIES_DAILY"}, lambda d, v: d, "2024-01-01")
+    with pytest.raises(QuotaExhaustedError):
+        limiter.acquire()
+
+
+def test_uncovered_full_payload_fails_the_load(monkeypatch):
+    calls = []
+
+    def fake_fetch_entries(params, parser, source_type, max_data_date, full_load):
+        calls.append(params.get("outputsize"))
+        return {}, [], False
+
+    monkeypatch.setattr(alphav_functions, "fetch_entries", fake_fetch_entries)
+    with pytest.raises(ValueError):
+        alphav_functions._fetch_and_parse({"function": "FX_DAILY", "from_symbol": "EUR", "to_symbol": "USD"},
+                                          "fx", "EUR", "USD", "2099-01-01", False, False)
+    # The compact window falls back to full once; a full payload is not retried
+    assert calls == ["compact", "full"]
+
+
+def _daily_payload(days_ago):
+    days = [(date.today() - timedelta(days=n)).isoformat() for n in days_ago]
+    bar = {"1. open": "1", "2. high": "2", "3. low": "0.5", "4. close": "1.5", "5. volume": "100"}
+    return json.dumps({"Meta Data": {"2. Symbol": "IBM"}, "Time Series (Daily)": {d: bar for d in days}})
+
+
+def test_incremental_run_can_be_replayed(session, monkeypatch, tmp_path):
+    client = ProviderClient("alphavantage", "http://stub/", payload_check=check_alphavantage_payload)
+    monkeypatch.setattr(alphav_functions, "alphavantage_client", lambda: client)
+    monkeypatch.setattr(http_client, "response_cache", ResponseCache(cache_dir=tmp_path))
+    params = {"function": "TIME_SERIES_DAILY", "symbol": "IBM"}
+    count = lambda db: db.fetchone("SELECT COUNT(*) FROM alphav_stocks_daily")[0]
+
+    # A full first load, then an incremental (compact) load that stops parsing early
+    payloads = [_daily_payload(range(10, 30)), _daily_payload(range(0, 30))]
+    monkeypatch.setattr(client, "get", lambda *args, **kwargs: FakeStreamResponse(payloads.pop(0)))
+    alphav_functions.alphav_loader(params, "stocks", "IBM", session=session)
+    alphav_functions.alphav_loader(params, "stocks", "IBM", session=session)
+    assert payloads == [] and count(session) == 30
+
+    def offline(*args, **kwargs):
+        raise AssertionError("replay must not send requests")
+
+    monkeypatch.setattr(client, "get", offline)
+    monkeypatch.setattr(http_client, "response_cache", ResponseCache(cache_dir=tmp_path, replay=True))
+
+    # Against the same database and, as the whole run, against a fresh one
+    alphav_functions.alphav_loader(params, "stocks", "IBM", session=session)
+    assert count(session) == 30
+    with DBSession(str(tmp_path / "fresh.db")) as fresh:
+        alphav_functions.alphav_loader(params, "stocks", "IBM", session=fresh)
+        alphav_functions.alphav_loader(params, "stocks", "IBM", session=fresh)
+        assert count(fresh) == 30